@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product
+from .models import Product, ProductPriceChange
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -7,3 +7,17 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ("name", "description", "metal_symbol")
     list_filter = ("unit", "metal_symbol")
 
+
+@admin.register(ProductPriceChange)
+class ProductPriceChangeAdmin(admin.ModelAdmin):
+    list_display = ("product", "old_price", "new_price", "metal_symbol", "metal_price_usd", "changed_at")
+    list_filter = ("metal_symbol",)
+    search_fields = ("product__name",)
+    date_hierarchy = "changed_at"
+
+    # La bitácora la escribe `core.pricing.propagate_metal_prices`
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
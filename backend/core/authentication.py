@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+
+
+STREAM_TOKEN_SALT = "core.events.stream-token"
+
+
+def issue_stream_token(user):
+    """
+    Token firmado de vida corta (EVENTS_STREAM_TOKEN_MAX_AGE segundos) que solo
+    sirve para abrir /api/events/. Lo pide el frontend con su JWT normal justo
+    antes de conectar, para no poner el JWT en la URL (y en los logs).
+    """
+    return signing.dumps({"user": user.pk}, salt=STREAM_TOKEN_SALT, compress=True)
+
+
+class StreamTokenAuthentication(BaseAuthentication):
+    """
+    Autenticación con `?stream_token=` (ver `issue_stream_token`), para
+    EventSource, que no puede enviar encabezados. No acepta el JWT de la API.
+    """
+
+    def authenticate(self, request):
+        token = request.query_params.get("stream_token")
+        if not token:
+            return None
+        try:
+            payload = signing.loads(token, salt=STREAM_TOKEN_SALT, max_age=settings.EVENTS_STREAM_TOKEN_MAX_AGE)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed("El token del flujo de eventos expiró.")
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed("Token del flujo de eventos inválido.")
+
+        user = get_user_model().objects.filter(pk=payload.get("user"), is_active=True).first()
+        if user is None:
+            raise exceptions.AuthenticationFailed("Usuario inactivo o inexistente.")
+        return user, None
+
+    def authenticate_header(self, request):
+        return "StreamToken"
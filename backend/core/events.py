@@ -0,0 +1,214 @@
+"""
+Eventos en vivo para el frontend (Server-Sent Events, ver `core.views.EventStreamView`).
+
+- `publish(topic, data)` hace `pg_notify` en el canal CHANNEL. Dentro de una
+  transacción, PostgreSQL entrega el aviso al confirmarla; si se revierte, nunca sale.
+- En cada proceso un solo hilo escucha el canal (LISTEN) con una conexión
+  propia y reparte cada evento a las colas de los clientes conectados. Un
+  cliente esperando eventos no hace consultas; el hilo se detiene cuando ya
+  no queda ningún cliente.
+
+Temas: "prices" (metales y tipos de cambio), "quotations" y "sales"
+(cambios de estado, ver `StatusEventMixin`).
+"""
+import itertools
+import json
+import queue
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections
+
+
+CHANNEL = "smartquote_events"
+TOPICS = ("prices", "quotations", "sales")
+
+
+def publish(topic, data):
+    """Avisa a todos los procesos (y a sus clientes SSE) de un evento de `topic`."""
+    message = json.dumps({"topic": topic, "data": data}, cls=DjangoJSONEncoder)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, message])
+
+
+def publish_price_change(sender, instance, raw=False, **kwargs):
+    """Receptor de señales de MetalPrice y CurrencyRate: avisa en "prices" qué cambió."""
+    if raw:
+        return
+    symbol = getattr(instance, "symbol", None) or f"{instance.base_currency}/{instance.target_currency}"
+    key = "symbols" if hasattr(instance, "symbol") else "currencies"
+    publish("prices", {key: [symbol]})
+
+
+class StatusEventMixin:
+    """
+    Publica un evento en `status_event_topic` cada vez que se guarda el modelo
+    con un `status` distinto al que tenía (también al crearlo). Los datos
+    son `status_event_data()` más "status" y "previous_status".
+    """
+
+    status_event_topic = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_status = instance.__dict__.get("status")
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        previous = getattr(self, "_saved_status", None)
+        if self.status != previous:
+            publish(self.status_event_topic, {
+                **self.status_event_data(),
+                "status": self.status,
+                "previous_status": previous,
+            })
+            self._saved_status = self.status
+
+    def status_event_data(self):
+        return {"id": self.pk}
+
+
+class Subscription:
+    """
+    Cola de eventos de un cliente. Los de precios llegan a todos; los de
+    cotizaciones y ventas, solo los de `company_id` (o todos con `all_companies`).
+    """
+
+    def __init__(self, topics, company_id=None, all_companies=False):
+        self.topics = set(topics)
+        self.company_id = company_id
+        self.all_companies = all_companies
+        self.queue = queue.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def accepts(self, event):
+        if event["topic"] not in self.topics:
+            return False
+        company_id = event["data"].get("company_id", None) if isinstance(event["data"], dict) else None
+        return self.all_companies or event["topic"] == "prices" or company_id == self.company_id
+
+    def offer(self, event):
+        # Un cliente lento pierde los eventos más viejos, no bloquea a los demás
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
+class TooManyStreams(Exception):
+    """El proceso ya atiende EVENTS_MAX_STREAMS flujos de eventos."""
+
+
+class Broadcaster:
+    """Reparte los avisos de PostgreSQL a los clientes SSE de este proceso."""
+
+    poll_seconds = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._ids = itertools.count(1)
+
+    def subscribe(self, topics, company_id=None, all_companies=False):
+        """
+        Registra un cliente. Lanza TooManyStreams si el proceso ya tiene
+        EVENTS_MAX_STREAMS: cada flujo ocupa un hilo del servidor mientras dura.
+        """
+        subscription = Subscription(topics, company_id=company_id, all_companies=all_companies)
+        with self._lock:
+            if len(self._subscribers) >= settings.EVENTS_MAX_STREAMS:
+                raise TooManyStreams(f"Máximo {settings.EVENTS_MAX_STREAMS} flujos de eventos por proceso.")
+            self._subscribers.add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name="events-listener", daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def dispatch(self, message):
+        try:
+            event = json.loads(message)
+        except ValueError:
+            return
+        event["id"] = next(self._ids)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.accepts(event):
+                subscription.offer(event)
+
+    def _idle(self):
+        """True (y el hilo se da por terminado) si ya no hay clientes; el próximo subscribe arranca otro."""
+        with self._lock:
+            if self._subscribers:
+                return False
+            self._thread = None
+            return True
+
+    def _listen(self):
+        backoff = 1
+        while not self._idle():
+            db = connections.create_connection("default")
+            try:
+                db.ensure_connection()
+                with db.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                raw = db.connection
+                backoff = 1
+
+                while not self._idle():
+                    if select.select([raw], [], [], self.poll_seconds)[0]:
+                        raw.poll()
+                        while raw.notifies:
+                            self.dispatch(raw.notifies.pop(0).payload)
+            except Exception:
+                # Se perdió la conexión: se reintenta con espera creciente
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                db.close()
+
+
+broadcaster = Broadcaster()
+
+
+def format_event(event):
+    """Un evento en formato SSE (`id`, `event` y `data`)."""
+    data = json.dumps(event["data"], cls=DjangoJSONEncoder)
+    return f"id: {event['id']}\nevent: {event['topic']}\ndata: {data}\n\n"
+
+
+def event_stream(subscription):
+    """
+    Generador de la respuesta SSE: eventos según llegan, un comentario cada
+    EVENTS_HEARTBEAT_SECONDS para mantener viva la conexión, y cierre tras
+    EVENTS_STREAM_MAX_SECONDS (EventSource se reconecta solo).
+    """
+    deadline = time.monotonic() + settings.EVENTS_STREAM_MAX_SECONDS
+    try:
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            try:
+                event = subscription.get(timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
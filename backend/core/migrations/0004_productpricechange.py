@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_product_metal_symbol'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPriceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Precio anterior')),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Precio nuevo')),
+                ('metal_symbol', models.CharField(max_length=20, verbose_name='Símbolo del metal')),
+                ('metal_price_usd', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Precio del metal (USD)')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='Cambiado el')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_changes', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Cambio de precio',
+                'verbose_name_plural': 'Cambios de precio',
+                'indexes': [models.Index(fields=['product', '-changed_at'], name='product_price_change_idx')],
+            },
+        ),
+    ]
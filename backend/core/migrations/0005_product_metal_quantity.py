@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_productpricechange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='metal_quantity',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Ejemplo: 0.25 (kg de cobre por pieza). Vacío: una unidad del producto es una unidad del metal', max_digits=12, null=True, verbose_name='Cantidad de metal por unidad'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='metal_quantity_unit',
+            field=models.CharField(blank=True, default='', help_text='kg, g, lb, onza troy, toneladas, litros, bd. ft. Vacío: la unidad del producto', max_length=20, verbose_name='Unidad de la cantidad de metal'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.db.models.query import prefetch_related_objects
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    """
+    GET condicionales (ETag / Last-Modified) para ViewSets.
+
+    - Detalle: la versión del recurso es el `updated_at` más reciente entre el
+      objeto y las relaciones listadas en `conditional_timestamp_fields`. Si el
+      cliente ya la tiene (If-None-Match / If-Modified-Since) se responde 304
+      sin ejecutar el serializador.
+    - Listado: ETag débil a partir del máximo `updated_at` y el conteo de las
+      filas filtradas (una sola consulta agregada), más los parámetros de la URL.
+    """
+
+    # Campos de fecha que definen la versión del detalle; pueden cruzar relaciones (`items__product__updated_at`)
+    conditional_timestamp_fields = ("updated_at",)
+    # Campo de fecha para la versión del listado (solo columnas propias: el agregado recorre todas las filas)
+    collection_timestamp_field = "updated_at"
+    # Prefetch que se aplica solo cuando de verdad hay que serializar el detalle
+    retrieve_prefetch = ()
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = self.get_last_modified(instance)
+        etag = self._make_etag(instance._meta.label, instance.pk, last_modified)
+
+        not_modified = self._conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        if self.retrieve_prefetch:
+            prefetch_related_objects([instance], *self.retrieve_prefetch)
+        serializer = self.get_serializer(instance)
+        return self._with_validators(Response(serializer.data), etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.order_by().aggregate(
+            last_modified=Max(self.collection_timestamp_field),
+            count=Count("pk"),
+        )
+        last_modified = state["last_modified"]
+        etag = "W/" + self._make_etag(
+            queryset.model._meta.label, request.get_full_path(), last_modified, state["count"]
+        )
+
+        not_modified = self._conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        return self._with_validators(response, etag, last_modified)
+
+    def get_last_modified(self, instance):
+        """Fecha más reciente entre el objeto y sus relaciones (una consulta si hay relaciones)."""
+        own = [f for f in self.conditional_timestamp_fields if "__" not in f]
+        related = [f for f in self.conditional_timestamp_fields if "__" in f]
+
+        timestamps = [getattr(instance, field) for field in own]
+        if related:
+            aggregates = type(instance)._default_manager.filter(pk=instance.pk).aggregate(
+                **{f"ts_{n}": Max(field) for n, field in enumerate(related)}
+            )
+            timestamps.extend(aggregates.values())
+
+        timestamps = [ts for ts in timestamps if ts is not None]
+        return max(timestamps) if timestamps else None
+
+    def _make_etag(self, *parts):
+        # El formato (json / api navegable) cambia el cuerpo: forma parte de la versión
+        renderer = getattr(self.request, "accepted_renderer", None)
+        raw = "|".join(str(part) for part in (*parts, getattr(renderer, "format", "")))
+        return quote_etag(hashlib.md5(raw.encode("utf-8"), usedforsecurity=False).hexdigest())
+
+    def _conditional_response(self, request, etag, last_modified):
+        return get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+
+    def _with_validators(self, response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+        # El contenido depende del usuario (empresa): que ningún proxy lo comparta
+        response["Cache-Control"] = "private, no-cache"
+        return response
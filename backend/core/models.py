@@ -1,5 +1,5 @@
 from django.db import models
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 
 class Product(models.Model):
     name = models.CharField("Nombre", max_length=100)
@@ -18,37 +18,56 @@ class Product(models.Model):
         null=True,
         help_text="Ejemplo: ALU, XCO, XCU, IRON"
     )
+    metal_quantity = models.DecimalField(
+        "Cantidad de metal por unidad",
+        max_digits=12,
+        decimal_places=4,
+        blank=True,
+        null=True,
+        help_text="Ejemplo: 0.25 (kg de cobre por pieza). Vacío: una unidad del producto es una unidad del metal",
+    )
+    metal_quantity_unit = models.CharField(
+        "Unidad de la cantidad de metal",
+        max_length=20,
+        blank=True,
+        default="",
+        help_text="kg, g, lb, onza troy, toneladas, litros, bd. ft. Vacío: la unidad del producto",
+    )
     created_at = models.DateTimeField("Creado el", auto_now_add=True)
     updated_at = models.DateTimeField("Actualizado el", auto_now=True)
 
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from core.units import normalize_unit
+
+        if self.metal_quantity_unit and normalize_unit(self.metal_quantity_unit) is None:
+            raise ValidationError({"metal_quantity_unit": f"Unidad desconocida: {self.metal_quantity_unit}"})
+
     def update_dynamic_price(self):
-        """Actualiza el precio si tiene fuente externa"""
-        from services.api_clients import get_metal_price
+        """Actualiza el precio si tiene fuente externa (símbolo de metal con precio guardado)"""
+        from services.models import MetalPrice
         if self.dynamic_price_source:
-            new_price = get_metal_price(self.dynamic_price_source)
-            if new_price:
-                self.price = new_price
-                self.save()
+            metal = MetalPrice.objects.current(self.dynamic_price_source)
+            if metal:
+                self.price = metal.price_usd.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                self.save(update_fields=["price", "updated_at"])
     
     def update_price_from_metal(self):
         """
         Si el producto tiene un símbolo de metal asignado, 
         actualiza su precio automáticamente con el último valor guardado.
+        Usa la misma actualización que `core.pricing.propagate_metal_prices`
+        (y deja registro en ProductPriceChange).
         """
         if not self.metal_symbol:
             return None
 
-        from services.models import MetalPrice
-        try:
-            metal = MetalPrice.objects.filter(symbol=self.metal_symbol).order_by("-last_updated").first()
-            if metal:
-                old_price = self.price
-                self.price = Decimal(metal.price_usd)
-                self.save()
-                return f"Precio actualizado de {old_price} → {self.price} USD"
-        except Exception as e:
-            print(f"⚠️ Error al actualizar precio de {self.name}: {e}")
+        from core.pricing import propagate_metal_prices
+        old_price = self.price
+        if not propagate_metal_prices(product_ids=[self.pk]):
             return None
+        self.refresh_from_db(fields=["price", "updated_at"])
+        return f"Precio actualizado de {old_price} → {self.price} USD"
    
     class Meta:
         verbose_name = "Producto"
@@ -56,3 +75,24 @@ class Product(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class ProductPriceChange(models.Model):
+    """Bitácora de cambios de precio de productos por actualización de precios de metales."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="price_changes")
+    old_price = models.DecimalField("Precio anterior", max_digits=10, decimal_places=2)
+    new_price = models.DecimalField("Precio nuevo", max_digits=10, decimal_places=2)
+    metal_symbol = models.CharField("Símbolo del metal", max_length=20)
+    metal_price_usd = models.DecimalField("Precio del metal (USD)", max_digits=12, decimal_places=4)
+    changed_at = models.DateTimeField("Cambiado el", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Cambio de precio"
+        verbose_name_plural = "Cambios de precio"
+        indexes = [
+            models.Index(fields=["product", "-changed_at"], name="product_price_change_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.old_price} → {self.new_price}"
@@ -0,0 +1,118 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.db import connection
+
+from core.models import Product, ProductPriceChange
+from core.units import FACTORS, unit_index
+
+
+CENT = Decimal("0.01")
+
+
+def metal_unit_prices(products, metal_quotes):
+    """
+    Precio en USD por unidad de venta de cada producto ligado a un metal, en
+    una sola pasada vectorizada sobre todo el catálogo.
+
+    `products`: iterable de (id, metal_symbol, unit, metal_quantity, metal_quantity_unit).
+    `metal_quotes`: {símbolo: (precio_usd, cantidad base, unidad de medida)},
+    como `services.price_table.load_metal_quotes`.
+
+    precio = precio_usd / cantidad base (USD por unidad del metal), convertido
+    a la unidad de `metal_quantity_unit` (o de `unit`) × `metal_quantity` (o 1).
+    Si las unidades no se pueden convertir (p. ej. "pieza" contra "toneladas")
+    y el producto no indica `metal_quantity`, se usa el precio por unidad del
+    metal tal cual; si sí la indica, el producto se omite.
+    Devuelve {id: Decimal redondeado a centavos}.
+    """
+    quotes = {symbol.upper(): quote for symbol, quote in metal_quotes.items()}
+    rows = [row for row in products if row[1] and row[1].upper() in quotes]
+    if not rows:
+        return {}
+
+    ids = [row[0] for row in rows]
+    metal = [quotes[row[1].upper()] for row in rows]
+    price_per_unit = np.array(
+        [float(price) / float(base_quantity or 1) for price, base_quantity, _ in metal], dtype=np.float64
+    )
+    has_quantity = np.array([row[3] is not None for row in rows])
+    quantity = np.array([float(row[3]) if row[3] is not None else 1.0 for row in rows], dtype=np.float64)
+
+    source = unit_index([units for _, _, units in metal])
+    target = unit_index([row[4] if row[3] is not None and row[4] else row[2] for row in rows])
+    known = (source >= 0) & (target >= 0)
+    factors = np.where(known, FACTORS[np.where(known, source, 0), np.where(known, target, 0)], np.nan)
+
+    converted = price_per_unit / factors * quantity
+    prices = np.where(np.isnan(factors), np.where(has_quantity, np.nan, price_per_unit), converted)
+
+    return {
+        pk: Decimal(repr(price)).quantize(CENT, rounding=ROUND_HALF_UP)
+        for pk, price in zip(ids, prices.tolist())
+        if not np.isnan(price)
+    }
+
+
+def propagate_metal_prices(product_ids=None):
+    """
+    Pone en `Product.price` el precio por unidad de venta calculado con
+    `metal_unit_prices` para los productos con `metal_symbol` (sin distinguir
+    mayúsculas) y registra cada cambio en ProductPriceChange.
+
+    Tres consultas sin importar el tamaño del catálogo: precios de metales,
+    productos, y una sola sentencia UPDATE ... FROM unnest(...) cuyo RETURNING
+    (con el precio anterior) alimenta el INSERT de la bitácora. Solo se tocan
+    los productos cuyo precio realmente cambia.
+    `product_ids` limita la actualización a esos productos.
+    Devuelve el número de productos actualizados.
+    """
+    from services.price_table import load_metal_quotes
+
+    products = Product.objects.exclude(metal_symbol__isnull=True).exclude(metal_symbol="")
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return 0
+        products = products.filter(pk__in=product_ids)
+
+    rows = list(products.values_list("pk", "metal_symbol", "unit", "metal_quantity", "metal_quantity_unit", "price"))
+    if not rows:
+        return 0
+    quotes = load_metal_quotes()
+    new_prices = metal_unit_prices([row[:5] for row in rows], quotes)
+    quotes = {symbol.upper(): (symbol, quote[0]) for symbol, quote in quotes.items()}
+
+    changed = [row for row in rows if row[0] in new_prices and new_prices[row[0]] != row[5]]
+    if not changed:
+        return 0
+
+    qn = connection.ops.quote_name
+    product_table = qn(Product._meta.db_table)
+    log_table = qn(ProductPriceChange._meta.db_table)
+    sql = f"""
+        WITH new_price AS (
+            SELECT * FROM unnest(%s::bigint[], %s::numeric[], %s::varchar[], %s::numeric[])
+                AS t(id, price, symbol, metal_price_usd)
+        ),
+        changed AS (
+            UPDATE {product_table} AS p
+            SET price = new_price.price, updated_at = NOW()
+            FROM new_price, {product_table} AS previous
+            WHERE p.id = new_price.id
+              AND previous.id = p.id
+              AND p.price IS DISTINCT FROM new_price.price
+            RETURNING p.id, previous.price AS old_price, p.price AS new_price, new_price.symbol, new_price.metal_price_usd
+        )
+        INSERT INTO {log_table} (product_id, old_price, new_price, metal_symbol, metal_price_usd, changed_at)
+        SELECT id, old_price, new_price, symbol, metal_price_usd, NOW() FROM changed
+    """
+    params = [
+        [row[0] for row in changed],
+        [new_prices[row[0]] for row in changed],
+        [quotes[row[1].upper()][0] for row in changed],
+        [quotes[row[1].upper()][1] for row in changed],
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
@@ -0,0 +1,20 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Permite negociar `text/event-stream` (lo que pide EventSource). El flujo lo
+    transmite la vista con StreamingHttpResponse; aquí solo se renderizan los
+    errores (401/403) que DRF genere antes de llegar a ella.
+    """
+
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
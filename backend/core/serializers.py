@@ -16,10 +16,19 @@ class ProductSerializer(serializers.ModelSerializer):
             "image",
             "image_url",
             "metal_symbol",
+            "metal_quantity",
+            "metal_quantity_unit",
             "created_at",
             "updated_at",
         ]
 
+    def validate_metal_quantity_unit(self, value):
+        from core.units import normalize_unit
+
+        if value and normalize_unit(value) is None:
+            raise serializers.ValidationError(f"Unidad desconocida: {value}")
+        return value
+
     def get_image_url(self, obj):
         """Devuelve la URL completa de la imagen"""
         request = self.context.get("request")
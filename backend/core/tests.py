@@ -1,3 +1,220 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import signing
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import issue_stream_token
+from core.events import Broadcaster, Subscription, TooManyStreams, format_event
+from core.models import Product, ProductPriceChange
+from core.pricing import metal_unit_prices, propagate_metal_prices
+from core.units import conversion_factor, normalize_unit
+from services.models import MetalPrice
+from users.models import User
+
+
+def make_product(name, price="1.00", **fields):
+    return Product.objects.create(name=name, price=Decimal(price), **fields)
+
+
+class PropagateMetalPricesTests(TestCase):
+    """Precio de los productos ligados a un metal en una sola sentencia, con bitácora."""
+
+    def setUp(self):
+        MetalPrice.objects.create(name="Gold", symbol="GOLD", price_usd=Decimal("2400.0000"),
+                                  measure_units="onza troy", base_quantity=Decimal("1"))
+        self.coin = make_product("Moneda", unit="onza troy", metal_symbol="gold")
+        self.plain = make_product("Servicio", "50.00")
+
+    def test_prices_are_updated_and_logged(self):
+        self.assertEqual(propagate_metal_prices(), 1)
+
+        self.coin.refresh_from_db()
+        self.assertEqual(self.coin.price, Decimal("2400.00"))
+        change = ProductPriceChange.objects.get()
+        self.assertEqual(
+            (change.product_id, change.old_price, change.new_price, change.metal_symbol, change.metal_price_usd),
+            (self.coin.pk, Decimal("1.00"), Decimal("2400.00"), "GOLD", Decimal("2400.0000")),
+        )
+        self.plain.refresh_from_db()
+        self.assertEqual(self.plain.price, Decimal("50.00"))
+
+    def test_unchanged_prices_are_not_logged_again(self):
+        propagate_metal_prices()
+
+        self.assertEqual(propagate_metal_prices(), 0)
+        self.assertEqual(ProductPriceChange.objects.count(), 1)
+
+    def test_product_ids_limit_the_update(self):
+        other = make_product("Lingote", unit="onza troy", metal_symbol="GOLD")
+
+        self.assertEqual(propagate_metal_prices(product_ids=[other.pk]), 1)
+        self.assertEqual(propagate_metal_prices(product_ids=[]), 0)
+        self.coin.refresh_from_db()
+        self.assertEqual(self.coin.price, Decimal("1.00"))
+
+    def test_query_count_does_not_grow_with_catalog(self):
+        for i in range(20):
+            make_product(f"Moneda {i}", unit="onza troy", metal_symbol="GOLD")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(propagate_metal_prices(), 21)
+        self.assertEqual(len(queries), 3)
+
+
+class UnitConversionTests(TestCase):
+    """Nombres libres de unidades y factores entre unidades de la misma dimensión."""
+
+    def test_normalize_unit(self):
+        for name, code in (("Onza Troy", "ozt"), ("Galón", "gal"), ("kgs", "kg"), ("bd. ft.", "bdft"), ("libras", "lb")):
+            with self.subTest(name=name):
+                self.assertEqual(normalize_unit(name), code)
+        self.assertIsNone(normalize_unit("furlong"))
+        self.assertIsNone(normalize_unit(""))
+
+    def test_conversion_factor(self):
+        self.assertAlmostEqual(conversion_factor("toneladas", "kg"), 1000)
+        self.assertAlmostEqual(conversion_factor("lb", "kg"), 0.45359237)
+        self.assertIsNone(conversion_factor("kg", "litros"))
+        self.assertIsNone(conversion_factor("kg", "furlong"))
+
+
+class MetalUnitPricesTests(TestCase):
+    """Precio por unidad de venta a partir de la cotización de cada metal."""
+
+    QUOTES = {
+        "COPPER": (Decimal("4"), Decimal("1"), "libras"),
+        "ALUMINUM": (Decimal("2500"), Decimal("1"), "toneladas"),
+        "LUMBER": (Decimal("600"), Decimal("1000"), "bd. ft."),
+    }
+
+    def test_lumber_quote_is_per_thousand_board_feet(self):
+        prices = metal_unit_prices([(1, "LUMBER", "bd. ft.", None, "")], self.QUOTES)
+
+        self.assertEqual(prices, {1: Decimal("0.60")})
+
+    def test_prices_are_converted_to_the_sale_unit(self):
+        prices = metal_unit_prices([
+            (1, "copper", "kg", None, ""),
+            (2, "ALUMINUM", "pieza", Decimal("0.25"), "kg"),
+            (3, "LUMBER", "pieza", Decimal("10"), "pies tablares"),
+        ], self.QUOTES)
+
+        self.assertEqual(prices, {1: Decimal("8.82"), 2: Decimal("0.63"), 3: Decimal("6.00")})
+
+    def test_incompatible_units(self):
+        prices = metal_unit_prices([
+            (1, "ALUMINUM", "pieza", None, ""),  # sin cantidad: precio por unidad del metal
+            (2, "ALUMINUM", "pieza", Decimal("2"), "litros"),  # con cantidad: se omite
+            (3, "ZINC", "kg", None, ""),  # metal sin cotización
+        ], self.QUOTES)
+
+        self.assertEqual(prices, {1: Decimal("2500.00")})
+
+
+class EventSubscriptionTests(TestCase):
+    """Reparto de eventos a los clientes SSE de un proceso."""
+
+    def setUp(self):
+        # Sin hilo que escuche PostgreSQL: los eventos se reparten a mano con dispatch()
+        patcher = mock.patch("core.events.threading.Thread")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.broadcaster = Broadcaster()
+
+    def test_prices_reach_everyone_and_status_events_only_their_company(self):
+        seller = self.broadcaster.subscribe(["prices", "quotations"], company_id=1)
+        admin = self.broadcaster.subscribe(["quotations"], all_companies=True)
+
+        self.broadcaster.dispatch('{"topic": "prices", "data": {"symbols": ["GOLD"]}}')
+        self.broadcaster.dispatch('{"topic": "quotations", "data": {"id": 7, "company_id": 2, "status": "confirmed"}}')
+        self.broadcaster.dispatch("no es json")
+
+        self.assertEqual([seller.get(0)["topic"]], ["prices"])
+        self.assertTrue(seller.queue.empty())
+        event = admin.get(0)
+        self.assertEqual((event["id"], event["data"]["id"]), (2, 7))
+
+    @override_settings(EVENTS_QUEUE_SIZE=2)
+    def test_slow_client_loses_oldest_events(self):
+        subscription = Subscription(["prices"])
+        for number in range(3):
+            subscription.offer({"topic": "prices", "data": {"n": number}})
+
+        self.assertEqual([subscription.get(0)["data"]["n"] for _ in range(2)], [1, 2])
+
+    @override_settings(EVENTS_MAX_STREAMS=1)
+    def test_streams_per_process_are_capped(self):
+        first = self.broadcaster.subscribe(["prices"])
+        with self.assertRaises(TooManyStreams):
+            self.broadcaster.subscribe(["prices"])
+
+        self.broadcaster.unsubscribe(first)
+        self.broadcaster.subscribe(["prices"])
+
+    def test_format_event(self):
+        event = {"id": 3, "topic": "sales", "data": {"id": 9, "total": Decimal("10.50")}}
+
+        self.assertEqual(format_event(event), 'id: 3\nevent: sales\ndata: {"id": 9, "total": "10.50"}\n\n')
+
+
+class EventStreamAuthTests(TestCase):
+    """/api/events/ se abre con un token de vida corta, nunca con el JWT en la URL."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="vendedor", role="vendedor")
+        patcher = mock.patch("core.events.threading.Thread")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.broadcaster = Broadcaster()
+        for target in ("core.views.broadcaster", "core.events.broadcaster"):
+            patcher = mock.patch(target, self.broadcaster)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stream_token(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post("/api/events/token/")
+        self.assertEqual(response.data["expires_in"], 60)
+        return response.data["stream_token"]
+
+    @override_settings(EVENTS_STREAM_MAX_SECONDS=0)
+    def test_stream_opens_with_stream_token(self):
+        response = APIClient().get("/api/events/", {"topics": "prices", "stream_token": self.stream_token()})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        # Con duración máxima 0 el flujo se cierra tras el primer mensaje y libera la suscripción
+        self.assertEqual(b"".join(response.streaming_content), b"retry: 3000\n\n")
+        self.assertEqual(self.broadcaster._subscribers, set())
+
+    def test_invalid_expired_or_jwt_tokens_are_refused(self):
+        client = APIClient()
+        forged = signing.dumps({"user": self.user.pk}, salt="otro-uso")
+
+        self.assertEqual(client.get("/api/events/").status_code, 401)
+        self.assertEqual(client.get("/api/events/", {"stream_token": forged}).status_code, 401)
+        self.assertEqual(client.get("/api/events/", {"access_token": str(AccessToken.for_user(self.user))}).status_code, 401)
+        with override_settings(EVENTS_STREAM_TOKEN_MAX_AGE=-1):
+            self.assertEqual(client.get("/api/events/", {"stream_token": issue_stream_token(self.user)}).status_code, 401)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(client.get("/api/events/", {"stream_token": issue_stream_token(self.user)}).status_code, 401)
+
+    def test_unknown_topics_are_rejected(self):
+        response = APIClient().get("/api/events/", {"topics": "prices,clima", "stream_token": self.stream_token()})
+
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(EVENTS_MAX_STREAMS=0)
+    def test_full_process_answers_503(self):
+        response = APIClient().get("/api/events/", {"stream_token": self.stream_token()})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
@@ -0,0 +1,97 @@
+"""
+Conversión de unidades de medida para precios de commodities.
+
+Cada unidad tiene una dimensión (masa, volumen, energía, pieza) y su tamaño en
+la unidad base de esa dimensión (kg, m³, MMBtu). Con eso se precalcula una
+sola vez la tabla `FACTORS`: `FACTORS[i, j]` es cuántas unidades `j` caben en
+una unidad `i` (NaN si las dimensiones no coinciden). Un precio por unidad `i`
+pasa a precio por unidad `j` dividiendo entre ese factor.
+"""
+import unicodedata
+
+import numpy as np
+
+
+# código: (dimensión, tamaño en la unidad base de la dimensión)
+UNITS = {
+    # Masa (kg)
+    "kg": ("mass", 1.0),
+    "g": ("mass", 0.001),
+    "t": ("mass", 1000.0),
+    "lb": ("mass", 0.45359237),
+    "oz": ("mass", 0.028349523125),
+    "ozt": ("mass", 0.0311034768),
+    # Volumen (m³)
+    "m3": ("volume", 1.0),
+    "l": ("volume", 0.001),
+    "gal": ("volume", 0.003785411784),
+    "bbl": ("volume", 0.158987294928),
+    "bdft": ("volume", 0.002359737216),  # pie tablar: 12 × 12 × 1 pulgadas
+    # Energía (MMBtu)
+    "mmbtu": ("energy", 1.0),
+    "btu": ("energy", 1e-6),
+    # Piezas
+    "pc": ("count", 1.0),
+}
+
+# Nombres en uso (UNIT_MAP de services.price_refresh, Product.unit) -> código
+ALIASES = {
+    "kilo": "kg", "kilos": "kg", "kilogramo": "kg", "kilogramos": "kg",
+    "gramo": "g", "gramos": "g",
+    "ton": "t", "tonelada": "t", "toneladas": "t", "tonelada metrica": "t",
+    "libra": "lb", "libras": "lb", "lbs": "lb",
+    "onza": "oz", "onzas": "oz",
+    "onza troy": "ozt", "onzas troy": "ozt", "troy oz": "ozt", "oz t": "ozt",
+    "metro cubico": "m3", "metros cubicos": "m3",
+    "litro": "l", "litros": "l", "lt": "l",
+    "galon": "gal", "galones": "gal",
+    "barril": "bbl", "barriles": "bbl",
+    "bd. ft.": "bdft", "bd ft": "bdft", "board feet": "bdft", "pie tablar": "bdft", "pies tablares": "bdft",
+    "pieza": "pc", "piezas": "pc", "pza": "pc", "pzas": "pc", "unidad": "pc", "unidades": "pc",
+}
+
+CODES = list(UNITS)
+INDEX = {code: i for i, code in enumerate(CODES)}
+
+
+def _build_factors():
+    dimensions = np.array([UNITS[code][0] for code in CODES])
+    sizes = np.array([UNITS[code][1] for code in CODES], dtype=np.float64)
+    factors = sizes[:, np.newaxis] / sizes[np.newaxis, :]
+    factors[dimensions[:, np.newaxis] != dimensions[np.newaxis, :]] = np.nan
+    return factors
+
+
+FACTORS = _build_factors()
+
+
+def normalize_unit(name):
+    """Código de unidad para un nombre libre ("Onza Troy", "libras", "kg"...) o None si no se reconoce."""
+    if not name:
+        return None
+    key = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii")
+    key = " ".join(key.lower().split())
+    if key in UNITS:
+        return key
+    return ALIASES.get(key) or ALIASES.get(key.rstrip(".")) or (key.rstrip("s") if key.rstrip("s") in UNITS else None)
+
+
+def unit_index(names):
+    """Posición en `FACTORS` de cada nombre (-1 si no se reconoce); cada nombre distinto se normaliza una vez."""
+    cache = {}
+    positions = np.empty(len(names), dtype=np.intp)
+    for k, name in enumerate(names):
+        if name not in cache:
+            code = normalize_unit(name)
+            cache[name] = INDEX[code] if code else -1
+        positions[k] = cache[name]
+    return positions
+
+
+def conversion_factor(source, target):
+    """Cuántas unidades `target` caben en una `source` (None si no se pueden convertir)."""
+    source, target = normalize_unit(source), normalize_unit(target)
+    if source is None or target is None:
+        return None
+    factor = FACTORS[INDEX[source], INDEX[target]]
+    return None if np.isnan(factor) else float(factor)
@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet
+from .views import EventStreamTokenView, EventStreamView, ProductViewSet
 
 router = DefaultRouter()
 router.register(r"products", ProductViewSet, basename="product")
 
 urlpatterns = [
     path("api/", include(router.urls)),
+    path("api/events/", EventStreamView.as_view(), name="event-stream"),
+    path("api/events/token/", EventStreamTokenView.as_view(), name="event-stream-token"),
 ]
@@ -1,18 +1,26 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from django.http import HttpResponse
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 
 import csv
 from io import TextIOWrapper
 
+from .authentication import StreamTokenAuthentication, issue_stream_token
+from .events import TOPICS, TooManyStreams, broadcaster, event_stream
+from .mixins import ConditionalGetMixin
+from .renderers import EventStreamRenderer
 from .models import Product
 from .serializers import ProductSerializer
 
 
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all().order_by("-created_at")
     serializer_class = ProductSerializer
     search_fields = ["name", "metal_symbol"]
@@ -27,10 +35,10 @@ class ProductViewSet(viewsets.ModelViewSet):
         response["Content-Disposition"] = 'attachment; filename="productos_layout.csv"'
 
         writer = csv.writer(response)
-        headers = ["name", "description", "price", "margin", "unit", "metal_symbol"]
+        headers = ["name", "description", "price", "margin", "unit", "metal_symbol", "metal_quantity", "metal_quantity_unit"]
         writer.writerow(headers)
-        writer.writerow(["Ejemplo Tornillo", "Acero galvanizado", "1.25", "5", "pieza", "IRON"])
-        writer.writerow(["Ejemplo PVC", "Tubo presión", "0.95", "3", "metro", "PVC"])
+        writer.writerow(["Ejemplo Tornillo", "Acero galvanizado", "1.25", "5", "pieza", "IRON", "0.0100", "kg"])
+        writer.writerow(["Ejemplo PVC", "Tubo presión", "0.95", "3", "metro", "PVC", "0.0012", "toneladas"])
 
         return response
 
@@ -39,6 +47,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         """
         Permite cargar un archivo CSV con productos masivamente.
         Espera columnas: name, description, price, margin, unit, metal_symbol
+        (opcionales: metal_quantity, metal_quantity_unit)
         """
         try:
             file = request.FILES.get("file")
@@ -58,6 +67,8 @@ class ProductViewSet(viewsets.ModelViewSet):
                     margin=row.get("margin") or 0,
                     unit=row.get("unit", "pieza"),
                     metal_symbol=row.get("metal_symbol", ""),
+                    metal_quantity=row.get("metal_quantity") or None,
+                    metal_quantity_unit=row.get("metal_quantity_unit") or "",
                 )
                 created.append(product.name)
 
@@ -68,3 +79,61 @@ class ProductViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"error": f"Error procesando CSV: {str(e)}"},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class EventStreamView(APIView):
+    """
+    Flujo de eventos en vivo (Server-Sent Events) para reemplazar el polling:
+    cambios de precios de metales y tipos de cambio ("prices") y cambios de
+    estado de cotizaciones ("quotations") y ventas ("sales").
+
+    `?topics=prices,quotations` elige los temas (por defecto todos). Como
+    EventSource no envía encabezados, se autentica con `?stream_token=` (de
+    `EventStreamTokenView`), nunca con el JWT en la URL.
+    Los eventos solo traen ids y estados; el detalle se pide a la API de siempre.
+    """
+
+    authentication_classes = [JWTAuthentication, StreamTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    def get(self, request):
+        topics = [topic.strip() for topic in request.query_params.get("topics", ",".join(TOPICS)).split(",") if topic.strip()]
+        unknown = sorted(set(topics) - set(TOPICS))
+        if unknown or not topics:
+            return Response(
+                {"error": f"Temas válidos: {', '.join(TOPICS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user = request.user
+        try:
+            subscription = broadcaster.subscribe(
+                topics,
+                company_id=user.company_id,
+                all_companies=user.role in ["admin", "soporte"],
+            )
+        except TooManyStreams as e:
+            response = Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response["Retry-After"] = str(settings.EVENTS_HEARTBEAT_SECONDS)
+            return response
+        response = StreamingHttpResponse(event_stream(subscription), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Evita que nginx u otro proxy acumule el flujo
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class EventStreamTokenView(APIView):
+    """
+    Token de un solo propósito y vida corta para abrir `EventStreamView`. Se
+    pide con el JWT normal (encabezado) justo antes de cada conexión.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            "stream_token": issue_stream_token(request.user),
+            "expires_in": settings.EVENTS_STREAM_TOKEN_MAX_AGE,
+        })
@@ -13,6 +13,7 @@ class Invoice(models.Model):
     tax = models.DecimalField(max_digits=12, decimal_places=2)
     total = models.DecimalField(max_digits=12, decimal_places=2)
     pdf_file = models.FileField(upload_to="invoices/pdfs/", blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
     @staticmethod
@@ -14,6 +14,13 @@ from decimal import Decimal, ROUND_HALF_UP
 
 
 def generate_invoice_pdf(invoice):
+    response = HttpResponse(content_type="application/pdf")
+    response.write(render_invoice_pdf(invoice))
+    return response
+
+
+def render_invoice_pdf(invoice):
+    """Construye la factura con ReportLab y devuelve los bytes del PDF."""
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
     elements = []
@@ -153,9 +160,7 @@ def generate_invoice_pdf(invoice):
     doc.build(elements)
     pdf = buffer.getvalue()
     buffer.close()
-    response = HttpResponse(content_type="application/pdf")
-    response.write(pdf)
-    return response
+    return pdf
 
 
 
@@ -1,8 +1,11 @@
 from django.contrib import admin, messages
 from django.urls import path, reverse
 from django.shortcuts import redirect
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from quotations.pdf_utils import generate_quotation_pdf
-from quotations.models import Quotation, QuotationItem, QuotationExpense
+from quotations.pdf_export import stream_quotation_pdfs_zip
+from quotations.models import Quotation, QuotationItem, QuotationExpense, PDFRenderJob
 from decimal import Decimal,ROUND_HALF_UP
 
 
@@ -22,18 +25,28 @@ class QuotationExpenseInline(admin.TabularInline):
 @admin.register(Quotation)
 class QuotationAdmin(admin.ModelAdmin):
     list_display = ("id", "customer_name", "currency", "subtotal", "total", "date", "status", "updated_at")
-    list_filter = ("currency", "date", "status")
+    list_filter = ("currency", "date", "status", "company")
+    readonly_fields = ("subtotal", "tax", "total")
     inlines = [QuotationItemInline, QuotationExpenseInline]
-    actions = ["recalculate_prices_action", "confirm_quotation_action"]
+    actions = ["recalculate_prices_action", "confirm_quotation_action", "export_pdfs_zip_action"]
 
 
     @admin.action(description="🔁 Recalcular precios con valores del mercado")
     def recalculate_prices_action(self, request, queryset):
-        total_updated = 0
-        for quotation in queryset:
-            quotation.calculate_totals()
-            total_updated += 1
-        self.message_user(request, f"✅ {total_updated} cotización(es) actualizada(s) con los nuevos precios del mercado.", messages.SUCCESS)
+        from quotations.repricing import reprice_draft_quotations
+        result = reprice_draft_quotations(queryset)
+        self.message_user(
+            request,
+            f"✅ {result['items']} item(s) con nuevo precio de mercado; "
+            f"{result['quotations']} cotización(es) en borrador actualizada(s).",
+            messages.SUCCESS,
+        )
+        if result["skipped_currencies"]:
+            self.message_user(
+                request,
+                f"⚠️ Sin tipo de cambio para: {', '.join(result['skipped_currencies'])}. Esas cotizaciones no se modificaron.",
+                messages.WARNING,
+            )
     
     @admin.action(description="✅ Confirmar cotización y generar venta")
     def confirm_quotation_action(modeladmin, request, queryset):
@@ -48,6 +61,15 @@ class QuotationAdmin(admin.ModelAdmin):
             messages.SUCCESS
         )
     
+    @admin.action(description="🗜️ Descargar PDFs seleccionados (ZIP)")
+    def export_pdfs_zip_action(self, request, queryset):
+        response = StreamingHttpResponse(
+            stream_quotation_pdfs_zip(queryset.order_by("-date", "-id")),
+            content_type="application/zip",
+        )
+        response["Content-Disposition"] = f'attachment; filename="cotizaciones_{timezone.now():%Y%m%d_%H%M}.zip"'
+        return response
+
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
@@ -98,5 +120,9 @@ class QuotationAdmin(admin.ModelAdmin):
     
 
 
-
-
+@admin.register(PDFRenderJob)
+class PDFRenderJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "document_type", "object_id", "status", "requested_by", "created_at", "finished_at")
+    list_filter = ("document_type", "status")
+    readonly_fields = ("id", "document_type", "object_id", "status", "pdf_file", "error",
+                       "requested_by", "created_at", "started_at", "finished_at")
@@ -0,0 +1,112 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from quotations.models import QuotationExpense, QuotationItem
+
+
+# Una fila por línea (item o gasto); los datos de la cotización se repiten en cada una
+EXPORT_COLUMNS = [
+    "quotation_id", "date", "company", "customer_name", "customer_email", "currency",
+    "status", "subtotal", "tax", "total",
+    "line_type", "line_id", "product_id", "name", "category", "quantity", "unit_price", "line_total",
+]
+
+# Se acumulan filas hasta este tamaño antes de entregarlas al servidor
+FLUSH_BYTES = 64 * 1024
+
+
+class _Echo:
+    """Pseudo-archivo para `csv.writer`: devuelve lo escrito en lugar de guardarlo."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=500):
+    """
+    Recorre las cotizaciones con `iterator(chunk_size=...)` (el prefetch se hace
+    por bloque) y devuelve un dict plano por cada item o gasto.
+    Las cotizaciones sin líneas salen en una sola fila con las columnas de línea vacías.
+    """
+    queryset = queryset.select_related("company").prefetch_related(
+        Prefetch("items", queryset=QuotationItem.objects.select_related("product").order_by("pk")),
+        Prefetch("expenses", queryset=QuotationExpense.objects.order_by("pk")),
+    )
+
+    for quotation in queryset.iterator(chunk_size=chunk_size):
+        header = {
+            "quotation_id": quotation.pk,
+            "date": quotation.date,
+            "company": quotation.company.name if quotation.company else None,
+            "customer_name": quotation.customer_name,
+            "customer_email": quotation.customer_email,
+            "currency": quotation.currency,
+            "status": quotation.status,
+            "subtotal": quotation.subtotal,
+            "tax": quotation.tax,
+            "total": quotation.total,
+        }
+
+        lines = 0
+        for item in quotation.items.all():
+            lines += 1
+            yield {
+                **header,
+                "line_type": "item",
+                "line_id": item.pk,
+                "product_id": item.product_id,
+                "name": item.product.name,
+                "category": None,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "line_total": item.line_total(),
+            }
+        for expense in quotation.expenses.all():
+            lines += 1
+            yield {
+                **header,
+                "line_type": "expense",
+                "line_id": expense.pk,
+                "product_id": None,
+                "name": expense.name,
+                "category": expense.category,
+                "quantity": expense.quantity,
+                "unit_price": expense.unit_cost,
+                "line_total": expense.total_cost,
+            }
+
+        if not lines:
+            yield {**header, **{column: None for column in EXPORT_COLUMNS if column not in header}}
+
+
+def stream_quotations_csv(queryset, chunk_size=500):
+    """Genera el CSV por bloques de ~64 KB; la primera fila son los encabezados."""
+    writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_COLUMNS)
+    yield from _buffered([writer.writeheader()],
+                         (writer.writerow(row) for row in export_rows(queryset, chunk_size)))
+
+
+def stream_quotations_ndjson(queryset, chunk_size=500):
+    """Genera NDJSON (un objeto JSON por línea) por bloques de ~64 KB."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    yield from _buffered([], (encoder.encode(row) + "\n" for row in export_rows(queryset, chunk_size)))
+
+
+def _buffered(head, lines):
+    # El encabezado sale de inmediato: el cliente empieza a recibir bytes antes de la primera consulta
+    if head:
+        yield "".join(head).encode("utf-8")
+
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer.clear()
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
@@ -0,0 +1,19 @@
+from rest_framework import filters
+
+
+class QuotationSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter sobre `search_fields` que además, si la búsqueda es solo un
+    número (o "#número"), incluye la cotización con ese folio (id), como hacía
+    el filtro del frontend antes de paginar en el servidor.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        results = super().filter_queryset(request, queryset, view)
+        terms = self.get_search_terms(request)
+        if len(terms) != 1:
+            return results
+        folio = terms[0].lstrip("#")
+        if not folio.isdigit():
+            return results
+        return results | queryset.filter(pk=int(folio))
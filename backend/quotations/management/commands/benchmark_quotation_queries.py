@@ -0,0 +1,139 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from companies.models import Company
+from quotations.models import Quotation
+
+
+# Marca de los datos sembrados: en `notes` de las cotizaciones y en `address` de las empresas.
+# Solo se borra lo que la lleva, nunca por nombre.
+BENCHMARK_MARK = "__benchmark__"
+
+
+class Command(BaseCommand):
+    help = (
+        "📊 Siembra cotizaciones de prueba (1,000,000 por defecto) y muestra los planes "
+        "de ejecución (EXPLAIN ANALYZE) de los filtros y búsquedas del listado"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Cotizaciones a sembrar.")
+        parser.add_argument("--companies", type=int, default=50, help="Empresas entre las que se reparten.")
+        parser.add_argument("--keep", action="store_true", help="No borrar los datos sembrados al terminar.")
+        parser.add_argument("--skip-seed", action="store_true", help="Reutilizar datos sembrados con --keep.")
+        parser.add_argument("--force", action="store_true", help="Permitir la ejecución con DEBUG=False.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("El benchmark requiere PostgreSQL.")
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("Con DEBUG=False se necesita --force: el comando inserta y borra datos.")
+
+        if options["skip_seed"]:
+            company_ids = list(
+                Company.objects.filter(address=BENCHMARK_MARK).order_by("pk").values_list("pk", flat=True)
+            )
+        else:
+            company_ids = self.seed(options["rows"], options["companies"])
+        if not company_ids:
+            raise CommandError("No hay datos sembrados. Ejecute sin --skip-seed.")
+
+        try:
+            self.explain_all(Company.objects.get(pk=company_ids[0]))
+        finally:
+            if not options["keep"]:
+                self.cleanup(company_ids)
+
+    # ------------------------------------------------------------------
+    # Datos de prueba
+    # ------------------------------------------------------------------
+    def seed(self, rows, companies):
+        """Siembra las cotizaciones y devuelve los ids de las empresas creadas."""
+        self.stdout.write(f"⏳ Sembrando {rows:,} cotizaciones en {companies} empresas...")
+
+        with transaction.atomic():
+            company_ids = [
+                Company.objects.create(name=f"Benchmark {n}", address=BENCHMARK_MARK).pk
+                for n in range(1, companies + 1)
+            ]
+            table = connection.ops.quote_name(Quotation._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (
+                        customer_name, customer_email, date, currency, subtotal, tax, total,
+                        notes, company_id, created_at, updated_at, status
+                    )
+                    SELECT
+                        'Cliente ' || substr(md5(g::text), 1, 12),
+                        'cliente' || g || '@' || substr(md5((g %% 997)::text), 1, 8) || '.mx',
+                        %s::date - (g %% 1095),
+                        'MXN', 0, 0, 0,
+                        %s,
+                        (%s::bigint[])[1 + g %% %s],
+                        now(), now(),
+                        (ARRAY['draft', 'confirmed', 'cancelled'])[1 + g %% 3]
+                    FROM generate_series(1, %s) AS g
+                    """,
+                    [datetime.date.today(), BENCHMARK_MARK, company_ids, len(company_ids), rows],
+                )
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {table}")
+        self.stdout.write("✅ Datos sembrados y estadísticas actualizadas.")
+        return company_ids
+
+    def cleanup(self, company_ids):
+        """Borra solo las cotizaciones marcadas de las empresas sembradas, y esas empresas."""
+        self.stdout.write("\n🧹 Borrando datos de prueba...")
+        table = connection.ops.quote_name(Quotation._meta.db_table)
+        with connection.cursor() as cursor:
+            # Las filas sembradas no tienen items, gastos ni ventas: DELETE directo
+            cursor.execute(
+                f"DELETE FROM {table} WHERE notes = %s AND company_id = ANY(%s::bigint[])",
+                [BENCHMARK_MARK, list(company_ids)],
+            )
+        Company.objects.filter(pk__in=company_ids, address=BENCHMARK_MARK).delete()
+
+    # ------------------------------------------------------------------
+    # Planes de ejecución
+    # ------------------------------------------------------------------
+    def explain_all(self, company):
+        today = datetime.date.today()
+        last_quarter = today - datetime.timedelta(days=90)
+        base = Quotation.objects.order_by("-date", "-id")
+        search = "AB12"
+
+        scenarios = [
+            (
+                "Empresa + rango de fechas",
+                base.filter(company=company, date__gte=last_quarter, date__lte=today),
+            ),
+            (
+                "Empresa + estado + rango de fechas",
+                base.filter(company=company, status="draft", date__gte=last_quarter, date__lte=today),
+            ),
+            (
+                "Estado + rango de fechas (admin/soporte)",
+                base.filter(status="confirmed", date__gte=last_quarter, date__lte=today),
+            ),
+            (
+                "Búsqueda por cliente o correo (SearchFilter)",
+                base.filter(Q(customer_name__icontains=search) | Q(customer_email__icontains=search)),
+            ),
+            (
+                "Empresa + búsqueda",
+                base.filter(
+                    Q(customer_name__icontains=search) | Q(customer_email__icontains=search),
+                    company=company,
+                ),
+            ),
+        ]
+
+        for title, queryset in scenarios:
+            self.stdout.write(f"\n🔎 {title}")
+            self.stdout.write(queryset[:50].explain(analyze=True, buffers=True))
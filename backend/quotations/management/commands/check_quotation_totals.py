@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from quotations.models import Quotation
+
+
+class Command(BaseCommand):
+    help = "🧮 Detecta cotizaciones con totales desfasados respecto a sus líneas y los corrige"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo reporta las diferencias, sin corregirlas.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Cantidad de cotizaciones corregidas por cada UPDATE.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("⏳ Buscando cotizaciones con totales desfasados...")
+
+        drifted = (
+            Quotation.objects.with_drifted_totals()
+            .order_by("pk")
+            .values_list("pk", "total", "expected_total")
+        )
+
+        drifted_ids = []
+        for pk, total, expected_total in drifted.iterator(chunk_size=options["batch_size"]):
+            drifted_ids.append(pk)
+            if options["verbosity"] > 1:
+                self.stdout.write(f"   #{pk}: total guardado {total} → esperado {expected_total}")
+
+        if not drifted_ids:
+            self.stdout.write("✅ Todas las cotizaciones tienen totales consistentes.")
+            return
+
+        self.stdout.write(f"⚠️ {len(drifted_ids)} cotización(es) con totales desfasados.")
+        if options["dry_run"]:
+            return
+
+        fixed = 0
+        batch_size = options["batch_size"]
+        for start in range(0, len(drifted_ids), batch_size):
+            batch = drifted_ids[start:start + batch_size]
+            fixed += Quotation.objects.filter(pk__in=batch).recalculate_totals()
+
+        self.stdout.write(f"🎯 {fixed} cotización(es) corregida(s).")
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quotations.rendering import expire_render_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "🧹 Borra los PDFRenderJob terminados hace más de PDF_RENDER_JOB_RETENTION segundos "
+        "y los archivos huérfanos de pdf_jobs/"
+    )
+
+    def handle(self, *args, **options):
+        removed = expire_render_jobs()
+        hours = settings.PDF_RENDER_JOB_RETENTION / 3600
+        self.stdout.write(f"✅ {removed} job(s) de PDF con más de {hours:g} h eliminados.")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from quotations.repricing import reprice_draft_quotations
+
+
+class Command(BaseCommand):
+    help = "💹 Recalcula las cotizaciones en borrador con el último precio de los metales y tipo de cambio"
+
+    def handle(self, *args, **options):
+        self.stdout.write("⏳ Recalculando cotizaciones en borrador con precios de mercado...")
+        result = reprice_draft_quotations()
+
+        for currency in result["skipped_currencies"]:
+            self.stdout.write(f"⚠️ Sin tipo de cambio USD → {currency}: esas cotizaciones se omitieron.")
+
+        self.stdout.write(
+            f"✅ {result['items']} item(s) actualizados en {result['quotations']} cotización(es)."
+        )
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_company_rfc'),
+        ('quotations', '0008_quotation_cancellation_reason'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['date', 'id'], name='quotation_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['company', 'date', 'id'], name='quotation_company_date_id_idx'),
+        ),
+    ]
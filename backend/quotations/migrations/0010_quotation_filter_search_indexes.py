@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:27
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Los índices se crean con CONCURRENTLY para no bloquear escrituras en tablas grandes
+    atomic = False
+
+    dependencies = [
+        ('companies', '0002_company_rfc'),
+        ('quotations', '0009_quotation_cursor_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='quotation',
+            index=models.Index(fields=['company', 'status', 'date', 'id'], name='quotation_co_status_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='quotation',
+            index=models.Index(fields=['status', 'date', 'id'], name='quotation_status_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='quotation',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('customer_name'), name='gin_trgm_ops'), name='quotation_customer_name_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='quotation',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('customer_email'), name='gin_trgm_ops'), name='quotation_customer_email_trgm'),
+        ),
+    ]
@@ -1,14 +1,114 @@
-from django.db import models
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import models, transaction
+from django.db.models import Count, DecimalField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Now, Round, Upper
 from django.utils import timezone
 from decimal import Decimal, ROUND_HALF_UP
 from core.models import Product
 from services.models import MetalPrice, CurrencyRate
 from companies.models import Company
+from core.events import StatusEventMixin
 
 
 MONEY_FIELD = dict(max_digits=14, decimal_places=2, default=0)
+TAX_RATE = Decimal("0.16")
+
+
+def _line_subtotal_expression():
+    """
+    Expresión SQL con la suma de productos (cantidad × precio unitario)
+    más la suma de insumos/servicios de cada cotización.
+    """
+    money = DecimalField(max_digits=14, decimal_places=2)
+    items = (
+        QuotationItem.objects.filter(quotation=OuterRef("pk"))
+        .order_by()
+        .values("quotation")
+        .annotate(s=Sum(F("quantity") * F("unit_price"), output_field=money))
+        .values("s")
+    )
+    expenses = (
+        QuotationExpense.objects.filter(quotation=OuterRef("pk"))
+        .order_by()
+        .values("quotation")
+        .annotate(s=Sum("total_cost"))
+        .values("s")
+    )
+    zero = Value(Decimal("0.00"), output_field=money)
+    return Coalesce(Subquery(items), zero) + Coalesce(Subquery(expenses), zero)
+
+
+def _totals_expressions(subtotal):
+    """Subtotal, IVA y total redondeados a partir de una expresión de subtotal."""
+    tax = Round(subtotal * Value(TAX_RATE), 2)
+    return {
+        "subtotal": Round(subtotal, 2),
+        "tax": tax,
+        "total": Round(subtotal + tax, 2),
+    }
+
+
+class QuotationQuerySet(models.QuerySet):
+    def with_line_subtotal(self):
+        """Anota `line_subtotal` calculado en la base de datos."""
+        return self.annotate(line_subtotal=_line_subtotal_expression())
+
+    def with_item_count(self):
+        """Anota `item_count` con una subconsulta (sin GROUP BY sobre la cotización)."""
+        items = (
+            QuotationItem.objects.filter(quotation=OuterRef("pk"))
+            .order_by()
+            .values("quotation")
+            .annotate(n=Count("pk"))
+            .values("n")
+        )
+        return self.annotate(item_count=Coalesce(Subquery(items), 0))
+
+    def with_products_updated_at(self):
+        """Anota `products_updated_at`: el `updated_at` más reciente de los productos de sus items."""
+        latest = (
+            QuotationItem.objects.filter(quotation=OuterRef("pk"))
+            .order_by()
+            .values("quotation")
+            .annotate(ts=Max("product__updated_at"))
+            .values("ts")
+        )
+        return self.annotate(products_updated_at=Subquery(latest))
+
+    def with_expected_totals(self):
+        """Anota `expected_subtotal`, `expected_tax` y `expected_total` según las líneas."""
+        expressions = _totals_expressions(_line_subtotal_expression())
+        return self.annotate(**{f"expected_{name}": expr for name, expr in expressions.items()})
+
+    def with_drifted_totals(self):
+        """Cotizaciones cuyos totales guardados no coinciden con sus líneas."""
+        return self.with_expected_totals().exclude(
+            subtotal=F("expected_subtotal"),
+            tax=F("expected_tax"),
+            total=F("expected_total"),
+        )
+
+    def recalculate_totals(self):
+        """
+        Recalcula subtotal, IVA y total de todas las cotizaciones del queryset
+        en un solo UPDATE. ROUND de PostgreSQL redondea la mitad alejándose
+        de cero, igual que ROUND_HALF_UP.
+        Devuelve el número de cotizaciones actualizadas.
+        """
+        return self.update(**_totals_expressions(_line_subtotal_expression()), updated_at=Now())
+
+    def apply_subtotal_delta(self, delta):
+        """
+        Suma `delta` al subtotal guardado y recalcula IVA y total en el mismo
+        UPDATE, sin volver a recorrer las líneas de la cotización.
+        """
+        return self.update(**_totals_expressions(F("subtotal") + Value(delta)), updated_at=Now())
 
-class Quotation(models.Model):
+
+class Quotation(StatusEventMixin, models.Model):
     customer_name = models.CharField("Cliente", max_length=100)
     customer_email = models.EmailField("Correo del cliente", blank=True, null=True)
     date = models.DateField("Fecha", default=timezone.now)
@@ -40,31 +140,43 @@ class Quotation(models.Model):
     cancelled_at = models.DateTimeField(null=True, blank=True)
     cancellation_reason = models.TextField(null=True, blank=True)
 
+    objects = QuotationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Paginación por cursor (keyset) sobre (date, id)
+            models.Index(fields=["date", "id"], name="quotation_date_id_idx"),
+            models.Index(fields=["company", "date", "id"], name="quotation_company_date_id_idx"),
+            # Filtros del listado: empresa + estado + rango de fechas (y estado solo, para admin/soporte)
+            models.Index(fields=["company", "status", "date", "id"], name="quotation_co_status_date_idx"),
+            models.Index(fields=["status", "date", "id"], name="quotation_status_date_idx"),
+            # Búsqueda `icontains` (UPPER(col) LIKE UPPER('%...%')) con trigramas
+            GinIndex(
+                OpClass(Upper("customer_name"), name="gin_trgm_ops"),
+                name="quotation_customer_name_trgm",
+            ),
+            GinIndex(
+                OpClass(Upper("customer_email"), name="gin_trgm_ops"),
+                name="quotation_customer_email_trgm",
+            ),
+        ]
+
     def calculate_totals(self):
         """
         Calcula el subtotal, impuestos y total general de la cotización.
         Incluye tanto productos (QuotationItem) como insumos/servicios (QuotationExpense).
         """
 
-        # --- Subtotales individuales ---
-        subtotal_items = Decimal("0.00")
-        subtotal_expenses = Decimal("0.00")
-
-        # 🧱 Productos principales
-        for item in self.items.all():
-            subtotal_items += Decimal(item.quantity) * Decimal(item.unit_price)
-
-        # 🧰 Insumos y servicios asociados
-        if hasattr(self, "expenses"):
-            for exp in self.expenses.all():
-                subtotal_expenses += Decimal(exp.total_cost or 0)
-
-        # --- Subtotal general ---
-        subtotal = subtotal_items + subtotal_expenses
+        # --- Subtotal general (una sola consulta de agregación) ---
+        subtotal = (
+            Quotation.objects.filter(pk=self.pk)
+            .with_line_subtotal()
+            .values_list("line_subtotal", flat=True)
+            .get()
+        )
 
         # --- Impuesto (IVA 16%) ---
-        tax_rate = Decimal("0.16")
-        tax = (subtotal * tax_rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        tax = (subtotal * TAX_RATE).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
         # --- Total general ---
         total = (subtotal + tax).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
@@ -73,7 +185,7 @@ class Quotation(models.Model):
         self.subtotal = subtotal.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
         self.tax = tax.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
         self.total = total
-        self.save(update_fields=["subtotal", "tax", "total"])
+        self.save(update_fields=["subtotal", "tax", "total", "updated_at"])
 
         return subtotal, tax, total
 
@@ -93,30 +205,116 @@ class Quotation(models.Model):
         return self.sale
 
     def save(self, *args, **kwargs):
+        stamped = []
         if self.status == "confirmed" and not self.confirmed_at:
             self.confirmed_at = timezone.now()
+            stamped.append("confirmed_at")
         elif self.status == "cancelled" and not self.cancelled_at:
             self.cancelled_at = timezone.now()
-       
+            stamped.append("cancelled_at")
+
+        # 🏷️ En guardados parciales `auto_now` solo corre si `updated_at` está en la lista:
+        # sin él, el ETag / Last-Modified (ConditionalGetMixin) no cambiaría y el cliente
+        # seguiría recibiendo 304 con la versión anterior.
+        update_fields = kwargs.get("update_fields")
+        if update_fields:
+            kwargs["update_fields"] = {*update_fields, *stamped, "updated_at"}
+
         super().save(*args, **kwargs)
 
+    # 📡 Cada cambio de estado se avisa en vivo (core.events, /api/events/)
+    status_event_topic = "quotations"
+
+    def status_event_data(self):
+        return {"id": self.pk, "company_id": self.company_id}
 
     def __str__(self):
         return f"Cotización #{self.id} - {self.customer_name}"
 
 
-class QuotationItem(models.Model):
+class QuotationLineMixin:
+    """
+    Mantiene actualizados los totales de la cotización cuando una línea se crea,
+    se modifica o se elimina, aplicando solo la diferencia de su importe.
+    Las operaciones masivas (bulk_create, bulk_update, QuerySet.delete) no pasan
+    por aquí y deben recalcular con `Quotation.calculate_totals`.
+
+    Cada modelo indica en `LINE_FIELDS` sus campos (cantidad, precio unitario);
+    el importe de la línea es su producto redondeado a centavos.
+    """
+
+    LINE_FIELDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if len(cls.LINE_FIELDS) != 2:
+            raise TypeError(f"{cls.__name__}.LINE_FIELDS debe ser (campo de cantidad, campo de precio unitario)")
+
+    def line_total(self):
+        quantity_field, price_field = self.LINE_FIELDS
+        quantity = Decimal(getattr(self, quantity_field) or 0)
+        price = Decimal(getattr(self, price_field) or 0)
+        return (quantity * price).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_line()
+        return instance
+
+    def _remember_line(self):
+        deferred = self.get_deferred_fields()
+        if "quotation_id" in deferred or deferred.intersection(self.LINE_FIELDS):
+            self._loaded_line = None
+        else:
+            self._loaded_line = (self.quotation_id, self.line_total())
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        previous = getattr(self, "_loaded_line", None)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            if not adding and previous is None:
+                # No conocemos el importe anterior: recálculo completo de esa cotización
+                Quotation.objects.filter(pk=self.quotation_id).recalculate_totals()
+            else:
+                deltas = {self.quotation_id: self.line_total()}
+                if previous is not None:
+                    old_quotation_id, old_total = previous
+                    deltas[old_quotation_id] = deltas.get(old_quotation_id, Decimal("0.00")) - old_total
+                for quotation_id, delta in deltas.items():
+                    Quotation.objects.filter(pk=quotation_id).apply_subtotal_delta(delta)
+
+        self._remember_line()
+
+    def delete(self, *args, **kwargs):
+        previous = getattr(self, "_loaded_line", None) or (self.quotation_id, self.line_total())
+
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            quotation_id, old_total = previous
+            Quotation.objects.filter(pk=quotation_id).apply_subtotal_delta(-old_total)
+
+        self._loaded_line = None
+        return result
+
+
+class QuotationItem(QuotationLineMixin, models.Model):
     quotation = models.ForeignKey(Quotation, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     unit_price = models.DecimalField(**MONEY_FIELD)
 
+    LINE_FIELDS = ("quantity", "unit_price")
+
     def __str__(self):
         return f"{self.quantity} × {self.product.name}"
 
 
 
-class QuotationExpense(models.Model):
+class QuotationExpense(QuotationLineMixin, models.Model):
     quotation = models.ForeignKey("Quotation", on_delete=models.CASCADE, related_name="expenses")
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
@@ -132,6 +330,8 @@ class QuotationExpense(models.Model):
     ]
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default="other")
 
+    LINE_FIELDS = ("quantity", "unit_cost")
+
     def save(self, *args, **kwargs):
         self.total_cost = self.quantity * self.unit_cost
         super().save(*args, **kwargs)
@@ -139,3 +339,43 @@ class QuotationExpense(models.Model):
     def __str__(self):
         return f"{self.name} ({self.category})"
 
+
+class PDFRenderJob(models.Model):
+    """Generación de un PDF en segundo plano (ver `quotations.rendering`)."""
+
+    DOCUMENT_CHOICES = [
+        ("quotation", "Cotización"),
+        ("invoice", "Factura"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pendiente"),
+        ("running", "Generando"),
+        ("done", "Terminado"),
+        ("failed", "Fallido"),
+    ]
+    ACTIVE_STATUSES = ("pending", "running")
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    document_type = models.CharField(max_length=20, choices=DOCUMENT_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    pdf_file = models.FileField(upload_to="pdf_jobs/", blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="pdf_render_jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["document_type", "object_id", "status"], name="pdfjob_document_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"PDF {self.get_document_type_display()} #{self.object_id} ({self.status})"
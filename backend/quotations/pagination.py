@@ -0,0 +1,83 @@
+from datetime import date
+
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class QuotationCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) sobre (date, id).
+
+    El cursor guarda la fecha y el id de la última fila entregada y la siguiente
+    página se obtiene con `(date, id) < (fecha, id)`, que PostgreSQL resuelve
+    directamente sobre los índices compuestos (date, id) y (company, date, id).
+    A diferencia de LIMIT/OFFSET o del offset que usa DRF para desempatar,
+    la página N cuesta lo mismo que la página 1.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-date", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+
+        if self.cursor is not None:
+            position_date, position_id = self._parse_position(self.cursor.position)
+            queryset = queryset.filter(
+                _row_compare(queryset.model, ">" if reverse else "<", position_date, position_id)
+            )
+
+        ordering = ("date", "id") if reverse else ("-date", "-id")
+        rows = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._position(self.page[0])))
+
+    def _position(self, obj):
+        return f"{obj.date.isoformat()}|{obj.pk}"
+
+    def _parse_position(self, position):
+        try:
+            raw_date, raw_id = position.split("|")
+            return date.fromisoformat(raw_date), int(raw_id)
+        except (AttributeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+def _row_compare(model, operator, position_date, position_id):
+    """Condición `(date, id) <op> (%s, %s)` como comparación de filas de SQL."""
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    sql = f"({table}.{qn('date')}, {table}.{qn('id')}) {operator} (%s, %s)"
+    return RawSQL(sql, (position_date, position_id), output_field=BooleanField())
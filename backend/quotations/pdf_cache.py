@@ -0,0 +1,151 @@
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Max
+
+from quotations.pdf_utils import render_quotation_pdf
+
+
+# Cambiar este valor invalida todos los PDFs en caché (p. ej. al modificar el diseño)
+PDF_LAYOUT_VERSION = "1"
+
+
+def quotation_pdf_cache_key(quotation):
+    """
+    Clave del PDF: id + `updated_at` de la cotización + `updated_at` más
+    reciente de los productos que imprime (nombre, unidad...) + versión del
+    logo y datos de la empresa emisora. Cualquier cambio produce un archivo nuevo.
+
+    Es la misma señal que el ETag del detalle (`conditional_timestamp_fields`),
+    así que ambas cachés se invalidan juntas. Si la cotización viene de
+    `with_products_updated_at()` no se hace ninguna consulta extra.
+    """
+    try:
+        products_updated_at = quotation.products_updated_at
+    except AttributeError:
+        products_updated_at = type(quotation).objects.filter(pk=quotation.pk).aggregate(
+            ts=Max("items__product__updated_at")
+        )["ts"]
+
+    company = quotation.company
+    company_version = ""
+    if company:
+        logo_version = ""
+        if company.logo:
+            try:
+                stat = os.stat(company.logo.path)
+                logo_version = f"{company.logo.name}:{stat.st_mtime_ns}:{stat.st_size}"
+            except (OSError, ValueError):
+                logo_version = company.logo.name
+        company_version = "|".join(
+            str(value or "")
+            for value in (company.pk, company.name, company.address, company.phone,
+                          company.email, company.website, logo_version)
+        )
+
+    raw = "|".join([
+        PDF_LAYOUT_VERSION,
+        str(quotation.pk),
+        quotation.updated_at.isoformat() if quotation.updated_at else "",
+        products_updated_at.isoformat() if products_updated_at else "",
+        company_version,
+        str(datetime.now().year),  # el pie del PDF incluye el año
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def open_quotation_pdf(quotation):
+    """
+    Devuelve el PDF de la cotización como archivo abierto en modo binario.
+    Si ya está en caché se abre directamente (sin tocar ReportLab); si no,
+    se genera, se guarda de forma atómica y se aplica el límite de tamaño.
+    """
+    cache_dir = Path(settings.QUOTATION_PDF_CACHE_DIR)
+    path = cache_dir / f"{quotation.pk}-{quotation_pdf_cache_key(quotation)}.pdf"
+
+    try:
+        pdf_file = open(path, "rb")
+    except FileNotFoundError:
+        pass
+    else:
+        _touch(path)
+        return pdf_file
+
+    pdf = render_quotation_pdf(quotation)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    _write_atomic(path, pdf)
+    _remove_stale_versions(cache_dir, quotation.pk, keep=path)
+    evict_quotation_pdf_cache(keep=path)
+    return open(path, "rb")
+
+
+def evict_quotation_pdf_cache(max_bytes=None, keep=None):
+    """
+    Borra los PDFs usados hace más tiempo (LRU por fecha de modificación,
+    que se actualiza en cada acierto) hasta quedar bajo el límite de tamaño.
+    Devuelve la cantidad de archivos eliminados.
+    """
+    cache_dir = Path(settings.QUOTATION_PDF_CACHE_DIR)
+    if max_bytes is None:
+        max_bytes = settings.QUOTATION_PDF_CACHE_MAX_BYTES
+
+    try:
+        entries = [entry for entry in os.scandir(cache_dir) if entry.name.endswith(".pdf")]
+    except FileNotFoundError:
+        return 0
+
+    files = []
+    total = 0
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+        total += stat.st_size
+
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if keep is not None and path == keep:
+            continue
+        _unlink(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _write_atomic(path, content):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _unlink(Path(tmp_path))
+        raise
+
+
+def _remove_stale_versions(cache_dir, quotation_id, keep):
+    for path in cache_dir.glob(f"{quotation_id}-*.pdf"):
+        if path != keep:
+            _unlink(path)
+
+
+def _unlink(path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,61 @@
+import zipfile
+
+from quotations.pdf_cache import open_quotation_pdf
+
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class _ZipSink:
+    """
+    Destino de solo escritura para `zipfile`: acumula lo escrito hasta que el
+    generador lo entrega. Al no tener `seek`, zipfile usa descriptores de datos
+    y nunca necesita volver atrás, así que el ZIP se puede transmitir.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_quotation_pdfs_zip(queryset, chunk_size=200):
+    """
+    Genera un ZIP con el PDF de cada cotización del queryset, por bloques.
+    Los PDFs salen de la caché en disco (o se generan si no están), y nunca hay
+    más de un bloque de lectura en memoria, sin importar cuántos documentos haya.
+    """
+    sink = _ZipSink()
+    # Los PDFs ya vienen comprimidos: ZIP_STORED evita gastar CPU en recomprimirlos
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        quotations = queryset.select_related("company").with_products_updated_at()
+        for quotation in quotations.iterator(chunk_size=chunk_size):
+            with open_quotation_pdf(quotation) as pdf_file:
+                with archive.open(f"cotizacion_{quotation.pk}.pdf", mode="w") as entry:
+                    for block in iter(lambda: pdf_file.read(READ_BLOCK_SIZE), b""):
+                        entry.write(block)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+
+    data = sink.drain()
+    if data:
+        yield data
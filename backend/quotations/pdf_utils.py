@@ -1,5 +1,5 @@
 from io import BytesIO
-from django.http import HttpResponse
+from django.http import FileResponse
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
@@ -8,6 +8,22 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle,
 from datetime import datetime
 
 def generate_quotation_pdf(quotation):
+    """
+    Respuesta de descarga del PDF de la cotización.
+    Se sirve desde la caché en disco si la cotización no ha cambiado.
+    """
+    from quotations.pdf_cache import open_quotation_pdf
+
+    return FileResponse(
+        open_quotation_pdf(quotation),
+        as_attachment=True,
+        filename=f"cotizacion_{quotation.id}.pdf",
+        content_type="application/pdf",
+    )
+
+
+def render_quotation_pdf(quotation):
+    """Construye el documento con ReportLab y devuelve los bytes del PDF."""
     buffer = BytesIO()
     doc = SimpleDocTemplate(
         buffer,
@@ -180,7 +196,6 @@ def generate_quotation_pdf(quotation):
 
     doc.build(elements)
 
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="cotizacion_{quotation.id}.pdf"'
-    return response
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
@@ -10,8 +10,8 @@ class QuotationPermission(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        # Lectura siempre permitida
-        if view.action in ["list", "retrieve"]:
+        # Lectura siempre permitida (incluye generar el PDF)
+        if view.action in ["list", "retrieve", "render_pdf", "export_pdfs", "export"]:
             return True
 
         # Crear cotizaciones → vendedor, gerente o admin
@@ -0,0 +1,195 @@
+"""
+Servicio de generación de PDFs en segundo plano.
+
+ReportLab es CPU-bound: si se ejecuta dentro del hilo de la petición bloquea al
+worker web (y al GIL). Aquí cada documento se construye en un pool de procesos
+y el resultado se guarda en `PDFRenderJob.pdf_file`; la API solo crea el job y
+devuelve su id de inmediato.
+
+Cada usuario consulta solo sus propios jobs. Los jobs terminados se borran
+(con su archivo en `pdf_jobs/`) después de PDF_RENDER_JOB_RETENTION segundos.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+
+# Este módulo se importa en los procesos hijos antes de `django.setup()`
+# (al deserializar el initializer), por eso los modelos se importan en cada función.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Pool de procesos compartido por el proceso web (se crea al primer uso)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PDF_RENDER_WORKERS,
+                # "spawn": los hijos no heredan conexiones a la base de datos ni hilos del padre
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def submit_render_job(document_type, object_id, user=None):
+    """
+    Crea (o reutiliza, si ese mismo usuario ya tiene uno en curso) el job para
+    el documento y lo envía al pool cuando la transacción actual se confirma.
+
+    Un job que sigue activo después de PDF_RENDER_JOB_TIMEOUT segundos quedó
+    huérfano (se reinició el servidor o murió un proceso del pool): se marca
+    como fallido y se crea uno nuevo.
+    """
+    from quotations.models import PDFRenderJob
+
+    requested_by = user if user and user.is_authenticated else None
+    with transaction.atomic():
+        # Dos peticiones simultáneas para el mismo documento no crean dos jobs
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(%s))",
+                [f"quotations.pdf_render_job:{document_type}:{object_id}"],
+            )
+
+        jobs = PDFRenderJob.objects.filter(document_type=document_type, object_id=object_id)
+        stale_before = timezone.now() - timedelta(seconds=settings.PDF_RENDER_JOB_TIMEOUT)
+        jobs.filter(status__in=PDFRenderJob.ACTIVE_STATUSES, created_at__lt=stale_before).update(
+            status="failed", error="El job no terminó a tiempo.", finished_at=timezone.now()
+        )
+
+        # Solo se reutilizan los jobs del mismo usuario: son los únicos que puede consultar
+        active = (
+            jobs.filter(status__in=PDFRenderJob.ACTIVE_STATUSES, requested_by=requested_by)
+            .order_by("-created_at")
+            .first()
+        )
+        if active:
+            return active
+
+        job = PDFRenderJob.objects.create(
+            document_type=document_type,
+            object_id=object_id,
+            requested_by=requested_by,
+        )
+        job_id = str(job.pk)
+        transaction.on_commit(lambda: _dispatch(job_id))
+        return job
+
+
+def _dispatch(job_id):
+    """Envía el job al pool; si un proceso murió y el pool quedó roto, se crea uno nuevo."""
+    global _executor
+    try:
+        get_executor().submit(render_job, job_id)
+    except BrokenProcessPool:
+        with _executor_lock:
+            _executor = None
+        get_executor().submit(render_job, job_id)
+
+
+def expire_render_jobs():
+    """
+    Borra los jobs terminados hace más de PDF_RENDER_JOB_RETENTION segundos
+    junto con su PDF, y los archivos de `pdf_jobs/` igual de viejos que ya no
+    pertenecen a ningún job. Devuelve el número de jobs borrados.
+    """
+    from quotations.models import PDFRenderJob
+
+    cutoff = timezone.now() - timedelta(seconds=settings.PDF_RENDER_JOB_RETENTION)
+    expired = list(
+        PDFRenderJob.objects.filter(status__in=["done", "failed"], finished_at__lt=cutoff)
+        .values_list("pk", "pdf_file")
+    )
+    for _, name in expired:
+        if name:
+            default_storage.delete(name)
+    PDFRenderJob.objects.filter(pk__in=[pk for pk, _ in expired]).delete()
+
+    directory = PDFRenderJob._meta.get_field("pdf_file").upload_to.rstrip("/")
+    try:
+        _, filenames = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return len(expired)
+    paths = [f"{directory}/{filename}" for filename in filenames]
+    in_use = set(PDFRenderJob.objects.filter(pdf_file__in=paths).values_list("pdf_file", flat=True))
+    for path in paths:
+        if path not in in_use and default_storage.get_modified_time(path) < cutoff:
+            default_storage.delete(path)
+    return len(expired)
+
+
+def render_job(job_id):
+    """Se ejecuta en un proceso del pool: genera el PDF y lo guarda en el job."""
+    from quotations.models import PDFRenderJob
+
+    close_old_connections()
+    try:
+        updated = PDFRenderJob.objects.filter(pk=job_id, status="pending").update(
+            status="running", started_at=timezone.now()
+        )
+        if not updated:
+            return
+
+        job = PDFRenderJob.objects.get(pk=job_id)
+        try:
+            pdf, filename = RENDERERS[job.document_type](job.object_id)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        else:
+            job.pdf_file.save(filename, ContentFile(pdf), save=False)
+            job.status = "done"
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "pdf_file", "finished_at"])
+
+        # 🧹 Limpieza de PDFs viejos, fuera del hilo de las peticiones
+        try:
+            expire_render_jobs()
+        except Exception:
+            # El PDF ya quedó guardado: una limpieza fallida se reintenta con el próximo job
+            pass
+    finally:
+        close_old_connections()
+
+
+def _render_quotation(object_id):
+    from quotations.models import Quotation
+    from quotations.pdf_cache import open_quotation_pdf
+
+    quotation = Quotation.objects.select_related("company").with_products_updated_at().get(pk=object_id)
+    with open_quotation_pdf(quotation) as pdf_file:
+        return pdf_file.read(), f"cotizacion_{quotation.pk}.pdf"
+
+
+def _render_invoice(object_id):
+    from invoices.models import Invoice
+    from invoices.pdf_utils import render_invoice_pdf
+
+    invoice = Invoice.objects.select_related("sale__quotation").get(pk=object_id)
+    return render_invoice_pdf(invoice), f"{invoice.invoice_number}.pdf"
+
+
+RENDERERS = {
+    "quotation": _render_quotation,
+    "invoice": _render_invoice,
+}
+
+
+def _init_worker():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smartquote.settings")
+    import django
+
+    django.setup()
@@ -0,0 +1,100 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, Value, When
+from django.db.models.functions import Upper
+
+from core.models import Product
+from core.pricing import metal_unit_prices
+from quotations.models import Quotation, QuotationItem
+from services.fx import usd_rates
+from services.price_table import current_price_table, load_metal_quotes
+
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def latest_metal_quotes():
+    """{símbolo: (precio_usd, cantidad base, unidad)} vigentes: de la tabla de precios compartida o, si no hay, de una consulta."""
+    table = current_price_table()
+    return table.metal_quotes() if table is not None else load_metal_quotes()
+
+
+def market_unit_prices_usd(metal_quotes):
+    """
+    Precio unitario en USD de cada producto ligado a un metal: su precio por
+    unidad de venta (`core.pricing.metal_unit_prices`, con conversión de
+    unidades) × (1 + margen / 100).
+    """
+    # Sin distinguir mayúsculas, igual que `metal_unit_prices` y `propagate_metal_prices`
+    symbols = {symbol.upper() for symbol in metal_quotes}
+    products = list(
+        Product.objects.alias(symbol_upper=Upper("metal_symbol")).filter(symbol_upper__in=symbols).values_list(
+            "pk", "metal_symbol", "unit", "metal_quantity", "metal_quantity_unit", "margin"
+        )
+    )
+    unit_prices = metal_unit_prices([row[:5] for row in products], metal_quotes)
+    return {
+        pk: unit_prices[pk] * (Decimal("1") + (margin or Decimal("0")) / Decimal("100"))
+        for pk, *_, margin in products
+        if pk in unit_prices
+    }
+
+
+@transaction.atomic
+def reprice_draft_quotations(queryset=None):
+    """
+    Recalcula con precios de mercado los items de las cotizaciones en borrador
+    cuyos productos tienen `metal_symbol`, y después sus totales.
+
+    El número de consultas no depende de cuántas cotizaciones haya: cuatro
+    lecturas (metales, tipos de cambio, productos y monedas en uso), un UPDATE
+    con CASE por moneda y un UPDATE final de totales solo para las cotizaciones
+    que cambiaron.
+    Las monedas sin tipo de cambio registrado se omiten.
+
+    Devuelve {"items": items actualizados, "quotations": cotizaciones recalculadas,
+    "skipped_currencies": [monedas sin tipo de cambio]}.
+    """
+    if queryset is None:
+        queryset = Quotation.objects.all()
+    drafts = queryset.filter(status="draft").order_by()
+
+    result = {"items": 0, "quotations": 0, "skipped_currencies": []}
+    metal_quotes = latest_metal_quotes()
+    unit_prices_usd = market_unit_prices_usd(metal_quotes) if metal_quotes else {}
+    if not unit_prices_usd:
+        return result
+
+    rates = usd_rates()
+    currencies = drafts.filter(items__product_id__in=unit_prices_usd).values_list("currency", flat=True).distinct()
+
+    for currency in currencies:
+        rate = rates.get(currency)
+        if rate is None:
+            result["skipped_currencies"].append(currency)
+            continue
+
+        new_price = Case(
+            *[
+                When(product_id=pk, then=Value(_money(price_usd * rate), output_field=MONEY))
+                for pk, price_usd in unit_prices_usd.items()
+            ],
+            output_field=MONEY,
+        )
+        result["items"] += (
+            QuotationItem.objects
+            .filter(quotation__in=drafts.filter(currency=currency), product_id__in=unit_prices_usd)
+            .exclude(unit_price=new_price)
+            .update(unit_price=new_price)
+        )
+
+    if result["items"]:
+        # Solo se tocan (y se les actualiza updated_at) las cotizaciones cuyos totales ya no cuadran
+        drifted = drafts.filter(items__product_id__in=unit_prices_usd).with_drifted_totals().values("pk")
+        result["quotations"] = Quotation.objects.filter(pk__in=drifted).recalculate_totals()
+    return result
+
+
+def _money(value):
+    return value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
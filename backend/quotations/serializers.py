@@ -1,9 +1,11 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from decimal import Decimal
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Q, Sum
 from services.models import MetalPrice, CurrencyRate
 from core.models import Product
-from quotations.models import Quotation, QuotationItem, QuotationExpense
+from quotations.models import Quotation, QuotationItem, QuotationExpense, PDFRenderJob
 
 
 class QuotationItemSerializer(serializers.ModelSerializer):
@@ -25,6 +27,56 @@ class QuotationExpenseSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "description", "category", "quantity", "unit_cost", "total_cost"]
 
 
+class PDFRenderJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PDFRenderJob
+        fields = [
+            "id",
+            "document_type",
+            "object_id",
+            "status",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "download_url",
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        """URL de descarga cuando el PDF ya está listo."""
+        request = self.context.get("request")
+        if obj.status != "done" or not request:
+            return None
+        return request.build_absolute_uri(reverse("pdf-job-download", args=[obj.pk]))
+
+
+class QuotationSummarySerializer(serializers.ModelSerializer):
+    """
+    Representación ligera para listados: sin items ni gastos anidados.
+    `item_count` debe venir anotado en el queryset (ver `QuotationQuerySet.with_item_count`).
+    """
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Quotation
+        fields = [
+            "id",
+            "customer_name",
+            "customer_email",
+            "currency",
+            "date",
+            "subtotal",
+            "tax",
+            "total",
+            "status",
+            "item_count",
+        ]
+        read_only_fields = fields
+
+
 class QuotationSerializer(serializers.ModelSerializer):
     items = QuotationItemSerializer(many=True)
     expenses = QuotationExpenseSerializer(many=True, required=False)
@@ -45,16 +97,24 @@ class QuotationSerializer(serializers.ModelSerializer):
             "expenses",
             "status",
         ]
-        read_only_fields = []
+        read_only_fields = ["subtotal", "tax", "total"]
 
-  
+
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop("items", [])
         expenses_data = validated_data.pop("expenses", [])
 
         quotation = Quotation.objects.create(**validated_data)
 
+        # 🔹 Resolver todos los productos referenciados en una sola consulta
+        products_by_id, products_by_name = _resolve_products(
+            ids=[d.get("id") for d in items_data if isinstance(d.get("id"), int)],
+            names=[d.get("name") for d in items_data if isinstance(d.get("name"), str)],
+        )
+
         # 🔹 Crear items correctamente asociados al producto
+        new_items = []
         for item_data in items_data:
             # El frontend envía un objeto con info del producto (name, metal_symbol, price)
             product_id = item_data.get("id")
@@ -62,85 +122,100 @@ class QuotationSerializer(serializers.ModelSerializer):
             # Si 'id' no es un número, intentar obtener por nombre
             product_instance = None
             if isinstance(product_id, int):
-                product_instance = Product.objects.filter(id=product_id).first()
+                product_instance = products_by_id.get(product_id)
             elif isinstance(item_data.get("name"), str):
-                product_instance = Product.objects.filter(name=item_data["name"]).first()
+                product_instance = products_by_name.get(item_data["name"])
 
             # Si no existe, NO crear producto nuevo, solo saltar
             if not product_instance:
                 continue
 
-            QuotationItem.objects.create(
+            new_items.append(QuotationItem(
                 quotation=quotation,
                 product=product_instance,
                 quantity=Decimal(item_data.get("quantity", 1)),
                 unit_price=Decimal(item_data.get("unit_price", item_data.get("price", 0))),
-            )
+            ))
+        QuotationItem.objects.bulk_create(new_items)
 
         # 🔹 Crear expenses asociados
-        for expense_data in expenses_data:
-            QuotationExpense.objects.create(
-                quotation=quotation,
+        QuotationExpense.objects.bulk_create([
+            _build_expense(
+                quotation,
                 name=expense_data.get("name"),
                 description=expense_data.get("description", ""),
                 category=expense_data.get("category", "other"),
                 quantity=Decimal(expense_data.get("quantity", 1)),
                 unit_cost=Decimal(expense_data.get("unit_cost", 0)),
-                total_cost=Decimal(expense_data.get("total_cost", 0)),
             )
+            for expense_data in expenses_data
+        ])
 
+        # 🧮 Las operaciones masivas no actualizan los totales por línea
+        quotation.calculate_totals()
         return quotation
 
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         items_data = self.initial_data.get("items", [])
         expenses_data = self.initial_data.get("expenses", [])
 
         # 🔁 Actualizar campos principales de la cotización
-        for field in ["customer_name", "customer_email", "currency", "notes", "subtotal", "tax", "total", "status"]:
+        for field in ["customer_name", "customer_email", "currency", "notes", "status"]:
             if field in validated_data:
                 setattr(instance, field, validated_data[field])
         instance.save()
 
         # ========== ITEMS ==========
         existing_items = {item.id: item for item in instance.items.all()}
-        sent_item_ids = []
+        products_by_id, _ = _resolve_products(ids=[_as_id(d.get("id")) for d in items_data])
+        sent_item_ids = set()
+        items_to_update = []
+        items_to_create = []
 
         for item_data in items_data:
-            item_id = item_data.get("id")
-            product_instance = Product.objects.filter(id=item_data.get("id")).first()
+            item_id = _as_id(item_data.get("id"))
+            product_instance = products_by_id.get(item_id)
             if not product_instance:
                 continue
 
+            quantity = Decimal(item_data.get("quantity", 1))
+            unit_price = Decimal(item_data.get("unit_price", item_data.get("price", 0)))
+
             if item_id and item_id in existing_items:
                 # 🔄 actualizar item existente
                 item = existing_items[item_id]
                 item.product = product_instance
-                item.quantity = Decimal(item_data.get("quantity", 1))
-                item.unit_price = Decimal(item_data.get("unit_price", item_data.get("price", 0)))
-                item.save()
-                sent_item_ids.append(item_id)
+                item.quantity = quantity
+                item.unit_price = unit_price
+                if item_id not in sent_item_ids:
+                    items_to_update.append(item)
+                sent_item_ids.add(item_id)
             else:
                 # ➕ crear nuevo item
-                new_item = QuotationItem.objects.create(
+                items_to_create.append(QuotationItem(
                     quotation=instance,
                     product=product_instance,
-                    quantity=Decimal(item_data.get("quantity", 1)),
-                    unit_price=Decimal(item_data.get("unit_price", item_data.get("price", 0))),
-                )
-                sent_item_ids.append(new_item.id)
+                    quantity=quantity,
+                    unit_price=unit_price,
+                ))
 
         # ❌ eliminar los items que no vienen en el payload
-        for item_id, item in existing_items.items():
-            if item_id not in sent_item_ids:
-                item.delete()
+        removed_item_ids = existing_items.keys() - sent_item_ids
+        if removed_item_ids:
+            QuotationItem.objects.filter(id__in=removed_item_ids).delete()
+        QuotationItem.objects.bulk_update(items_to_update, ["product", "quantity", "unit_price"])
+        QuotationItem.objects.bulk_create(items_to_create)
 
         # ========== EXPENSES ==========
         existing_expenses = {exp.id: exp for exp in instance.expenses.all()}
-        sent_expense_ids = []
+        sent_expense_ids = set()
+        expenses_to_update = []
+        expenses_to_create = []
 
         for exp_data in expenses_data:
-            exp_id = exp_data.get("id")
+            exp_id = _as_id(exp_data.get("id"))
             if exp_id and exp_id in existing_expenses:
                 # 🔄 actualizar gasto existente
                 exp = existing_expenses[exp_id]
@@ -149,26 +224,70 @@ class QuotationSerializer(serializers.ModelSerializer):
                 exp.category = exp_data.get("category", exp.category)
                 exp.quantity = Decimal(exp_data.get("quantity", exp.quantity))
                 exp.unit_cost = Decimal(exp_data.get("unit_cost", exp.unit_cost))
-                exp.total_cost = Decimal(exp_data.get("total_cost", exp.total_cost))
-                exp.save()
-                sent_expense_ids.append(exp_id)
+                exp.total_cost = exp.quantity * exp.unit_cost
+                if exp_id not in sent_expense_ids:
+                    expenses_to_update.append(exp)
+                sent_expense_ids.add(exp_id)
             else:
                 # ➕ crear nuevo gasto
-                new_exp = QuotationExpense.objects.create(
-                    quotation=instance,
+                expenses_to_create.append(_build_expense(
+                    instance,
                     name=exp_data.get("name", ""),
                     description=exp_data.get("description", ""),
                     category=exp_data.get("category", "other"),
                     quantity=Decimal(exp_data.get("quantity", 1)),
                     unit_cost=Decimal(exp_data.get("unit_cost", 0)),
-                    total_cost=Decimal(exp_data.get("total_cost", 0)),
-                )
-                sent_expense_ids.append(new_exp.id)
+                ))
 
         # ❌ eliminar los gastos que no vienen en el payload
-        for exp_id, exp in existing_expenses.items():
-            if exp_id not in sent_expense_ids:
-                exp.delete()
+        removed_expense_ids = existing_expenses.keys() - sent_expense_ids
+        if removed_expense_ids:
+            QuotationExpense.objects.filter(id__in=removed_expense_ids).delete()
+        QuotationExpense.objects.bulk_update(
+            expenses_to_update,
+            ["name", "description", "category", "quantity", "unit_cost", "total_cost"],
+        )
+        QuotationExpense.objects.bulk_create(expenses_to_create)
 
-        instance.save()
+        # 🧮 Las operaciones masivas no actualizan los totales por línea
+        instance.calculate_totals()
         return instance
+
+
+def _as_id(value):
+    """Convierte un id recibido en el payload a entero (o None si no es válido)."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _resolve_products(ids=(), names=()):
+    """
+    Obtiene en una sola consulta los productos referenciados por id o por nombre.
+    Con nombres repetidos se conserva el producto de menor id (igual que `.first()`).
+    """
+    ids = [i for i in ids if i is not None]
+    names = [n for n in names if n]
+    products_by_id, products_by_name = {}, {}
+    if not ids and not names:
+        return products_by_id, products_by_name
+
+    for product in Product.objects.filter(Q(id__in=ids) | Q(name__in=names)).order_by("pk"):
+        products_by_id[product.id] = product
+        products_by_name.setdefault(product.name, product)
+    return products_by_id, products_by_name
+
+
+def _build_expense(quotation, quantity, unit_cost, **fields):
+    """
+    Construye un QuotationExpense listo para `bulk_create`, que no llama a `save()`,
+    por lo que el costo total se calcula aquí.
+    """
+    return QuotationExpense(
+        quotation=quotation,
+        quantity=quantity,
+        unit_cost=unit_cost,
+        total_cost=quantity * unit_cost,
+        **fields,
+    )
@@ -1,3 +1,760 @@
-from django.test import TestCase
+import csv
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from companies.models import Company
+
+from core.models import Product
+from quotations import pdf_cache, rendering
+from quotations.pdf_export import stream_quotation_pdfs_zip
+from quotations.models import PDFRenderJob, Quotation, QuotationExpense, QuotationItem
+from quotations.repricing import reprice_draft_quotations
+from quotations.serializers import QuotationSerializer
+from services.models import CurrencyRate, MetalPrice
+from services.tests import IsolatedPricesMixin
+from users.models import User
+
+
+def make_user(username="vendedor", role="vendedor", company=None):
+    return User.objects.create_user(username=username, role=role, company=company)
+
+
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def make_product(name="Lámina", price="10.00", **fields):
+    return Product.objects.create(name=name, price=Decimal(price), **fields)
+
+
+class QuotationTotalsTests(TestCase):
+    """Totales calculados con agregación en la base de datos."""
+
+    def setUp(self):
+        self.product = make_product()
+        self.quotation = Quotation.objects.create(customer_name="Cliente")
+        # bulk_create no pasa por save(): los totales guardados quedan en 0
+        QuotationItem.objects.bulk_create([
+            QuotationItem(quotation=self.quotation, product=self.product, quantity=3, unit_price=Decimal("10.50")),
+            QuotationItem(quotation=self.quotation, product=self.product, quantity=1, unit_price=Decimal("0.99")),
+        ])
+        QuotationExpense.objects.bulk_create([
+            QuotationExpense(quotation=self.quotation, name="Flete", quantity=Decimal("2"),
+                             unit_cost=Decimal("5.00"), total_cost=Decimal("10.00")),
+        ])
+
+    def test_calculate_totals_sums_items_and_expenses(self):
+        subtotal, tax, total = self.quotation.calculate_totals()
+
+        self.assertEqual(subtotal, Decimal("42.49"))
+        self.assertEqual(tax, Decimal("6.80"))
+        self.assertEqual(total, Decimal("49.29"))
+        self.quotation.refresh_from_db()
+        self.assertEqual(
+            (self.quotation.subtotal, self.quotation.tax, self.quotation.total),
+            (Decimal("42.49"), Decimal("6.80"), Decimal("49.29")),
+        )
+
+    def test_calculate_totals_without_lines_is_zero(self):
+        empty = Quotation.objects.create(customer_name="Vacía")
+        self.assertEqual(empty.calculate_totals(), (Decimal("0.00"), Decimal("0.00"), Decimal("0.00")))
+
+    def test_recalculate_totals_matches_calculate_totals(self):
+        other = Quotation.objects.create(customer_name="Otra")
+        QuotationItem.objects.bulk_create([
+            QuotationItem(quotation=other, product=self.product, quantity=7, unit_price=Decimal("1.25")),
+        ])
+
+        with self.assertNumQueries(1):
+            updated = Quotation.objects.filter(pk__in=[self.quotation.pk, other.pk]).recalculate_totals()
+
+        self.assertEqual(updated, 2)
+        self.quotation.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.quotation.total, Decimal("49.29"))
+        self.assertEqual((other.subtotal, other.tax, other.total), (Decimal("8.75"), Decimal("1.40"), Decimal("10.15")))
+
+    def test_with_drifted_totals(self):
+        self.assertQuerySetEqual(Quotation.objects.with_drifted_totals(), [self.quotation])
+        self.quotation.calculate_totals()
+        self.assertFalse(Quotation.objects.with_drifted_totals().exists())
+
+
+class QuotationSerializerWriteTests(TestCase):
+    """Alta y edición de cotizaciones con líneas escritas en bloque."""
+
+    def setUp(self):
+        self.steel = make_product("Acero", "20.00")
+        self.copper = make_product("Cobre", "35.00")
+
+    def _payload(self, items, expenses=()):
+        return {"customer_name": "Cliente", "currency": "MXN", "items": list(items), "expenses": list(expenses)}
+
+    def _create(self, items, expenses=()):
+        serializer = QuotationSerializer(data=self._payload(items, expenses))
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_create_resolves_products_and_skips_unknown(self):
+        quotation = self._create(
+            items=[
+                {"id": self.steel.pk, "quantity": "2", "unit_price": "20.00"},
+                {"id": self.copper.pk, "quantity": "1", "unit_price": "35.00"},
+                {"id": self.copper.pk + 1000, "quantity": "1", "unit_price": "1.00"},
+            ],
+            expenses=[{"name": "Flete", "quantity": "2", "unit_cost": "5.00"}],
+        )
+
+        self.assertEqual(
+            sorted(quotation.items.values_list("product__name", "quantity")),
+            [("Acero", 2), ("Cobre", 1)],
+        )
+        self.assertEqual(quotation.expenses.get().total_cost, Decimal("10.00"))
+        self.assertEqual(quotation.subtotal, Decimal("85.00"))
+        self.assertEqual(quotation.total, Decimal("98.60"))
+
+    def test_create_query_count_does_not_grow_with_lines(self):
+        def queries_for(count):
+            items = [{"id": self.steel.pk, "quantity": "1", "unit_price": "1.00"}] * count
+            expenses = [{"name": "Flete", "quantity": "1", "unit_cost": "1.00"}] * count
+            serializer = QuotationSerializer(data=self._payload(items, expenses))
+            serializer.is_valid(raise_exception=True)
+            with CaptureQueriesContext(connection) as ctx:
+                serializer.save()
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries_for(2), queries_for(20))
+
+    def test_update_replaces_lines_and_totals(self):
+        quotation = self._create(
+            items=[{"id": self.steel.pk, "quantity": "1", "unit_price": "20.00"}],
+            expenses=[{"name": "Flete", "quantity": "1", "unit_cost": "5.00"}],
+        )
+
+        serializer = QuotationSerializer(quotation, data=self._payload(
+            items=[{"id": self.copper.pk, "quantity": "3", "unit_price": "35.00"}],
+        ))
+        serializer.is_valid(raise_exception=True)
+        quotation = serializer.save()
+
+        self.assertEqual(list(quotation.items.values_list("product__name", "quantity")), [("Cobre", 3)])
+        self.assertFalse(quotation.expenses.exists())
+        quotation.refresh_from_db()
+        self.assertEqual(quotation.subtotal, Decimal("105.00"))
+
+
+class QuotationLineTotalsTests(TestCase):
+    """Totales mantenidos por diferencia al guardar o borrar líneas (QuotationLineMixin)."""
+
+    def setUp(self):
+        self.product = make_product()
+        self.quotation = Quotation.objects.create(customer_name="Cliente")
+
+    def assertTotals(self, quotation, subtotal, tax, total):
+        quotation.refresh_from_db()
+        self.assertEqual(
+            (quotation.subtotal, quotation.tax, quotation.total),
+            (Decimal(subtotal), Decimal(tax), Decimal(total)),
+        )
+
+    def test_line_total_uses_line_fields(self):
+        item = QuotationItem(quantity=3, unit_price=Decimal("10.50"))
+        expense = QuotationExpense(quantity=Decimal("1.5"), unit_cost=Decimal("0.33"))
+        self.assertEqual(item.line_total(), Decimal("31.50"))
+        self.assertEqual(expense.line_total(), Decimal("0.50"))
+
+    def test_line_fields_are_required(self):
+        from quotations.models import QuotationLineMixin
+
+        with self.assertRaises(TypeError):
+            type("BrokenLine", (QuotationLineMixin,), {"LINE_FIELDS": ("total_cost",)})
+
+    def test_create_update_and_delete_apply_deltas(self):
+        item = QuotationItem.objects.create(
+            quotation=self.quotation, product=self.product, quantity=2, unit_price=Decimal("10.00")
+        )
+        expense = QuotationExpense.objects.create(
+            quotation=self.quotation, name="Flete", quantity=Decimal("1"), unit_cost=Decimal("5.00")
+        )
+        self.assertTotals(self.quotation, "25.00", "4.00", "29.00")
+
+        item = QuotationItem.objects.get(pk=item.pk)
+        item.quantity = 5
+        with CaptureQueriesContext(connection) as ctx:
+            item.save()
+        # UPDATE de la línea + UPDATE de los totales, sin recorrer las demás líneas
+        statements = [q["sql"].split()[0] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(statements, ["UPDATE", "UPDATE"])
+        self.assertTotals(self.quotation, "55.00", "8.80", "63.80")
+
+        expense.delete()
+        self.assertTotals(self.quotation, "50.00", "8.00", "58.00")
+        self.assertFalse(Quotation.objects.with_drifted_totals().exists())
+
+    def test_moving_a_line_updates_both_quotations(self):
+        other = Quotation.objects.create(customer_name="Otra")
+        item = QuotationItem.objects.create(
+            quotation=self.quotation, product=self.product, quantity=1, unit_price=Decimal("100.00")
+        )
+
+        item.quotation = other
+        item.save()
+
+        self.assertTotals(self.quotation, "0.00", "0.00", "0.00")
+        self.assertTotals(other, "100.00", "16.00", "116.00")
+
+    def test_deferred_line_falls_back_to_full_recalculation(self):
+        item = QuotationItem.objects.create(
+            quotation=self.quotation, product=self.product, quantity=1, unit_price=Decimal("10.00")
+        )
+        item = QuotationItem.objects.only("id", "quotation").get(pk=item.pk)
+        item.unit_price = Decimal("12.00")
+        item.save()
+
+        self.assertTotals(self.quotation, "12.00", "1.92", "13.92")
+
+    def test_check_quotation_totals_fixes_drift(self):
+        QuotationItem.objects.create(
+            quotation=self.quotation, product=self.product, quantity=1, unit_price=Decimal("10.00")
+        )
+        Quotation.objects.filter(pk=self.quotation.pk).update(total=Decimal("1.00"))
+
+        call_command("check_quotation_totals", "--dry-run", stdout=StringIO())
+        self.assertTrue(Quotation.objects.with_drifted_totals().exists())
+
+        call_command("check_quotation_totals", stdout=StringIO())
+        self.assertTotals(self.quotation, "10.00", "1.60", "11.60")
+
+
+class QuotationCursorPaginationTests(TestCase):
+    """Paginación por cursor sobre (date, id), de la más reciente a la más antigua."""
+
+    def setUp(self):
+        self.company = Company.objects.create(name="Empresa")
+        self.client = api_client(make_user(company=self.company))
+        start = datetime.date(2025, 1, 1)
+        # Varias cotizaciones por fecha: el id desempata
+        self.quotations = [
+            Quotation.objects.create(customer_name=f"Cliente {n}", company=self.company,
+                                     date=start + datetime.timedelta(days=n // 3))
+            for n in range(12)
+        ]
+        self.expected = [q.pk for q in sorted(self.quotations, key=lambda q: (q.date, q.pk), reverse=True)]
+
+    def _walk(self, url):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            ids.extend(row["id"] for row in response.data["results"])
+            url = response.data["next"]
+        return ids, pages
+
+    def test_pages_follow_date_then_id_without_gaps_or_duplicates(self):
+        ids, pages = self._walk("/api/quotations/?page_size=5")
+
+        self.assertEqual(ids, self.expected)
+        self.assertEqual([len(page["results"]) for page in pages], [5, 5, 2])
+        self.assertIsNone(pages[0]["previous"])
+
+    def test_previous_link_returns_the_same_page(self):
+        first = self.client.get("/api/quotations/?page_size=5").data
+        second = self.client.get(first["next"]).data
+        back = self.client.get(second["previous"]).data
+
+        self.assertEqual([row["id"] for row in back["results"]], [row["id"] for row in first["results"]])
+
+    def test_new_rows_do_not_shift_later_pages(self):
+        first = self.client.get("/api/quotations/?page_size=5").data
+        Quotation.objects.create(customer_name="Nueva", company=self.company, date=datetime.date(2026, 1, 1))
+        second = self.client.get(first["next"]).data
+
+        self.assertEqual([row["id"] for row in second["results"]], self.expected[5:10])
+
+    def test_filters_apply_before_paginating(self):
+        Quotation.objects.filter(pk__in=self.expected[:4]).update(status="cancelled")
+        ids, _ = self._walk("/api/quotations/?page_size=2&status=draft&date__gte=2025-01-02")
+
+        self.assertEqual(ids, [pk for pk in self.expected[4:] if Quotation.objects.get(pk=pk).date >= datetime.date(2025, 1, 2)])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get("/api/quotations/?cursor=bm90LWEtY3Vyc29y").status_code, 404)
+
+
+class QuotationSummaryListTests(TestCase):
+    """El listado usa el resumen ligero; ?expand=items trae las líneas anidadas."""
+
+    def setUp(self):
+        self.company = Company.objects.create(name="Empresa")
+        self.client = api_client(make_user(company=self.company))
+        product = make_product()
+        for n in range(3):
+            quotation = Quotation.objects.create(customer_name=f"Cliente {n}", company=self.company)
+            QuotationItem.objects.bulk_create([
+                QuotationItem(quotation=quotation, product=product, quantity=1, unit_price=Decimal("1.00"))
+                for _ in range(n + 1)
+            ])
+
+    def test_list_returns_summary_with_item_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/quotations/")
+
+        self.assertEqual(response.status_code, 200)
+        rows = response.data["results"]
+        self.assertEqual(sorted(row["item_count"] for row in rows), [1, 2, 3])
+        self.assertNotIn("items", rows[0])
+        # Usuario (sesión forzada) + versión del listado (ETag) + página: sin consultas por fila
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+
+    def test_expand_items_returns_full_representation(self):
+        response = self.client.get("/api/quotations/?expand=items")
+
+        rows = response.data["results"]
+        self.assertEqual(sorted(len(row["items"]) for row in rows), [1, 2, 3])
+        self.assertIn("expenses", rows[0])
+
+
+class QuotationSearchTests(TestCase):
+    """Filtros y búsqueda del listado (índices de la migración 0010)."""
+
+    def setUp(self):
+        self.company = Company.objects.create(name="Empresa")
+        self.client = api_client(make_user(company=self.company))
+        Quotation.objects.create(customer_name="Aceros del Norte", customer_email="compras@norte.mx", company=self.company)
+        Quotation.objects.create(customer_name="Cobres SA", customer_email="ventas@cobres.mx", company=self.company)
+        Quotation.objects.create(customer_name="Aceros Externos", company=Company.objects.create(name="Otra"))
+
+    def test_search_is_case_insensitive_on_name_and_email(self):
+        by_name = self.client.get("/api/quotations/?search=aceros").data["results"]
+        by_email = self.client.get("/api/quotations/?search=VENTAS@").data["results"]
+
+        self.assertEqual([row["customer_name"] for row in by_name], ["Aceros del Norte"])
+        self.assertEqual([row["customer_name"] for row in by_email], ["Cobres SA"])
+
+    def test_numeric_search_also_finds_the_folio(self):
+        target = Quotation.objects.create(customer_name="Sin relación", company=self.company)
+        named = Quotation.objects.create(customer_name=f"Cliente {target.pk}", company=self.company)
+
+        by_number = self.client.get("/api/quotations/", {"search": target.pk}).data["results"]
+        by_folio = self.client.get("/api/quotations/", {"search": f"#{target.pk}"}).data["results"]
+
+        self.assertEqual({row["id"] for row in by_number}, {target.pk, named.pk})
+        self.assertEqual([row["id"] for row in by_folio], [target.pk])
+
+        other_company = Quotation.objects.get(customer_name="Aceros Externos")
+        self.assertEqual(self.client.get("/api/quotations/", {"search": other_company.pk}).data["results"], [])
+
+    def test_benchmark_command_seeds_explains_and_cleans_up(self):
+        out = StringIO()
+        call_command("benchmark_quotation_queries", "--rows", "60", "--companies", "2", "--force", stdout=out)
+
+        self.assertEqual(out.getvalue().count("🔎"), 5)
+        self.assertIn("Limit", out.getvalue())
+        self.assertFalse(Company.objects.filter(name__startswith="Benchmark ").exists())
+        self.assertEqual(Quotation.objects.count(), 3)
+
+    def test_benchmark_cleanup_leaves_real_companies_alone(self):
+        real = Company.objects.create(name="Benchmark Consulting")
+        Quotation.objects.create(customer_name="Cliente real", company=real)
+
+        call_command("benchmark_quotation_queries", "--rows", "20", "--companies", "1", "--force", stdout=StringIO())
+
+        self.assertEqual(list(Company.objects.filter(name__startswith="Benchmark ")), [real])
+        self.assertTrue(real.quotations.exists())
+
+    def test_benchmark_can_reuse_kept_data(self):
+        call_command("benchmark_quotation_queries", "--rows", "20", "--companies", "1", "--force", "--keep",
+                     stdout=StringIO())
+        call_command("benchmark_quotation_queries", "--skip-seed", "--force", stdout=StringIO())
+
+        self.assertFalse(Company.objects.filter(address="__benchmark__").exists())
+        self.assertEqual(Quotation.objects.count(), 3)
+
+
+class TempDirMixin:
+    """Directorio temporal por prueba, borrado al terminar."""
+
+    def make_temp_dir(self):
+        path = tempfile.mkdtemp(prefix="smartquote-test-")
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        return path
+
+
+class QuotationPDFCacheTests(TempDirMixin, TestCase):
+    """Caché en disco de los PDFs de cotizaciones."""
+
+    def setUp(self):
+        self.cache_dir = self.make_temp_dir()
+        override = override_settings(QUOTATION_PDF_CACHE_DIR=self.cache_dir, QUOTATION_PDF_CACHE_MAX_BYTES=10**9)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.product = make_product("Lámina galvanizada")
+        self.quotation = Quotation.objects.create(customer_name="Cliente", company=Company.objects.create(name="Empresa"))
+        QuotationItem.objects.create(quotation=self.quotation, product=self.product, quantity=1, unit_price=Decimal("10.00"))
+
+    def _fresh(self):
+        return Quotation.objects.select_related("company").get(pk=self.quotation.pk)
+
+    def test_second_open_is_served_from_cache(self):
+        with mock.patch.object(pdf_cache, "render_quotation_pdf", return_value=b"%PDF-1") as render:
+            with pdf_cache.open_quotation_pdf(self._fresh()) as first:
+                self.assertEqual(first.read(), b"%PDF-1")
+            with pdf_cache.open_quotation_pdf(self._fresh()) as second:
+                self.assertEqual(second.read(), b"%PDF-1")
+
+        self.assertEqual(render.call_count, 1)
+
+    def test_key_changes_when_a_printed_product_changes(self):
+        before = pdf_cache.quotation_pdf_cache_key(self._fresh())
+
+        self.product.name = "Lámina pintada"
+        self.product.save()
+
+        self.assertNotEqual(pdf_cache.quotation_pdf_cache_key(self._fresh()), before)
+
+    def test_key_changes_with_quotation_and_company(self):
+        before = pdf_cache.quotation_pdf_cache_key(self._fresh())
+
+        Company.objects.filter(pk=self.quotation.company_id).update(phone="555-0000")
+        after_company = pdf_cache.quotation_pdf_cache_key(self._fresh())
+        QuotationItem.objects.create(quotation=self.quotation, product=self.product, quantity=2, unit_price=Decimal("1.00"))
+
+        self.assertEqual(len({before, after_company, pdf_cache.quotation_pdf_cache_key(self._fresh())}), 3)
+
+    def test_annotated_queryset_gives_the_same_key_without_queries(self):
+        annotated = Quotation.objects.select_related("company").with_products_updated_at().get(pk=self.quotation.pk)
+
+        with self.assertNumQueries(0):
+            key = pdf_cache.quotation_pdf_cache_key(annotated)
+        self.assertEqual(key, pdf_cache.quotation_pdf_cache_key(self._fresh()))
+
+    def test_stale_versions_are_replaced(self):
+        with mock.patch.object(pdf_cache, "render_quotation_pdf", return_value=b"%PDF-1"):
+            pdf_cache.open_quotation_pdf(self._fresh()).close()
+            self.product.save()
+            pdf_cache.open_quotation_pdf(self._fresh()).close()
+
+        self.assertEqual(len(list(Path(self.cache_dir).glob(f"{self.quotation.pk}-*.pdf"))), 1)
+
+    def test_eviction_removes_least_recently_used_first(self):
+        for n, name in enumerate(["old", "recent", "newest"]):
+            path = Path(self.cache_dir) / f"{name}.pdf"
+            path.write_bytes(b"x" * 100)
+            os.utime(path, (1_000_000 + n, 1_000_000 + n))
+
+        removed = pdf_cache.evict_quotation_pdf_cache(max_bytes=200)
+
+        self.assertEqual(removed, 1)
+        self.assertEqual(sorted(p.name for p in Path(self.cache_dir).iterdir()), ["newest.pdf", "recent.pdf"])
+
+
+class PDFRenderJobTests(TempDirMixin, TestCase):
+    """Jobs de PDF en segundo plano: reutilización por usuario, jobs huérfanos y limpieza."""
+
+    def setUp(self):
+        override = override_settings(MEDIA_ROOT=self.make_temp_dir(), QUOTATION_PDF_CACHE_DIR=self.make_temp_dir())
+        override.enable()
+        self.addCleanup(override.disable)
+        dispatch = mock.patch.object(rendering, "_dispatch")
+        self.dispatch = dispatch.start()
+        self.addCleanup(dispatch.stop)
+
+        self.company = Company.objects.create(name="Empresa")
+        self.ana = make_user("ana", company=self.company)
+        self.beto = make_user("beto", company=self.company)
+        self.quotation = Quotation.objects.create(customer_name="Cliente", company=self.company)
+
+    def test_active_job_is_reused_only_by_the_same_user(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = rendering.submit_render_job("quotation", self.quotation.pk, user=self.ana)
+            again = rendering.submit_render_job("quotation", self.quotation.pk, user=self.ana)
+            other = rendering.submit_render_job("quotation", self.quotation.pk, user=self.beto)
+
+        self.assertEqual(again.pk, first.pk)
+        self.assertNotEqual(other.pk, first.pk)
+        self.assertEqual(self.dispatch.call_count, 2)
+
+    def test_second_user_can_read_the_job_they_get_back(self):
+        client = api_client(self.beto)
+        rendering.submit_render_job("quotation", self.quotation.pk, user=self.ana)
+
+        job_id = client.post(f"/api/quotations/{self.quotation.pk}/render-pdf/").data["id"]
+
+        self.assertEqual(client.get(f"/api/pdf-jobs/{job_id}/").status_code, 200)
+
+    @override_settings(PDF_RENDER_JOB_TIMEOUT=60)
+    def test_stale_job_is_failed_and_replaced(self):
+        stale = rendering.submit_render_job("quotation", self.quotation.pk, user=self.ana)
+        PDFRenderJob.objects.filter(pk=stale.pk).update(
+            status="running", created_at=timezone.now() - datetime.timedelta(minutes=5)
+        )
+
+        fresh = rendering.submit_render_job("quotation", self.quotation.pk, user=self.ana)
+
+        self.assertNotEqual(fresh.pk, stale.pk)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, "failed")
+        self.assertIsNotNone(stale.finished_at)
+
+    def test_render_job_saves_the_pdf(self):
+        job = rendering.submit_render_job("quotation", self.quotation.pk, user=self.ana)
+
+        with mock.patch.object(rendering, "close_old_connections"), \
+                mock.patch.object(pdf_cache, "render_quotation_pdf", return_value=b"%PDF-1"):
+            rendering.render_job(str(job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        with job.pdf_file.open("rb") as pdf:
+            self.assertEqual(pdf.read(), b"%PDF-1")
+
+    @override_settings(PDF_RENDER_JOB_RETENTION=3600)
+    def test_expire_removes_old_jobs_and_orphan_files(self):
+        long_ago = timezone.now() - datetime.timedelta(hours=2)
+        old = PDFRenderJob.objects.create(document_type="quotation", object_id=1, status="done", finished_at=long_ago)
+        old.pdf_file.save("viejo.pdf", ContentFile(b"%PDF"), save=True)
+        recent = PDFRenderJob.objects.create(document_type="quotation", object_id=1, status="done", finished_at=timezone.now())
+        recent.pdf_file.save("reciente.pdf", ContentFile(b"%PDF"), save=True)
+        orphan = default_storage.save("pdf_jobs/huerfano.pdf", ContentFile(b"%PDF"))
+        old_time = long_ago.timestamp()
+        os.utime(default_storage.path(orphan), (old_time, old_time))
+        old_path = old.pdf_file.name
+
+        self.assertEqual(rendering.expire_render_jobs(), 1)
+
+        self.assertFalse(PDFRenderJob.objects.filter(pk=old.pk).exists())
+        self.assertFalse(default_storage.exists(old_path))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(recent.pdf_file.name))
+
+
+class QuotationPDFZipTests(TempDirMixin, TestCase):
+    """ZIP de PDFs transmitido por bloques."""
+
+    def setUp(self):
+        override = override_settings(QUOTATION_PDF_CACHE_DIR=self.make_temp_dir())
+        override.enable()
+        self.addCleanup(override.disable)
+        render = mock.patch.object(
+            pdf_cache, "render_quotation_pdf", side_effect=lambda q: f"%PDF {q.pk} ".encode() * 5000
+        )
+        render.start()
+        self.addCleanup(render.stop)
+
+        self.company = Company.objects.create(name="Empresa")
+        self.quotations = [
+            Quotation.objects.create(customer_name=f"Cliente {n}", company=self.company) for n in range(3)
+        ]
+
+    def test_stream_is_a_valid_zip_with_one_pdf_per_quotation(self):
+        chunks = list(stream_quotation_pdfs_zip(Quotation.objects.order_by("pk"), chunk_size=2))
+
+        self.assertGreater(len(chunks), 3)
+        with zipfile.ZipFile(BytesIO(b"".join(chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), [f"cotizacion_{q.pk}.pdf" for q in self.quotations])
+            first = self.quotations[0].pk
+            self.assertEqual(archive.read(f"cotizacion_{first}.pdf"), f"%PDF {first} ".encode() * 5000)
+
+    def test_export_pdfs_endpoint_streams_the_filtered_quotations(self):
+        Quotation.objects.filter(pk=self.quotations[0].pk).update(status="cancelled")
+        client = api_client(make_user(company=self.company))
+
+        response = client.get("/api/quotations/export-pdfs/?status=draft")
+
+        self.assertEqual(response["Content-Type"], "application/zip")
+        with zipfile.ZipFile(BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(len(archive.namelist()), 2)
+
+
+class QuotationConditionalGetTests(TestCase):
+    """ETag / Last-Modified del detalle y del listado (ConditionalGetMixin)."""
+
+    def setUp(self):
+        self.company = Company.objects.create(name="Empresa")
+        self.client = api_client(make_user("admin", role="admin", company=self.company))
+        self.quotation = Quotation.objects.create(customer_name="Cliente", company=self.company, total=Decimal("10.00"))
+        self.url = f"/api/quotations/{self.quotation.pk}/"
+
+    def _etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_unchanged_detail_and_list_answer_304(self):
+        for url in (self.url, "/api/quotations/"):
+            etag = self._etag(url)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_cancel_changes_the_version(self):
+        detail_etag, list_etag = self._etag(self.url), self._etag("/api/quotations/")
+
+        response = self.client.post(f"{self.url}cancel/", {"reason": "Sin presupuesto"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        detail = self.client.get(self.url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.data["status"], "cancelled")
+        listing = self.client.get("/api/quotations/", HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(listing.status_code, 200)
+        self.assertEqual(listing.data["results"][0]["status"], "cancelled")
+
+    def test_generate_sale_changes_the_version(self):
+        detail_etag = self._etag(self.url)
+
+        response = self.client.post(f"{self.url}generate-sale/")
+        self.assertEqual(response.status_code, 201)
+
+        detail = self.client.get(self.url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.data["status"], "confirmed")
+
+    def test_partial_save_always_bumps_updated_at(self):
+        before = self.quotation.updated_at
+        self.quotation.status = "confirmed"
+        self.quotation.save(update_fields=["status"])
+
+        self.quotation.refresh_from_db()
+        self.assertGreater(self.quotation.updated_at, before)
+        self.assertIsNotNone(self.quotation.confirmed_at)
+
+    def test_product_change_invalidates_the_detail(self):
+        product = make_product()
+        QuotationItem.objects.create(quotation=self.quotation, product=product, quantity=1, unit_price=Decimal("1.00"))
+        etag = self._etag(self.url)
+
+        product.name = "Otro nombre"
+        product.save()
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class QuotationDataExportTests(TestCase):
+    """Export de cotizaciones con líneas aplanadas (CSV / NDJSON)."""
+
+    def setUp(self):
+        self.company = Company.objects.create(name="Empresa")
+        self.client = api_client(make_user(company=self.company))
+        product = make_product("Cobre")
+        self.quotation = Quotation.objects.create(customer_name="Cliente, S.A.", company=self.company)
+        QuotationItem.objects.create(quotation=self.quotation, product=product, quantity=2, unit_price=Decimal("3.50"))
+        QuotationExpense.objects.create(quotation=self.quotation, name="Flete", quantity=Decimal("1"), unit_cost=Decimal("4.00"))
+        self.empty = Quotation.objects.create(customer_name="Sin líneas", company=self.company)
+
+    def _download(self, fmt):
+        response = self.client.get(f"/api/quotations/export/?format={fmt}")
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content).decode("utf-8")
+
+    def test_csv_has_one_row_per_line(self):
+        response, body = self._download("csv")
+
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        rows = list(csv.DictReader(body.splitlines()))
+        mine = [row for row in rows if row["quotation_id"] == str(self.quotation.pk)]
+        self.assertEqual([(row["line_type"], row["name"], row["line_total"]) for row in mine],
+                         [("item", "Cobre", "7.00"), ("expense", "Flete", "4.00")])
+        self.assertEqual(mine[0]["customer_name"], "Cliente, S.A.")
+        empty = [row for row in rows if row["quotation_id"] == str(self.empty.pk)]
+        self.assertEqual(len(empty), 1)
+        self.assertEqual(empty[0]["line_type"], "")
+
+    def test_ndjson_matches_csv_rows(self):
+        response, body = self._download("ndjson")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 3)
+        item = next(row for row in rows if row["line_type"] == "item")
+        self.assertEqual((item["quantity"], item["unit_price"]), (2, "3.50"))
+
+    def test_export_respects_company_scope(self):
+        Quotation.objects.create(customer_name="Ajena", company=Company.objects.create(name="Otra"))
+        _, body = self._download("ndjson")
+
+        self.assertNotIn("Ajena", body)
+
+
+class RepricingTests(IsolatedPricesMixin, TestCase):
+    """Recalculo de borradores con precios de metales y tipos de cambio."""
+
+    def setUp(self):
+        super().setUp()
+        MetalPrice.objects.create(name="Cobre", symbol="COPPER", price_usd=Decimal("4.0000"),
+                                  measure_units="libra", base_quantity=Decimal("1"))
+        CurrencyRate.objects.create(base_currency="USD", target_currency="MXN", rate=Decimal("18.000000"))
+        # 1 kg de cobre por pieza, con 10 % de margen
+        self.product = make_product("Cable", "1.00", metal_symbol="COPPER", unit="pieza", margin=Decimal("10"),
+                                    metal_quantity=Decimal("1"), metal_quantity_unit="kg")
+        self.plain = make_product("Servicio", "50.00")
+
+    def _quotation(self, currency="MXN", status="draft"):
+        quotation = Quotation.objects.create(customer_name="Cliente", currency=currency, status=status)
+        QuotationItem.objects.create(quotation=quotation, product=self.product, quantity=2, unit_price=Decimal("1.00"))
+        QuotationItem.objects.create(quotation=quotation, product=self.plain, quantity=1, unit_price=Decimal("50.00"))
+        return quotation
+
+    def test_draft_items_get_market_price_in_quotation_currency(self):
+        draft = self._quotation()
+
+        result = reprice_draft_quotations()
+
+        # 4 USD/lb → 8.82 USD/kg → × 1.10 de margen → × 18 MXN
+        self.assertEqual(draft.items.get(product=self.product).unit_price, Decimal("174.64"))
+        self.assertEqual(draft.items.get(product=self.plain).unit_price, Decimal("50.00"))
+        self.assertEqual(result, {"items": 1, "quotations": 1, "skipped_currencies": []})
+        self.assertFalse(Quotation.objects.with_drifted_totals().exists())
+
+    def test_confirmed_quotations_and_unknown_currencies_are_left_alone(self):
+        confirmed = self._quotation(status="confirmed")
+        euros = self._quotation(currency="EUR")
+
+        result = reprice_draft_quotations()
+
+        self.assertEqual(result["skipped_currencies"], ["EUR"])
+        for quotation in (confirmed, euros):
+            self.assertEqual(quotation.items.get(product=self.product).unit_price, Decimal("1.00"))
+
+    def test_symbols_match_regardless_of_case(self):
+        # upload_csv guarda el símbolo tal como viene en el archivo
+        self.product.metal_symbol = "copper"
+        self.product.save()
+        draft = self._quotation()
+
+        self.assertEqual(reprice_draft_quotations()["items"], 1)
+        self.assertEqual(draft.items.get(product=self.product).unit_price, Decimal("174.64"))
+
+    def test_second_run_changes_nothing(self):
+        self._quotation()
+        reprice_draft_quotations()
+
+        self.assertEqual(reprice_draft_quotations()["items"], 0)
+
+    def test_command_reports_updated_items(self):
+        self._quotation()
+        out = StringIO()
+
+        call_command("reprice_quotations", stdout=out)
+
+        self.assertIn("1 item(s) actualizados en 1 cotización(es)", out.getvalue())
@@ -1,7 +1,8 @@
 from rest_framework import routers
-from quotations.views import QuotationViewSet
+from quotations.views import QuotationViewSet, PDFRenderJobViewSet
 
 router = routers.DefaultRouter()
 router.register(r'quotations', QuotationViewSet, basename='quotation')
+router.register(r'pdf-jobs', PDFRenderJobViewSet, basename='pdf-job')
 
 urlpatterns = router.urls
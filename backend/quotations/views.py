@@ -1,34 +1,64 @@
-from rest_framework import viewsets, status, filters, permissions
+from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend 
 from django.db import transaction
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
 
-from quotations.serializers import QuotationSerializer
+from core.mixins import ConditionalGetMixin
+from quotations.pagination import QuotationCursorPagination
+from quotations.serializers import QuotationSerializer, QuotationSummarySerializer, PDFRenderJobSerializer
+from quotations.filters import QuotationSearchFilter
+from quotations.data_export import stream_quotations_csv, stream_quotations_ndjson
+from quotations.pdf_export import stream_quotation_pdfs_zip
+from quotations.renderers import CSVRenderer, NDJSONRenderer
+from quotations.rendering import submit_render_job
 from sales.models import Sale 
-from quotations.models import Quotation, QuotationItem, QuotationExpense
+from quotations.models import Quotation, QuotationItem, QuotationExpense, PDFRenderJob
 from users.permissions import IsCompanyMemberOrAdmin
 from quotations.permissions import QuotationPermission
 
 
-class QuotationViewSet(viewsets.ModelViewSet):
+class QuotationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
 
     serializer_class = QuotationSerializer
     permission_classes = [permissions.IsAuthenticated, QuotationPermission]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    pagination_class = QuotationCursorPagination
+    filter_backends = [DjangoFilterBackend, QuotationSearchFilter]
+    # ?search= busca en cliente y correo; un número solo también encuentra ese folio
     search_fields = ['customer_name', 'customer_email']
-    filterset_fields = {'date': ['gte', 'lte'], 'status': ['exact']}
+    filterset_fields = {'date': ['gte', 'lte'], 'status': ['exact'], 'company': ['exact']}
+    # 🏷️ ETag: la cotización cambia con sus líneas (delta en updated_at) y con los productos que muestra
+    conditional_timestamp_fields = ("updated_at", "items__product__updated_at")
+    retrieve_prefetch = ("items__product", "expenses")
 
     def get_queryset(self):
         user = self.request.user
         if user.role in ["admin", "soporte"]:
-            queryset = Quotation.objects.all().prefetch_related("items", "expenses").order_by("-date")
+            queryset = Quotation.objects.all()
         else:
-            queryset = Quotation.objects.filter(company=user.company).prefetch_related("items", "expenses").order_by("-date")
+            queryset = Quotation.objects.filter(company=user.company)
+
+        # 📋 El listado usa el resumen (una sola consulta anotada) salvo que pidan ?expand=items
+        if self._uses_summary():
+            queryset = queryset.with_item_count()
+        elif self.action not in ("export_pdfs", "export", "retrieve"):
+            # Los exports recorren las cotizaciones por bloques: sin prefetch para no cargar todo en memoria.
+            # En el detalle el prefetch lo aplica ConditionalGetMixin, solo si no se responde 304.
+            queryset = queryset.prefetch_related("items", "expenses")
+
+        return queryset.order_by("-date", "-id")
+
+    def get_serializer_class(self):
+        if self._uses_summary():
+            return QuotationSummarySerializer
+        return QuotationSerializer
+
+    def _uses_summary(self):
+        expand = self.request.query_params.get("expand", "")
+        return self.action == "list" and expand.lower() not in ("items", "true", "1")
 
-        return queryset
-    
 
 
     @action(detail=True, methods=["post"], url_path="generate-sale")
@@ -69,7 +99,7 @@ class QuotationViewSet(viewsets.ModelViewSet):
 
         quotation.status = "confirmed"
         quotation.confirmed_at = timezone.now()
-        quotation.save(update_fields=["status", "confirmed_at"])
+        quotation.save(update_fields=["status", "confirmed_at", "updated_at"])
 
         quotation.refresh_from_db()
 
@@ -108,18 +138,19 @@ class QuotationViewSet(viewsets.ModelViewSet):
                 status="draft",  
             )
 
-            # Duplicar items
-            for item in original.items.all():
-                QuotationItem.objects.create(
+            # Duplicar items y gastos (bulk_create no vuelve a sumar los totales copiados)
+            QuotationItem.objects.bulk_create([
+                QuotationItem(
                     quotation=new_quotation,
-                    product=item.product,
+                    product_id=item.product_id,
                     quantity=item.quantity,
                     unit_price=item.unit_price,
                 )
+                for item in original.items.all()
+            ])
 
-            # Duplicar gastos
-            for exp in original.expenses.all():
-                QuotationExpense.objects.create(
+            QuotationExpense.objects.bulk_create([
+                QuotationExpense(
                     quotation=new_quotation,
                     name=exp.name,
                     description=exp.description,
@@ -128,6 +159,8 @@ class QuotationViewSet(viewsets.ModelViewSet):
                     unit_cost=exp.unit_cost,
                     total_cost=exp.total_cost,
                 )
+                for exp in original.expenses.all()
+            ])
 
         return Response(
             {"detail": f"Cotización duplicada (ID {new_quotation.id})", "new_id": new_quotation.id},
@@ -135,6 +168,48 @@ class QuotationViewSet(viewsets.ModelViewSet):
         )
 
 
+    @action(detail=True, methods=["post"], url_path="render-pdf")
+    def render_pdf(self, request, pk=None):
+        """
+        Encola la generación del PDF y responde de inmediato con el id del job.
+        El estado y la descarga se consultan en /api/pdf-jobs/<id>/.
+        """
+        quotation = self.get_object()
+        job = submit_render_job("quotation", quotation.pk, user=request.user)
+        serializer = PDFRenderJobSerializer(job, context={"request": request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["get"], url_path="export-pdfs")
+    def export_pdfs(self, request):
+        """
+        Descarga un ZIP con los PDFs de las cotizaciones filtradas
+        (?company=, ?date__gte=, ?date__lte=, ?status=), transmitido por bloques.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(stream_quotation_pdfs_zip(queryset), content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="cotizaciones_{timezone.now():%Y%m%d_%H%M}.zip"'
+        return response
+
+    @action(detail=False, methods=["get"], url_path="export", renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Exporta las cotizaciones filtradas con sus items y gastos aplanados
+        (una fila por línea) en ?format=csv (por defecto) o ?format=ndjson.
+        La respuesta se transmite mientras se recorre la base de datos.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        export_format = request.accepted_renderer.format
+        if export_format == "ndjson":
+            stream, content_type = stream_quotations_ndjson(queryset), "application/x-ndjson"
+        else:
+            stream, content_type = stream_quotations_csv(queryset), "text/csv; charset=utf-8"
+
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="cotizaciones_{timezone.now():%Y%m%d_%H%M}.{export_format}"'
+        )
+        return response
+
     @action(detail=True, methods=["post"], url_path="cancel")
     def cancel_quotation(self, request, pk=None):
         quotation = self.get_object()
@@ -155,10 +230,36 @@ class QuotationViewSet(viewsets.ModelViewSet):
         quotation.status = "cancelled"
         quotation.cancellation_reason = reason
         quotation.cancelled_at = timezone.now()
-        quotation.save(update_fields=["status", "cancellation_reason", "cancelled_at"])
+        quotation.save(update_fields=["status", "cancellation_reason", "cancelled_at", "updated_at"])
 
         serializer = self.get_serializer(quotation)
         return Response({
             "message": "Cotización cancelada correctamente.",
             "quotation": serializer.data
         }, status=status.HTTP_200_OK)
+
+
+class PDFRenderJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Estado y descarga de los PDFs generados en segundo plano."""
+
+    serializer_class = PDFRenderJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.role in ["admin", "soporte"]:
+            return PDFRenderJob.objects.all().order_by("-created_at")
+        return PDFRenderJob.objects.filter(requested_by=user).order_by("-created_at")
+
+    @action(detail=True, methods=["get"], url_path="download", url_name="download")
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != "done" or not job.pdf_file:
+            return Response({"detail": "El PDF todavía no está listo.", "status": job.status},
+                            status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            job.pdf_file.open("rb"),
+            as_attachment=True,
+            filename=job.pdf_file.name.rsplit("/", 1)[-1],
+            content_type="application/pdf",
+        )
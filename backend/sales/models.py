@@ -1,10 +1,11 @@
 from django.db import models
 from quotations.models import Quotation
+from core.events import StatusEventMixin
 from datetime import timedelta, date
 
 MONEY_FIELD = dict(max_digits=14, decimal_places=2, default=0)
 
-class Sale(models.Model):
+class Sale(StatusEventMixin, models.Model):
     quotation = models.OneToOneField(
         Quotation,
         on_delete=models.CASCADE,
@@ -27,6 +28,7 @@ class Sale(models.Model):
     delivery_date = models.DateField(blank=True, null=True)
     warranty_end = models.DateField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def set_delivery_and_warranty(self, delivery_days=7, warranty_days=90):
         """Calcula fechas estimadas de entrega y garantía."""
@@ -45,6 +47,12 @@ class Sale(models.Model):
             self.status = "paid"
         self.save()
 
+    # 📡 Cada cambio de estado se avisa en vivo (core.events, /api/events/)
+    status_event_topic = "sales"
+
+    def status_event_data(self):
+        return {"id": self.pk, "quotation_id": self.quotation_id, "company_id": self.quotation.company_id}
+
     def __str__(self):
         return f"Venta #{self.id} - {self.quotation.customer_name}"
 
@@ -10,8 +10,8 @@ class SalePermission(permissions.BasePermission):
         if not user or not user.is_authenticated:
             return False
 
-        # Ver todas las ventas → todos los roles autenticados
-        if view.action in ["list", "retrieve"]:
+        # Ver todas las ventas (y generar el PDF de su factura) → todos los roles autenticados
+        if view.action in ["list", "retrieve", "render_invoice_pdf"]:
             return True
 
         # Crear ventas manualmente → manager o admin
@@ -5,13 +5,18 @@ from rest_framework.response import Response
 from .models import Sale
 from .serializers import SaleSerializer, PaymentSerializer
 from .permissions import SalePermission
+from core.mixins import ConditionalGetMixin
+from quotations.rendering import submit_render_job
+from quotations.serializers import PDFRenderJobSerializer
 
 
 
-class SaleViewSet(viewsets.ModelViewSet):
-    queryset = Sale.objects.all().select_related("quotation").prefetch_related("payments")
+class SaleViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Sale.objects.all().select_related("quotation", "invoice").prefetch_related("payments")
     serializer_class = SaleSerializer
     permission_classes = [SalePermission, SalePermission]
+    # 🏷️ Los pagos actualizan el estado de la venta (y su updated_at); la factura y la cotización aportan su propia fecha
+    conditional_timestamp_fields = ("updated_at", "quotation__updated_at", "invoice__updated_at")
 
     @action(detail=True, methods=["post"])
     def mark_delivered(self, request, pk=None):
@@ -38,3 +43,14 @@ class SaleViewSet(viewsets.ModelViewSet):
             serializer.save(sale=sale)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=["post"], url_path="render-invoice-pdf")
+    def render_invoice_pdf(self, request, pk=None):
+        """Encola la generación del PDF de la factura y devuelve el id del job."""
+        sale = self.get_object()
+        if not hasattr(sale, "invoice"):
+            return Response({"detail": "Esta venta todavía no tiene factura."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        job = submit_render_job("invoice", sale.invoice.pk, user=request.user)
+        serializer = PDFRenderJobSerializer(job, context={"request": request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
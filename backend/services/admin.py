@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MetalPrice, CurrencyRate
+from .models import MetalPrice, MetalPriceHistory, CurrencyRate, PriceRefreshJob
 
 
 @admin.register(MetalPrice)
@@ -8,3 +8,22 @@ class ServiceAdmin(admin.ModelAdmin):
     search_fields = ('name', 'symbol')
 
 
+@admin.register(MetalPriceHistory)
+class MetalPriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ('symbol', 'ts', 'price_usd')
+    list_filter = ('symbol',)
+    date_hierarchy = 'ts'
+
+    # El histórico es de solo lectura: lo alimenta `update_prices`
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PriceRefreshJob)
+class PriceRefreshJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'trigger', 'requested_by', 'created_at', 'finished_at', 'duration')
+    list_filter = ('status', 'trigger')
+    readonly_fields = ('status', 'trigger', 'progress', 'error', 'requested_by', 'created_at', 'started_at', 'finished_at')
@@ -1,5 +1,4 @@
-import yfinance as yf
-from datetime import datetime
+from services.providers import get_provider
 
 # 🧱 Lista oficial de commodities/metales verificados en Yahoo Finance
 TICKERS = {
@@ -22,50 +21,57 @@ CURRENCIES = {
 }
 
 
-def get_yfinance_prices(symbols=None):
+def _fetch_closes(names, catalog, provider=None):
     """
-    Obtiene precios actualizados de metales y commodities desde Yahoo Finance.
-    Si el mercado está cerrado, devuelve el último precio histórico disponible (1 mes).
+    Resuelve los nombres a tickers y pide todos los cierres en una sola llamada
+    al proveedor. Devuelve {nombre: cierre} solo con los que tienen datos.
+    """
+    tickers = {name: catalog[name] for name in names if name in catalog}
+    for name in names:
+        if name not in catalog:
+            print(f"❌ {name} → símbolo no registrado.")
+    if not tickers:
+        return {}
+
+    provider = provider or get_provider()
+    try:
+        closes = provider.fetch_closes(tickers.values())
+    except Exception as e:
+        print(f"⚠️ Error al consultar {provider.name} ({', '.join(tickers.values())}): {e}")
+        return {}
+
+    result = {}
+    for name, ticker in tickers.items():
+        if ticker not in closes:
+            print(f"❌ {name} ({ticker}) → sin datos disponibles.")
+            continue
+        result[name] = round(closes[ticker], 4)
+    return result
+
+
+def get_yfinance_prices(symbols=None, provider=None):
+    """
+    Obtiene precios actualizados de metales y commodities (por defecto desde Yahoo Finance).
+    Todos los símbolos se piden en una sola llamada; si el mercado está cerrado
+    se devuelve el último cierre disponible.
     """
     if symbols is None:
         symbols = TICKERS.keys()
 
-    prices = {}
-    for name in symbols:
-        ticker = TICKERS.get(name)
-        try:
-            data = yf.Ticker(ticker).history(period="1mo")
-            if data.empty:
-                print(f"❌ {name} ({ticker}) → sin datos disponibles.")
-                continue
-            last_close = data["Close"].dropna().iloc[-1]
-            prices[name] = round(float(last_close), 4)
-            print(f"✅ {name} ({ticker}) → {last_close:.4f} USD (último cierre disponible)")
-        except Exception as e:
-            print(f"⚠️ Error al obtener {name} ({ticker}): {e}")
-
+    prices = _fetch_closes(list(symbols), TICKERS, provider)
+    for name, price in prices.items():
+        print(f"✅ {name} ({TICKERS[name]}) → {price:.4f} USD (último cierre disponible)")
     return prices
 
 
-def get_currency_rates(symbols=None):
+def get_currency_rates(symbols=None, provider=None):
     """
-    Obtiene tasas de cambio de divisas desde Yahoo Finance.
+    Obtiene tasas de cambio de divisas (por defecto desde Yahoo Finance), en una sola llamada.
     """
     if symbols is None:
         symbols = CURRENCIES.keys()
 
-    rates = {}
-    for name in symbols:
-        ticker = CURRENCIES[name]
-        try:
-            data = yf.Ticker(ticker).history(period="1mo")
-            if data.empty:
-                print(f"❌ {name} ({ticker}) → sin datos disponibles.")
-                continue
-            rate = data["Close"].dropna().iloc[-1]
-            rates[name] = round(float(rate), 4)
-            print(f"✅ {name} ({ticker}) → {rate:.4f}")
-        except Exception as e:
-            print(f"⚠️ Error al obtener tasa {name} ({ticker}): {e}")
-
+    rates = _fetch_closes(list(symbols), CURRENCIES, provider)
+    for name, rate in rates.items():
+        print(f"✅ {name} ({CURRENCIES[name]}) → {rate:.4f}")
     return rates
@@ -4,3 +4,24 @@ from django.apps import AppConfig
 class ServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'services'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from core.events import publish_price_change
+        from services.fx import invalidate_usd_rates
+        from services.models import CurrencyRate, MetalPrice
+        from services.price_table import publish_on_commit
+
+        # 💱 Un tipo de cambio nuevo invalida la caché de tasas del proceso
+        post_save.connect(invalidate_usd_rates, sender=CurrencyRate, dispatch_uid="fx_rates_post_save")
+        post_delete.connect(invalidate_usd_rates, sender=CurrencyRate, dispatch_uid="fx_rates_post_delete")
+
+        # 🗺️ Y la tabla de precios compartida se vuelve a publicar al confirmar el cambio
+        for model in (MetalPrice, CurrencyRate):
+            post_save.connect(publish_on_commit, sender=model, dispatch_uid=f"price_table_post_save_{model.__name__}")
+            post_delete.connect(publish_on_commit, sender=model, dispatch_uid=f"price_table_post_delete_{model.__name__}")
+
+        # 📡 Y los clientes conectados a /api/events/ reciben el aviso
+        for model in (MetalPrice, CurrencyRate):
+            post_save.connect(publish_price_change, sender=model, dispatch_uid=f"price_events_post_save_{model.__name__}")
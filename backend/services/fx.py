@@ -0,0 +1,127 @@
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.conf import settings
+
+from services.models import CurrencyRate
+from services.price_table import current_price_table
+
+
+_lock = threading.Lock()
+_rates = None
+_expires_at = 0.0
+_matrix = None
+
+
+def load_usd_rates():
+    """{moneda: tipo de cambio desde USD} con el registro más reciente de cada par (una consulta)."""
+    rates = {"USD": Decimal("1")}
+    queryset = (
+        CurrencyRate.objects.filter(base_currency="USD")
+        .order_by("target_currency", "-last_updated")
+        .values_list("target_currency", "rate")
+    )
+    for currency, rate in queryset:
+        rates.setdefault(currency, rate)
+    return rates
+
+
+def usd_rates():
+    """
+    Igual que `load_usd_rates`, pero sin consultar la base de datos: se lee de
+    la tabla de precios compartida (services.price_table) y, si no hay una
+    publicada, de una copia en memoria del proceso que dura FX_RATE_CACHE_TTL
+    segundos. Esa copia se invalida al guardar o borrar un CurrencyRate en este
+    proceso; el TTL acota cuánto tarda en verse un cambio hecho en otro.
+    """
+    global _rates, _expires_at
+    # 🗺️ Con la tabla de precios compartida publicada no hace falta consultar
+    table = current_price_table()
+    if table is not None:
+        return table.usd_rates()
+
+    with _lock:
+        if _rates is not None and time.monotonic() < _expires_at:
+            return _rates
+
+    rates = load_usd_rates()
+    with _lock:
+        _rates = rates
+        _expires_at = time.monotonic() + settings.FX_RATE_CACHE_TTL
+    return rates
+
+
+def invalidate_usd_rates(**kwargs):
+    """Descarta la caché (también sirve como receptor de señales de CurrencyRate)."""
+    global _rates
+    with _lock:
+        _rates = None
+
+
+class ConversionMatrix:
+    """
+    Tipos de cambio cruzados entre todas las monedas con tasa registrada,
+    derivados de las tasas USD -> X en un solo paso: `matrix[i, j]` convierte
+    una unidad de `currencies[i]` a `currencies[j]` (tasa_j / tasa_i).
+
+    Se calcula en float64: para montos de cotizaciones y reportes redondeados
+    a centavos la precisión sobra. El redondeo final de cada monto sí se hace
+    con Decimal (ROUND_HALF_UP), como en el resto de los importes.
+    """
+
+    def __init__(self, usd_rates):
+        self.source = usd_rates
+        self.currencies = sorted(currency for currency, rate in usd_rates.items() if rate and rate > 0)
+        self.index = {currency: i for i, currency in enumerate(self.currencies)}
+        rates = np.array([float(usd_rates[currency]) for currency in self.currencies], dtype=np.float64)
+        self.matrix = rates[np.newaxis, :] / rates[:, np.newaxis]
+
+    def rate(self, source, target):
+        """Tipo de cambio `source` -> `target` (KeyError si alguna moneda no tiene tasa)."""
+        return float(self.matrix[self.index[source], self.index[target]])
+
+    def convert(self, amounts, sources, targets, decimals=2):
+        """
+        Convierte cada `amounts[k]` de `sources[k]` a `targets[k]`: los factores
+        y productos se calculan en una sola operación vectorizada (float64) y
+        cada resultado se redondea con Decimal ROUND_HALF_UP, igual que los
+        importes de las cotizaciones. Devuelve (lista de Decimal, con None en
+        las filas con alguna moneda desconocida, y la máscara de esas filas).
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        source_idx = self._indices(sources)
+        target_idx = self._indices(targets)
+        unknown = (source_idx < 0) | (target_idx < 0)
+
+        factors = self.matrix[np.where(unknown, 0, source_idx), np.where(unknown, 0, target_idx)]
+        converted = amounts * factors
+        step = Decimal(1).scaleb(-decimals)
+        # repr(): el float más corto que lo representa, para que 1.005 se redondee como 1.005 y no como 1.00499...
+        results = [
+            None if missing else Decimal(repr(value)).quantize(step, rounding=ROUND_HALF_UP)
+            for value, missing in zip(converted.tolist(), unknown.tolist())
+        ]
+        return results, unknown
+
+    def _indices(self, codes):
+        """Posición de cada moneda en la matriz (-1 si no tiene tasa); cada código distinto se busca una vez."""
+        codes = np.char.upper(np.asarray(codes, dtype=str))
+        unique, inverse = np.unique(codes, return_inverse=True)
+        lookup = np.array([self.index.get(code, -1) for code in unique], dtype=np.intp)
+        return lookup[inverse].reshape(codes.shape)
+
+
+def conversion_matrix():
+    """
+    Matriz de tipos cruzados de las tasas vigentes (`usd_rates`). Se recalcula
+    solo cuando cambian las tasas: la tabla compartida y la caché en memoria
+    devuelven el mismo dict hasta la siguiente actualización.
+    """
+    global _matrix
+    rates = usd_rates()
+    matrix = _matrix
+    if matrix is None or matrix.source is not rates:
+        matrix = _matrix = ConversionMatrix(rates)
+    return matrix
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from services.price_table import current_price_table, disable_price_table, publish_price_table
+
+
+class Command(BaseCommand):
+    help = "🗺️ Publica la tabla de precios compartida entre procesos con los precios guardados"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--disable",
+            action="store_true",
+            help="Desactiva la tabla: los procesos vuelven a leer precios de la base de datos.",
+        )
+
+    def handle(self, *args, **options):
+        if options["disable"]:
+            disable_price_table()
+            self.stdout.write("⏸️ Tabla de precios desactivada.")
+            return
+
+        version = publish_price_table()
+        table = current_price_table()
+        metals = len(table.metal_prices()) if table else 0
+        rates = len(table.usd_rates()) - 1 if table else 0
+        self.stdout.write(f"✅ Tabla de precios v{version} publicada: {metals} metal(es), {rates} tipo(s) de cambio.")
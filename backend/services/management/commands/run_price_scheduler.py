@@ -0,0 +1,81 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from services.models import PriceRefreshJob
+from services.price_refresh import create_refresh_job, run_refresh_job
+from services.scheduling import MarketHours, next_run_at
+
+
+class Command(BaseCommand):
+    help = (
+        "⏰ Proceso de larga duración que actualiza precios de metales y tipos de cambio "
+        "cada PRICE_SCHEDULER_INTERVAL segundos (con jitter y respetando el horario de mercado)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=int, default=None,
+                            help="Segundos entre actualizaciones (por defecto PRICE_SCHEDULER_INTERVAL).")
+        parser.add_argument("--jitter", type=float, default=None,
+                            help="Variación aleatoria como fracción del intervalo (por defecto PRICE_SCHEDULER_JITTER).")
+        parser.add_argument("--ignore-market-hours", action="store_true",
+                            help="Actualiza a toda hora, sin revisar el horario de mercado.")
+        parser.add_argument("--once", action="store_true",
+                            help="Hace una sola actualización y termina (útil desde cron).")
+
+    def handle(self, *args, **options):
+        interval = options["interval"] or settings.PRICE_SCHEDULER_INTERVAL
+        jitter = settings.PRICE_SCHEDULER_JITTER if options["jitter"] is None else options["jitter"]
+        market = None if options["ignore_market_hours"] else MarketHours.from_settings()
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+        if options["once"]:
+            self.run_once()
+            return
+
+        self.stdout.write(f"⏰ Programador de precios iniciado: cada {interval}s ± {jitter:.0%}.")
+        # 🚀 La primera corrida es inmediata si el mercado está abierto
+        now = timezone.now()
+        run_at = now if market is None or market.is_open(now) else next_run_at(
+            now, interval, jitter, market, settings.PRICE_SCHEDULER_OFF_HOURS_INTERVAL
+        )
+
+        while not stop.is_set():
+            wait = (run_at - timezone.now()).total_seconds()
+            if wait > 0:
+                self.stdout.write(f"💤 Próxima actualización: {timezone.localtime(run_at):%Y-%m-%d %H:%M:%S}")
+                if stop.wait(wait):
+                    break
+
+            self.run_once()
+            # El intervalo se cuenta desde el final de la corrida: una corrida lenta nunca se encima con la siguiente
+            run_at = next_run_at(timezone.now(), interval, jitter, market, settings.PRICE_SCHEDULER_OFF_HOURS_INTERVAL)
+
+        self.stdout.write("👋 Programador de precios detenido.")
+
+    def run_once(self):
+        try:
+            job, created = create_refresh_job(trigger="scheduler")
+        except Exception as e:
+            # Base de datos caída, etc.: se reintenta en la siguiente vuelta
+            self.stderr.write(f"❌ No se pudo crear la actualización: {e}")
+            return None
+
+        if not created:
+            self.stdout.write(f"⏭️ Ya hay una actualización en curso ({job.pk}); se omite esta vuelta.")
+            return None
+
+        run_refresh_job(job.pk)
+        job = PriceRefreshJob.objects.get(pk=job.pk)
+        duration = f"{job.duration:.2f}s" if job.duration is not None else "—"
+        if job.status == "done":
+            self.stdout.write(f"✅ Precios actualizados en {duration} ({job.pk}).")
+        else:
+            self.stderr.write(f"❌ La actualización falló en {duration}: {job.error}")
+        return job
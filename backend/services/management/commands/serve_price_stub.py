@@ -0,0 +1,61 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "🧪 Servidor HTTP local que imita a un proveedor de precios (para el proveedor `http`): "
+        "responde GET /prices?tickers=A,B con los cierres del archivo de fixtures"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--fixture", default=settings.PRICE_FIXTURE_PATH, help="JSON con {ticker: cierre}.")
+        parser.add_argument("--delay", type=float, default=0, help="Segundos de latencia por respuesta.")
+        parser.add_argument("--fail-rate", type=float, default=0, help="Fracción de respuestas con error 503 (0 a 1).")
+
+    def handle(self, *args, **options):
+        closes = json.loads(Path(options["fixture"]).read_text(encoding="utf-8"))
+        delay = options["delay"]
+        fail_rate = options["fail_rate"]
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.rstrip("/") != "/prices":
+                    return self._send(404, {"error": "not found"})
+                if delay:
+                    time.sleep(delay)
+                if fail_rate and random.random() < fail_rate:
+                    return self._send(503, {"error": "stub: fallo simulado"})
+
+                requested = parse_qs(url.query).get("tickers", [""])[0].split(",")
+                self._send(200, {ticker: closes[ticker] for ticker in requested if ticker in closes})
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options["host"], options["port"]), Handler)
+        self.stdout.write(f"🚀 Stub de precios en http://{options['host']}:{options['port']}/prices (Ctrl+C para salir)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
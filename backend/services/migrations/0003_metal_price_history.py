@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:35
+
+import django.db.models.functions.text
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_history(apps, schema_editor):
+    """El valor vigente de cada metal es el primer punto de su histórico."""
+    MetalPrice = apps.get_model("services", "MetalPrice")
+    MetalPriceHistory = apps.get_model("services", "MetalPriceHistory")
+    MetalPriceHistory.objects.bulk_create(
+        MetalPriceHistory(symbol=symbol.upper(), ts=last_updated, price_usd=price_usd)
+        for symbol, last_updated, price_usd in MetalPrice.objects.values_list("symbol", "last_updated", "price_usd")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0002_metalprice_base_quantity_metalprice_measure_units'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetalPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=20)),
+                ('ts', models.DateTimeField(default=django.utils.timezone.now)),
+                ('price_usd', models.DecimalField(decimal_places=4, max_digits=12)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='metalprice',
+            index=models.Index(django.db.models.functions.text.Upper('symbol'), models.OrderBy(models.F('last_updated'), descending=True), name='metalprice_symbol_current_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='metalpricehistory',
+            index=models.Index(models.F('symbol'), models.OrderBy(models.F('ts'), descending=True), name='metalprice_hist_symbol_ts_idx'),
+        ),
+        migrations.RunPython(seed_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:42
+
+from django.db import migrations, models
+
+
+def drop_duplicates(apps, schema_editor):
+    """Antes de las restricciones: conservar solo la fila más reciente de cada símbolo y de cada par."""
+    MetalPrice = apps.get_model("services", "MetalPrice")
+    CurrencyRate = apps.get_model("services", "CurrencyRate")
+
+    for model, key in ((MetalPrice, ("symbol",)), (CurrencyRate, ("base_currency", "target_currency"))):
+        seen = set()
+        duplicates = []
+        for row in model.objects.order_by(*key, "-last_updated", "-pk").values("pk", *key):
+            value = tuple(row[field] for field in key)
+            if value in seen:
+                duplicates.append(row["pk"])
+            seen.add(value)
+        model.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_pricerefreshjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='currencyrate',
+            constraint=models.UniqueConstraint(fields=('base_currency', 'target_currency'), name='currencyrate_pair_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='metalprice',
+            constraint=models.UniqueConstraint(fields=('symbol',), name='metalprice_symbol_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_unique_symbol_and_pair'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricerefreshjob',
+            name='trigger',
+            field=models.CharField(choices=[('api', 'API'), ('scheduler', 'Programada')], default='api', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def fix_lumber_base_quantity(apps, schema_editor):
+    """LBR=F cotiza por cada 1,000 pies tablares: las filas guardadas con cantidad base 1 (o sin ella) pasan a 1000."""
+    MetalPrice = apps.get_model("services", "MetalPrice")
+    MetalPrice.objects.filter(symbol__iexact="LUMBER", base_quantity__in=[0, 1]).update(base_quantity=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_pricerefreshjob_trigger'),
+    ]
+
+    operations = [
+        migrations.RunPython(fix_lumber_base_quantity, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,24 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Upper
 from django.utils import timezone
 
+
+class MetalPriceQuerySet(models.QuerySet):
+    def current(self, symbol):
+        """
+        Precio vigente de un metal (sin distinguir mayúsculas). Con el índice
+        (UPPER(symbol), last_updated DESC) es una sola lectura del índice.
+        """
+        return self.filter(symbol__iexact=symbol).order_by("-last_updated").first()
+
+
 class MetalPrice(models.Model):
+    """Precio vigente de cada metal: una fila por símbolo, la reescribe `update_prices`."""
+
     name = models.CharField(max_length=50)
     symbol = models.CharField(max_length=20)
     price_usd = models.DecimalField(max_digits=12, decimal_places=4)
@@ -9,24 +26,126 @@ class MetalPrice(models.Model):
     base_quantity = models.DecimalField(max_digits=12, decimal_places=4, default=0)
     last_updated = models.DateTimeField(default=timezone.now)
 
+    objects = MetalPriceQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["symbol"], name="metalprice_symbol_unique"),
+        ]
+        indexes = [
+            models.Index(Upper("symbol"), F("last_updated").desc(), name="metalprice_symbol_current_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.symbol}) - {self.price_usd} USD"
 
 
+class MetalPriceHistoryQuerySet(models.QuerySet):
+    def as_of(self, symbol, moment):
+        """
+        Último precio registrado de `symbol` en o antes de `moment`.
+        Se resuelve con el índice (symbol, ts DESC): una lectura del índice.
+        """
+        return self.filter(symbol=symbol.upper(), ts__lte=moment).order_by("-ts").first()
+
+    def series(self, symbol, start=None, end=None):
+        """Serie de precios de `symbol` entre `start` y `end` (ambos opcionales), del más reciente al más antiguo."""
+        queryset = self.filter(symbol=symbol.upper())
+        if start is not None:
+            queryset = queryset.filter(ts__gte=start)
+        if end is not None:
+            queryset = queryset.filter(ts__lte=end)
+        return queryset.order_by("-ts")
+
+
+class MetalPriceHistory(models.Model):
+    """
+    Histórico de precios (solo inserciones): una fila por símbolo y lectura.
+    Nunca se actualiza; `MetalPrice` conserva solo el valor vigente.
+    """
+
+    symbol = models.CharField(max_length=20)
+    ts = models.DateTimeField(default=timezone.now)
+    price_usd = models.DecimalField(max_digits=12, decimal_places=4)
+
+    objects = MetalPriceHistoryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(F("symbol"), F("ts").desc(), name="metalprice_hist_symbol_ts_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} @ {self.ts:%Y-%m-%d %H:%M} - {self.price_usd} USD"
+
+
 class CurrencyRate(models.Model):
     base_currency = models.CharField(max_length=10, default="USD")
     target_currency = models.CharField(max_length=10)
     rate = models.DecimalField(max_digits=12, decimal_places=6)
     last_updated = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["base_currency", "target_currency"], name="currencyrate_pair_unique"),
+        ]
+
     def __str__(self):
         return f"1 {self.base_currency} = {self.rate} {self.target_currency}"
 
 
+
+class PriceRefreshJob(models.Model):
+    """Actualización de precios en segundo plano (ver `services.price_refresh`)."""
+
+    STATUS_CHOICES = [
+        ("pending", "Pendiente"),
+        ("running", "Actualizando"),
+        ("done", "Terminado"),
+        ("failed", "Fallido"),
+    ]
+    ACTIVE_STATUSES = ("pending", "running")
+    TRIGGER_CHOICES = [
+        ("api", "API"),
+        ("scheduler", "Programada"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    trigger = models.CharField(max_length=20, choices=TRIGGER_CHOICES, default="api")
+    # {símbolo: "pending" | "fetching" | "done" | "missing"} para cada metal y par de divisas
+    progress = models.JSONField(default=dict)
+    error = models.TextField(blank=True, null=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="price_refresh_jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "-created_at"], name="pricejob_status_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Actualización de precios {self.created_at:%Y-%m-%d %H:%M} ({self.status})"
+
+    @property
+    def duration(self):
+        """Segundos que tardó la actualización (None si no ha terminado)."""
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
+
 # LBR -> 1.000 bd. ft. Un pie tablar es una unidad de volumen estándar en la industria de la madera
 # PVC -> 1 tonelada métrica = 1,000 kg
 # ALM -> 1 tonelada métrica = 1,000 kg
 # IRON -> 1 tonelada métrica = 1,000 kg
 # COPPER -> 1 libra = 0.453592 kg
 # GOLD -> 1 onza troy = 31.1035 gramos
-# SILVER -> 1 onza troy = 31.1035 gramos    
\ No newline at end of file
+# SILVER -> 1 onza troy = 31.1035 gramos
@@ -0,0 +1,120 @@
+import datetime
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+class SnapshotCache:
+    """
+    Resultado de una consulta costosa guardado en la caché de Django con
+    stale-while-revalidate:
+
+    - fresco (edad < `ttl`): se sirve tal cual;
+    - vencido pero dentro de `max_stale`: se sirve y se refresca en segundo plano;
+    - ausente o demasiado viejo: se espera a la consulta.
+
+    Las consultas se unifican (single-flight): dentro del proceso, todos los
+    hilos esperan la misma; entre procesos, `cache.add` actúa de candado
+    (con un backend compartido como Redis o Memcached).
+    """
+
+    def __init__(self, key, loader, ttl, max_stale, fetch_timeout=30):
+        self.key = key
+        self.lock_key = f"{key}:refreshing"
+        self.loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.fetch_timeout = fetch_timeout
+        self._lock = threading.Lock()
+        self._in_flight = None
+
+    def get(self):
+        """Devuelve (entrada, estado) con estado "fresh", "stale" o "miss"."""
+        entry = cache.get(self.key)
+        age = time.time() - entry["fetched_at"] if entry else None
+
+        if entry and age < self.ttl:
+            return entry, "fresh"
+        if entry and age < self.ttl + self.max_stale:
+            self._refresh()
+            return entry, "stale"
+
+        future = self._refresh()
+        if future is None:
+            # Otro proceso está consultando: esperar a que deje el resultado en la caché
+            return self._wait_for_other_process(), "miss"
+        return future.result(timeout=self.fetch_timeout), "miss"
+
+    def _refresh(self):
+        """
+        Lanza (o reutiliza) la consulta en curso. Devuelve su Future, o None si
+        la está haciendo otro proceso.
+        """
+        with self._lock:
+            if self._in_flight is not None:
+                return self._in_flight
+            if not cache.add(self.lock_key, True, timeout=self.fetch_timeout):
+                return None
+            future = self._in_flight = Future()
+
+        threading.Thread(target=self._load, args=(future,), name=f"refresh:{self.key}", daemon=True).start()
+        return future
+
+    def _load(self, future):
+        try:
+            data = self.loader()
+            entry = {"data": data, "fetched_at": time.time()}
+            # Se conserva hasta el final de la ventana "stale"; después se vuelve a consultar
+            cache.set(self.key, entry, timeout=int(self.ttl + self.max_stale) + 1)
+            future.set_result(entry)
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            cache.delete(self.lock_key)
+            with self._lock:
+                self._in_flight = None
+
+    def _wait_for_other_process(self):
+        deadline = time.monotonic() + self.fetch_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            entry = cache.get(self.key)
+            if entry:
+                return entry
+            if cache.get(self.lock_key) is None:
+                break
+        # El otro proceso falló o tardó demasiado: consultar aquí
+        future = self._refresh()
+        if future is None:
+            raise TimeoutError("La actualización de precios en curso no terminó a tiempo.")
+        return future.result(timeout=self.fetch_timeout)
+
+
+def _load_market_prices():
+    from services.api_clients import get_yfinance_prices
+    from services.providers import PriceProviderError
+
+    prices = get_yfinance_prices()
+    if not prices:
+        # Sin precios no se guarda nada: la caché conserva la última foto buena
+        raise PriceProviderError("Ningún proveedor devolvió precios.")
+    return prices
+
+
+market_prices_snapshot = SnapshotCache(
+    key="services:market_prices",
+    loader=_load_market_prices,
+    ttl=settings.PRICE_SNAPSHOT_TTL,
+    max_stale=settings.PRICE_SNAPSHOT_MAX_STALE,
+)
+
+
+def get_market_prices():
+    """Precios de mercado desde la foto en caché: (precios, momento de la consulta, estado)."""
+    entry, state = market_prices_snapshot.get()
+    fetched_at = datetime.datetime.fromtimestamp(entry["fetched_at"], tz=timezone.get_current_timezone())
+    return entry["data"], fetched_at, state
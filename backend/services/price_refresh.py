@@ -0,0 +1,326 @@
+"""
+Actualización de precios de metales y tipos de cambio.
+
+`refresh_prices` es la lógica del comando `update_prices`; al terminar publica
+la tabla de precios compartida (services.price_table). La API no la
+ejecuta dentro de la petición: crea un `PriceRefreshJob` y lo corre en un hilo
+en segundo plano, guardando el avance por símbolo para consultarlo después.
+El comando `run_price_scheduler` crea los mismos jobs periódicamente.
+
+Un candado de PostgreSQL (`refresh_lock`) impide que dos actualizaciones
+corran a la vez, vengan de donde vengan.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from core.events import publish
+from core.pricing import propagate_metal_prices
+from services.api_clients import CURRENCIES, TICKERS, get_currency_rates, get_yfinance_prices
+from services.fx import invalidate_usd_rates
+from services.price_table import publish_or_disable
+from services.resilience import percentile
+from services.models import CurrencyRate, MetalPrice, MetalPriceHistory, PriceRefreshJob
+
+
+# Unidades por símbolo
+UNIT_MAP = {
+    "PVC": "toneladas",
+    "GOLD": "onza troy",
+    "SILVER": "onza troy",
+    "COPPER": "libras",
+    "ALUMINUM": "toneladas",
+    "IRON": "toneladas",
+    "LUMBER": "bd. ft.",
+    "OIL": "barril",
+    "GAS": "MMBtu",
+}
+
+# Cantidades base por símbolo
+BASE_QTY_MAP = {
+    "PVC": 1,
+    "GOLD": 1,
+    "SILVER": 1,
+    "COPPER": 1,
+    "ALUMINUM": 1,
+    "IRON": 1,
+    "LUMBER": 1000,  # LBR=F cotiza por cada 1,000 pies tablares
+    "OIL": 1,
+    "GAS": 1,
+}
+
+
+REFRESH_LOCK_KEY = "services.price_refresh_run"
+
+
+class RefreshInProgress(Exception):
+    """Otra actualización de precios tiene el candado."""
+
+
+@contextmanager
+def refresh_lock():
+    """
+    Candado de sesión de PostgreSQL mientras corre una actualización. No
+    espera: si otro proceso o hilo lo tiene, lanza RefreshInProgress. Si el
+    proceso muere, PostgreSQL lo libera al cerrarse la conexión.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [REFRESH_LOCK_KEY])
+        acquired = cursor.fetchone()[0]
+    if not acquired:
+        raise RefreshInProgress("Ya hay una actualización de precios corriendo.")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [REFRESH_LOCK_KEY])
+
+
+def refresh_prices(log=print, on_progress=None):
+    """
+    Descarga los precios de metales y tipos de cambio y los guarda.
+    `on_progress(símbolos, estado)` recibe "fetching", "done" o "missing" para
+    los metales y pares de divisas de cada fase. Devuelve {"metals": [...], "currencies": [...]}
+    con los símbolos actualizados y "products" con los productos repreciados.
+    Lanza RefreshInProgress si ya hay otra actualización corriendo.
+    """
+    with refresh_lock():
+        return _refresh_prices(log, on_progress or (lambda symbols, state: None))
+
+
+def _refresh_prices(log, report):
+    log("⏳ Obteniendo precios de metales y commodities desde Yahoo Finance...")
+    report(list(TICKERS), "fetching")
+    metals = get_yfinance_prices()
+    log(str(metals))
+
+    now = timezone.now()
+    rows = []
+    for name in TICKERS:
+        if name not in metals:
+            continue
+        rows.append(MetalPrice(
+            symbol=name,
+            name=name.title(),
+            price_usd=metals[name],
+            last_updated=now,
+            measure_units=UNIT_MAP.get(name, "kg"),
+            base_quantity=BASE_QTY_MAP.get(name, 1),
+        ))
+
+    # 💾 Un solo INSERT ... ON CONFLICT (symbol) DO UPDATE para todos los metales
+    MetalPrice.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["symbol"],
+        update_fields=["name", "price_usd", "last_updated", "measure_units", "base_quantity"],
+    )
+    # 📈 El histórico solo recibe inserciones: una fila por metal en cada actualización
+    MetalPriceHistory.objects.bulk_create(
+        MetalPriceHistory(symbol=row.symbol.upper(), ts=now, price_usd=row.price_usd) for row in rows
+    )
+
+    updated_symbols = [row.symbol for row in rows]
+    report(updated_symbols, "done")
+    report([name for name in TICKERS if name not in metals], "missing")
+
+    if updated_symbols:
+        log(f"✅ Metales actualizados correctamente: {', '.join(updated_symbols)}")
+    else:
+        log("⚠️ No se encontraron metales para actualizar.")
+
+    # ---------------------------------------------------------------------
+    # TASAS DE CAMBIO
+    # ---------------------------------------------------------------------
+    log("\n⏳ Obteniendo tasas de cambio...")
+    report(list(CURRENCIES), "fetching")
+    currencies = get_currency_rates()
+
+    rates = []
+    for name in CURRENCIES:
+        if name not in currencies:
+            continue
+        try:
+            base, target = name.split("/")
+        except ValueError:
+            log(f"⚠️ Formato inválido en par de divisas: {name}")
+            continue
+        rates.append((name, CurrencyRate(base_currency=base, target_currency=target,
+                                         rate=currencies[name], last_updated=now)))
+
+    # 💾 Un solo INSERT ... ON CONFLICT (base_currency, target_currency) DO UPDATE
+    CurrencyRate.objects.bulk_create(
+        [rate for _, rate in rates],
+        update_conflicts=True,
+        unique_fields=["base_currency", "target_currency"],
+        update_fields=["rate", "last_updated"],
+    )
+    # bulk_create no emite post_save: la caché de tasas se invalida a mano
+    invalidate_usd_rates()
+
+    updated_currencies = [name for name, _ in rates]
+    report(updated_currencies, "done")
+    report([name for name in CURRENCIES if name not in updated_currencies], "missing")
+
+    if updated_currencies:
+        log(f"✅ Tasas de cambio actualizadas: {', '.join(updated_currencies)}")
+    else:
+        log("⚠️ No se encontraron tasas de cambio para actualizar.")
+
+    # 🔁 Los productos ligados a un metal toman el precio recién guardado (un solo UPDATE)
+    changed_products = propagate_metal_prices() if updated_symbols else 0
+    log(f"🔁 {changed_products} producto(s) con precio actualizado desde metales.")
+
+    # La tabla compartida y los clientes en vivo también se avisan a mano, y solo ahora: así
+    # nadie ve precios de metales nuevos junto a precios de productos todavía viejos
+    if publish_or_disable() is None:
+        log("⚠️ No se pudo publicar la tabla de precios compartida; se leerá de la base de datos.")
+    # 📡 Un solo evento por actualización
+    publish("prices", {"symbols": updated_symbols, "currencies": updated_currencies})
+
+    return {"metals": updated_symbols, "currencies": updated_currencies, "products": changed_products}
+
+
+# ---------------------------------------------------------------------------
+# Jobs en segundo plano
+# ---------------------------------------------------------------------------
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Un solo hilo por proceso: las actualizaciones nunca corren en paralelo entre sí."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-refresh")
+        return _executor
+
+
+def submit_refresh_job(user=None):
+    """
+    Devuelve el job de actualización en curso o crea uno nuevo y lo encola al
+    confirmar la transacción: (job, creado).
+    """
+    with transaction.atomic():
+        job, created = create_refresh_job(user=user)
+        if created:
+            job_id = job.pk
+            transaction.on_commit(lambda: get_executor().submit(run_refresh_job, job_id))
+        return job, created
+
+
+def create_refresh_job(user=None, trigger="api"):
+    """
+    Devuelve (job activo, False) si ya hay una actualización pendiente o en
+    curso; si no, (job nuevo, True). Un candado de PostgreSQL evita que dos
+    peticiones simultáneas creen dos jobs.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", ["services.price_refresh_job"])
+
+        # Un job que lleva demasiado tiempo activo quedó huérfano (p. ej. se reinició el servidor)
+        stale_before = timezone.now() - timedelta(seconds=settings.PRICE_REFRESH_JOB_TIMEOUT)
+        PriceRefreshJob.objects.filter(status__in=PriceRefreshJob.ACTIVE_STATUSES, created_at__lt=stale_before).update(
+            status="failed", error="El job no terminó a tiempo.", finished_at=timezone.now()
+        )
+
+        active = (
+            PriceRefreshJob.objects.filter(status__in=PriceRefreshJob.ACTIVE_STATUSES)
+            .order_by("-created_at")
+            .first()
+        )
+        if active:
+            return active, False
+
+        job = PriceRefreshJob.objects.create(
+            requested_by=user if user and user.is_authenticated else None,
+            trigger=trigger,
+            progress={name: "pending" for name in [*TICKERS, *CURRENCIES]},
+        )
+        return job, True
+
+
+def run_refresh_job(job_id):
+    """
+    Corre `refresh_prices` para el job y va guardando el avance. Se ejecuta en
+    el hilo de fondo (API) o directamente en el proceso del programador.
+    """
+    close_old_connections()
+    try:
+        updated = PriceRefreshJob.objects.filter(pk=job_id, status="pending").update(
+            status="running", started_at=timezone.now()
+        )
+        if not updated:
+            return
+
+        job = PriceRefreshJob.objects.get(pk=job_id)
+
+        def on_progress(symbols, state):
+            if not symbols:
+                return
+            for symbol in symbols:
+                job.progress[symbol] = state
+            PriceRefreshJob.objects.filter(pk=job_id).update(progress=job.progress)
+
+        try:
+            refresh_prices(log=lambda message: None, on_progress=on_progress)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        else:
+            job.status = "done"
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "progress", "finished_at"])
+    finally:
+        close_old_connections()
+
+
+def refresh_run_stats(limit=100):
+    """
+    Duración en segundos de las últimas `limit` actualizaciones terminadas,
+    en total y por origen (API o programada), junto al intervalo configurado
+    del programador para ajustar la cadencia.
+    """
+    jobs = list(
+        PriceRefreshJob.objects.filter(started_at__isnull=False, finished_at__isnull=False)
+        .order_by("-started_at")[:limit]
+    )
+    by_trigger = {}
+    for job in jobs:
+        by_trigger.setdefault(job.trigger, []).append(job.duration)
+
+    last = jobs[0] if jobs else None
+    return {
+        "runs": len(jobs),
+        "failed": sum(1 for job in jobs if job.status == "failed"),
+        "duration_seconds": _duration_summary([job.duration for job in jobs]),
+        "by_trigger": {trigger: _duration_summary(durations) for trigger, durations in by_trigger.items()},
+        "last_run": {
+            "id": str(last.pk),
+            "trigger": last.trigger,
+            "status": last.status,
+            "started_at": last.started_at.isoformat(),
+            "duration_seconds": round(last.duration, 3),
+        } if last else None,
+        "scheduler_interval_seconds": settings.PRICE_SCHEDULER_INTERVAL,
+    }
+
+
+def _duration_summary(durations):
+    durations = sorted(durations)
+    if not durations:
+        return None
+    return {
+        "runs": len(durations),
+        "avg": round(sum(durations) / len(durations), 3),
+        "p50": round(percentile(durations, 0.50), 3),
+        "p95": round(percentile(durations, 0.95), 3),
+        "max": round(durations[-1], 3),
+    }
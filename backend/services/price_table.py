@@ -0,0 +1,352 @@
+"""
+Tabla de precios vigentes compartida entre los procesos del servidor.
+
+La escribe quien cambia precios (la actualización de precios, el admin, el
+comando `publish_price_table`) y cada proceso la lee con `mmap`, sin consultar
+la base de datos. Son dos archivos en PRICE_TABLE_DIR:
+
+- `prices.bin`: la foto completa (cabecera + registros de tamaño fijo; los
+  de metales llevan también su unidad y cantidad base). Se
+  escribe en un temporal y se reemplaza con `os.replace`, así que un lector
+  nunca ve un archivo a medias.
+- `version`: un contador de 8 bytes que se incrementa después de cada
+  reemplazo. Los lectores lo tienen mapeado y solo vuelven a abrir
+  `prices.bin` cuando cambia; la lectura normal no hace ninguna llamada al sistema.
+
+Un contador en 0 (o la falta de archivos) significa "sin tabla": los lectores
+vuelven a consultar la base de datos.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from services.models import CurrencyRate, MetalPrice
+
+
+MAGIC = b"SQPT"
+FORMAT_VERSION = 2
+# magic, formato, decimales de metales, decimales de tasas, versión, publicada (epoch),
+# número de metales, número de tasas, crc32 de los registros
+HEADER = struct.Struct("<4sHBBQdIII")
+# nombre (símbolo o moneda, UTF-8) y valor escalado a entero
+NAME_SIZE = 24
+RECORD = struct.Struct(f"<{NAME_SIZE}sq")
+# metales: símbolo, precio, unidad de medida y cantidad base (con los decimales de los metales);
+# empieza igual que RECORD, así que `_value` sirve para ambos
+METAL_RECORD = struct.Struct(f"<{NAME_SIZE}sq{NAME_SIZE}sq")
+VERSION = struct.Struct("<Q")
+
+METAL_DIGITS = MetalPrice._meta.get_field("price_usd").decimal_places
+RATE_DIGITS = CurrencyRate._meta.get_field("rate").decimal_places
+
+
+class PriceTableError(Exception):
+    """El archivo de la tabla de precios no es válido."""
+
+
+class PriceTable:
+    """
+    Vista de solo lectura sobre una foto de `prices.bin` mapeada en memoria.
+    Los valores se leen del mapa al pedirlos; solo el índice de nombres vive
+    en memoria de Python.
+    """
+
+    def __init__(self, buffer):
+        if len(buffer) < HEADER.size:
+            raise PriceTableError("Archivo truncado.")
+        magic, fmt, metal_digits, rate_digits, version, published_at, n_metals, n_rates, crc = HEADER.unpack_from(buffer)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise PriceTableError("Formato de tabla de precios desconocido.")
+
+        size = n_metals * METAL_RECORD.size + n_rates * RECORD.size
+        payload = memoryview(buffer)[HEADER.size:HEADER.size + size]
+        if len(payload) != size or zlib.crc32(payload) != crc:
+            raise PriceTableError("La tabla de precios está dañada.")
+
+        self._buffer = buffer
+        self.version = version
+        self.published_at = published_at
+        self._metal_digits = metal_digits
+        self._rate_digits = rate_digits
+        self._metals = self._index(HEADER.size, n_metals, METAL_RECORD)
+        self._rates = self._index(HEADER.size + n_metals * METAL_RECORD.size, n_rates, RECORD)
+        self._metal_quotes = None
+        self._metal_prices = None
+        self._usd_rates = None
+
+    def _index(self, start, count, record):
+        """{nombre: desplazamiento del registro}."""
+        index = {}
+        for position in range(start, start + count * record.size, record.size):
+            name = _text(record.unpack_from(self._buffer, position)[0])
+            index[name] = position
+        return index
+
+    def _value(self, position, digits):
+        return Decimal(RECORD.unpack_from(self._buffer, position)[1]).scaleb(-digits)
+
+    def metal_price(self, symbol):
+        """Precio USD vigente de `symbol` (sin distinguir mayúsculas) o None."""
+        position = self._metals.get(symbol) or self._metals.get(symbol.upper())
+        return None if position is None else self._value(position, self._metal_digits)
+
+    def usd_rate(self, currency):
+        """Tipo de cambio USD -> `currency` o None."""
+        if currency == "USD":
+            return Decimal("1")
+        position = self._rates.get(currency)
+        return None if position is None else self._value(position, self._rate_digits)
+
+    def metal_quotes(self):
+        """{símbolo: (precio USD, cantidad base, unidad)}, igual que `load_metal_quotes` (se arma una vez por foto)."""
+        if self._metal_quotes is None:
+            scale = Decimal(1).scaleb(-self._metal_digits)
+            quotes = {}
+            for symbol, position in self._metals.items():
+                _, price, units, base_quantity = METAL_RECORD.unpack_from(self._buffer, position)
+                quotes[symbol] = (Decimal(price) * scale, Decimal(base_quantity) * scale, _text(units))
+            self._metal_quotes = quotes
+        return self._metal_quotes
+
+    def metal_prices(self):
+        """{símbolo: precio USD}, igual que `load_metal_prices`."""
+        if self._metal_prices is None:
+            self._metal_prices = {symbol: quote[0] for symbol, quote in self.metal_quotes().items()}
+        return self._metal_prices
+
+    def usd_rates(self):
+        """{moneda: tipo de cambio desde USD}, igual que `services.fx.load_usd_rates`."""
+        if self._usd_rates is None:
+            rates = {"USD": Decimal("1")}
+            rates.update(
+                (currency, self._value(position, self._rate_digits)) for currency, position in self._rates.items()
+            )
+            self._usd_rates = rates
+        return self._usd_rates
+
+
+def load_metal_quotes():
+    """
+    {símbolo: (precio_usd, cantidad base, unidad de medida)} con el registro
+    más reciente de cada metal (una consulta). El precio es por `cantidad base` unidades.
+    """
+    quotes = {}
+    rows = MetalPrice.objects.order_by("symbol", "-last_updated").values_list(
+        "symbol", "price_usd", "base_quantity", "measure_units"
+    )
+    for symbol, price_usd, base_quantity, measure_units in rows:
+        quotes.setdefault(symbol, (price_usd, base_quantity, measure_units))
+    return quotes
+
+
+def load_metal_prices():
+    """{símbolo: precio_usd} con el registro más reciente de cada metal (una consulta)."""
+    return {symbol: quote[0] for symbol, quote in load_metal_quotes().items()}
+
+
+# ---------------------------------------------------------------------------
+# Escritura
+# ---------------------------------------------------------------------------
+def publish_price_table():
+    """
+    Lee los precios de metales y tipos de cambio vigentes (dos consultas),
+    escribe una foto nueva y avisa a los lectores incrementando el contador.
+    Devuelve la versión publicada.
+    """
+    from services.fx import load_usd_rates
+
+    metals = load_metal_quotes()
+    rates = {currency: rate for currency, rate in load_usd_rates().items() if currency != "USD"}
+
+    directory = Path(settings.PRICE_TABLE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    with _publish_lock(directory):
+        version = _read_version(directory) + 1
+        records = b"".join(
+            [_metal_record(symbol, *quote) for symbol, quote in metals.items()]
+            + [_record(currency, rate, RATE_DIGITS) for currency, rate in rates.items()]
+        )
+        header = HEADER.pack(
+            MAGIC, FORMAT_VERSION, METAL_DIGITS, RATE_DIGITS, version, time.time(),
+            len(metals), len(rates), zlib.crc32(records),
+        )
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".prices-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(header + records)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, directory / "prices.bin")
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        # El contador se escribe al final: quien lo vea cambiar ya encuentra la foto nueva
+        _write_version(directory, version)
+    return version
+
+
+def publish_or_disable():
+    """
+    Publica la tabla; si falla, la desactiva para que nadie lea precios que ya
+    no coinciden con la base de datos. Devuelve la versión publicada o None.
+    """
+    try:
+        return publish_price_table()
+    except Exception:
+        try:
+            disable_price_table()
+        except OSError:
+            pass
+        return None
+
+
+def publish_on_commit(sender, raw=False, **kwargs):
+    """Receptor de señales de MetalPrice y CurrencyRate: republica al confirmar la transacción."""
+    if not raw:
+        transaction.on_commit(publish_or_disable)
+
+
+def disable_price_table():
+    """Pone el contador en 0: los lectores vuelven a la base de datos hasta la próxima publicación."""
+    directory = Path(settings.PRICE_TABLE_DIR)
+    if (directory / "version").exists():
+        with _publish_lock(directory):
+            _write_version(directory, 0)
+
+
+def _record(name, value, digits):
+    return RECORD.pack(_name(name), _scaled(value, digits))
+
+
+def _metal_record(symbol, price_usd, base_quantity, measure_units):
+    return METAL_RECORD.pack(
+        _name(symbol), _scaled(price_usd, METAL_DIGITS),
+        _name(measure_units or ""), _scaled(base_quantity or 0, METAL_DIGITS),
+    )
+
+
+def _name(text):
+    encoded = text.encode("utf-8")
+    if len(encoded) > NAME_SIZE:
+        raise PriceTableError(f"Nombre demasiado largo para la tabla de precios: {text}")
+    return encoded
+
+
+def _text(raw):
+    return raw.rstrip(b"\0").decode("utf-8")
+
+
+def _scaled(value, digits):
+    return int(Decimal(value).scaleb(digits).to_integral_value())
+
+
+class _publish_lock:
+    """Candado de archivo entre procesos para que dos publicaciones no usen la misma versión."""
+
+    def __init__(self, directory):
+        self.path = directory / "publish.lock"
+
+    def __enter__(self):
+        import fcntl
+
+        self.file = open(self.path, "a+b")
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        import fcntl
+
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _read_version(directory):
+    try:
+        with open(directory / "prices.bin", "rb") as data:
+            header = data.read(HEADER.size)
+        return HEADER.unpack(header)[4] if len(header) == HEADER.size else 0
+    except FileNotFoundError:
+        return 0
+
+
+def _write_version(directory, version):
+    path = directory / "version"
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        os.pwrite(fd, VERSION.pack(version), 0)
+    finally:
+        os.close(fd)
+
+
+# ---------------------------------------------------------------------------
+# Lectura
+# ---------------------------------------------------------------------------
+class _Reader:
+    """Mapas de `version` y `prices.bin` de este proceso; se vuelven a abrir solo si cambia la versión."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._directory = None
+        self._version_map = None
+        self._table = None
+
+    def table(self):
+        version_map = self._version_map
+        if version_map is None or self._directory != settings.PRICE_TABLE_DIR:
+            version_map = self._map_version()
+            if version_map is None:
+                return None
+
+        version = VERSION.unpack_from(version_map)[0]
+        if version == 0:
+            return None
+        table = self._table
+        if table is not None and table.version == version:
+            return table
+
+        with self._lock:
+            table = self._table
+            if table is None or table.version != version:
+                table = self._table = self._map_table()
+        return table
+
+    def _map_version(self):
+        with self._lock:
+            directory = settings.PRICE_TABLE_DIR
+            try:
+                with open(Path(directory) / "version", "rb") as version_file:
+                    self._version_map = mmap.mmap(version_file.fileno(), VERSION.size, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                # Todavía no se publica ninguna tabla (o el contador está vacío)
+                return None
+            self._directory = directory
+            self._table = None
+            return self._version_map
+
+    def _map_table(self):
+        try:
+            with open(Path(self._directory) / "prices.bin", "rb") as data:
+                return PriceTable(mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ))
+        except (FileNotFoundError, ValueError, PriceTableError):
+            return None
+
+
+_reader = _Reader()
+
+
+def current_price_table():
+    """La foto publicada más reciente, o None si no hay (hay que consultar la base de datos)."""
+    return _reader.table()
@@ -0,0 +1,328 @@
+import csv
+import json
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from django.conf import settings
+
+from services.resilience import get_breaker, get_stats
+
+
+class PriceProviderError(Exception):
+    """Ningún proveedor pudo entregar precios."""
+
+
+class PriceProvider:
+    """
+    Interfaz de los proveedores de cotizaciones.
+    `fetch_closes` recibe los tickers y devuelve {ticker: último cierre};
+    los tickers sin datos simplemente no aparecen en el resultado.
+    `timeout` es el máximo de segundos que se espera al proveedor.
+    """
+
+    name = "base"
+    timeout = 10
+
+    def fetch_closes(self, tickers):
+        raise NotImplementedError
+
+
+class YahooFinanceProvider(PriceProvider):
+    """
+    Todos los tickers en una sola descarga (`yf.download`), con el hilo de
+    descargas acotado y timeout por petición HTTP. Se pide la ventana mínima
+    que cubre un fin de semana; solo los tickers que quedan sin cierre se
+    vuelven a pedir con una ventana más amplia.
+    """
+
+    name = "yahoo"
+
+    def __init__(self, timeout=10, max_workers=8, period="5d", fallback_period="1mo"):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.period = period
+        self.fallback_period = fallback_period
+
+    def fetch_closes(self, tickers):
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+
+        closes = self._download(tickers, self.period)
+        missing = [ticker for ticker in tickers if ticker not in closes]
+        if missing and self.fallback_period:
+            closes.update(self._download(missing, self.fallback_period))
+        return closes
+
+    def _download(self, tickers, period):
+        import yfinance as yf
+
+        data = yf.download(
+            tickers,
+            period=period,
+            interval="1d",
+            group_by="column",
+            auto_adjust=False,
+            threads=min(self.max_workers, len(tickers)),
+            timeout=self.timeout,
+            progress=False,
+        )
+        if data is None or data.empty:
+            return {}
+
+        close = data["Close"]
+        if getattr(close, "ndim", 1) == 1:
+            # Versiones anteriores de yfinance devuelven una serie si solo hay un ticker
+            close = close.to_frame(name=tickers[0])
+
+        closes = {}
+        for ticker in tickers:
+            if ticker not in close.columns:
+                continue
+            series = close[ticker].dropna()
+            if not series.empty:
+                closes[ticker] = float(series.iloc[-1])
+        return closes
+
+
+class FixtureProvider(PriceProvider):
+    """
+    Proveedor local para pruebas y benchmarks: lee {ticker: cierre} de un JSON
+    (o de un dict) sin salir a la red. `delay` simula la latencia del proveedor real.
+    """
+
+    name = "fixture"
+
+    def __init__(self, path=None, closes=None, delay=0, timeout=2):
+        self.path = Path(path) if path else None
+        self._closes = dict(closes) if closes is not None else None
+        self.delay = delay
+        self.timeout = timeout
+
+    def fetch_closes(self, tickers):
+        if self.delay:
+            time.sleep(self.delay)
+        if self._closes is None:
+            self._closes = json.loads(self.path.read_text(encoding="utf-8"))
+        return _pick(self._closes, tickers)
+
+
+class CSVProvider(PriceProvider):
+    """
+    Precios de un archivo CSV con columnas `ticker,close`, por ejemplo una
+    exportación manual o de otro sistema. Se relee en cada llamada.
+    """
+
+    name = "csv"
+
+    def __init__(self, path, timeout=2):
+        self.path = Path(path)
+        self.timeout = timeout
+
+    def fetch_closes(self, tickers):
+        with open(self.path, newline="", encoding="utf-8") as csv_file:
+            rows = {row["ticker"].strip(): row["close"] for row in csv.DictReader(csv_file) if row.get("ticker")}
+        return _pick(rows, tickers)
+
+
+class HTTPProvider(PriceProvider):
+    """
+    Servicio HTTP que responde `GET <url>?tickers=A,B` con {ticker: cierre}
+    (p. ej. `manage.py serve_price_stub` o un espejo interno de precios).
+    """
+
+    name = "http"
+
+    def __init__(self, url, timeout=3):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch_closes(self, tickers):
+        import requests
+
+        response = requests.get(self.url, params={"tickers": ",".join(tickers)}, timeout=self.timeout)
+        response.raise_for_status()
+        return _pick(response.json(), tickers)
+
+
+class HedgedProvider(PriceProvider):
+    """
+    Consulta los proveedores en orden de prioridad y se queda con la primera
+    respuesta correcta:
+
+    - si el proveedor en curso no responde en `hedge_delay` segundos se lanza
+      el siguiente en paralelo, sin cancelar al primero;
+    - si un proveedor falla, devuelve vacío o supera su `timeout`, se pasa al siguiente;
+    - los proveedores con el cortacircuitos abierto se saltan sin llamarlos.
+
+    Cada intento (también los que pierden la carrera) queda registrado en las
+    métricas y el cortacircuitos de su proveedor.
+    """
+
+    name = "hedged"
+
+    def __init__(self, providers, hedge_delay=2.0):
+        self.providers = list(providers)
+        self.hedge_delay = hedge_delay
+        self.timeout = max((provider.timeout for provider in self.providers), default=0)
+
+    def fetch_closes(self, tickers):
+        tickers = list(dict.fromkeys(tickers))
+        queue = list(self.providers)
+        pending = {}  # future -> _Attempt
+        errors = []
+
+        def launch_next():
+            while queue:
+                provider = queue.pop(0)
+                if not _breaker(provider).allow():
+                    get_stats(provider.name).record_short_circuit()
+                    errors.append(f"{provider.name}: circuito abierto")
+                    continue
+                attempt = _Attempt(provider)
+                future = _executor().submit(provider.fetch_closes, tickers)
+                future.add_done_callback(attempt.settle_from_future)
+                pending[future] = attempt
+                return True
+            return False
+
+        launch_next()
+        next_hedge = time.monotonic() + self.hedge_delay
+
+        while pending:
+            wake_up = min(attempt.deadline for attempt in pending.values())
+            if queue:
+                wake_up = min(wake_up, next_hedge)
+            done, _ = wait(pending, timeout=max(0, wake_up - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                attempt = pending.pop(future)
+                closes, error = _outcome(future)
+                if error is None:
+                    return closes
+                errors.append(f"{attempt.provider.name}: {error}")
+
+            now = time.monotonic()
+            for future, attempt in list(pending.items()):
+                if now >= attempt.deadline:
+                    # El hilo sigue corriendo hasta su propio timeout, pero ya no se le espera
+                    pending.pop(future)
+                    error = f"sin respuesta en {attempt.provider.timeout}s"
+                    attempt.settle(error, timeout=True)
+                    errors.append(f"{attempt.provider.name}: {error}")
+
+            if queue and (not pending or now >= next_hedge):
+                launch_next()
+                next_hedge = time.monotonic() + self.hedge_delay
+
+        raise PriceProviderError("; ".join(errors) or "No hay proveedores de precios configurados.")
+
+
+class _Attempt:
+    """Una llamada a un proveedor; su resultado se registra una sola vez (éxito, error o timeout)."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.started = time.monotonic()
+        self.deadline = self.started + provider.timeout
+        self._lock = threading.Lock()
+        self._settled = False
+
+    def settle_from_future(self, future):
+        _, error = _outcome(future)
+        self.settle(error)
+
+    def settle(self, error=None, timeout=False):
+        with self._lock:
+            if self._settled:
+                return
+            self._settled = True
+
+        latency = time.monotonic() - self.started
+        stats = get_stats(self.provider.name)
+        if error is None:
+            stats.record_success(latency)
+            _breaker(self.provider).record_success()
+        else:
+            stats.record_error(latency, error, timeout=timeout)
+            _breaker(self.provider).record_failure()
+
+
+def _outcome(future):
+    """(precios, None) si la llamada fue útil; (None, error) si falló o no trajo precios."""
+    try:
+        closes = future.result()
+    except Exception as e:
+        return None, e
+    if not closes:
+        return None, "respuesta sin precios"
+    return closes, None
+
+
+PROVIDERS = {
+    YahooFinanceProvider.name: lambda: YahooFinanceProvider(
+        timeout=settings.PRICE_PROVIDER_TIMEOUT,
+        max_workers=settings.PRICE_PROVIDER_MAX_WORKERS,
+    ),
+    FixtureProvider.name: lambda: FixtureProvider(path=settings.PRICE_FIXTURE_PATH),
+    CSVProvider.name: lambda: CSVProvider(settings.PRICE_CSV_PATH),
+    HTTPProvider.name: lambda: HTTPProvider(settings.PRICE_HTTP_URL, timeout=settings.PRICE_HTTP_TIMEOUT),
+}
+
+
+def get_provider(name=None):
+    """
+    Sin nombre: los proveedores de `PRICE_PROVIDERS` (en orden de prioridad)
+    detrás de un HedgedProvider. Con nombre: solo ese proveedor.
+    """
+    if name is not None:
+        return _build(name)
+    return HedgedProvider(
+        [_build(provider_name) for provider_name in settings.PRICE_PROVIDERS],
+        hedge_delay=settings.PRICE_PROVIDER_HEDGE_DELAY,
+    )
+
+
+def _build(name):
+    try:
+        return PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"Proveedor de precios desconocido: {name}") from None
+
+
+def _breaker(provider):
+    return get_breaker(
+        provider.name,
+        failure_threshold=settings.PRICE_BREAKER_FAILURES,
+        reset_timeout=settings.PRICE_BREAKER_RESET_SECONDS,
+    )
+
+
+_executor_lock = threading.Lock()
+_shared_executor = None
+
+
+def _executor():
+    """Hilos compartidos para las llamadas a proveedores (se crean al primer uso)."""
+    global _shared_executor
+    with _executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(
+                max_workers=settings.PRICE_PROVIDER_POOL_SIZE, thread_name_prefix="price-provider"
+            )
+        return _shared_executor
+
+
+def _pick(closes, tickers):
+    picked = {}
+    for ticker in tickers:
+        value = closes.get(ticker)
+        if value in (None, ""):
+            continue
+        value = float(value)
+        if not math.isnan(value):
+            picked[ticker] = value
+    return picked
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import deque
+
+
+class CircuitBreaker:
+    """
+    Cortacircuitos por proveedor.
+
+    - closed: las llamadas pasan; tras `failure_threshold` fallos seguidos se abre.
+    - open: las llamadas se rechazan sin intentar hasta que pasan `reset_timeout` segundos.
+    - half_open: se deja pasar una sola llamada de prueba; si funciona se cierra,
+      si falla se vuelve a abrir.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def allow(self):
+        """True si se puede llamar al proveedor ahora mismo."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+
+class ProviderStats:
+    """Contadores y latencias recientes de un proveedor (en memoria, por proceso)."""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.successes = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.short_circuits = 0
+        self.last_error = None
+        self.last_error_at = None
+
+    def record_success(self, latency):
+        with self._lock:
+            self.calls += 1
+            self.successes += 1
+            self._latencies.append(latency)
+
+    def record_error(self, latency, error, timeout=False):
+        with self._lock:
+            self.calls += 1
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.errors += 1
+            self._latencies.append(latency)
+            self.last_error = str(error)[:300]
+            self.last_error_at = time.time()
+
+    def record_short_circuit(self):
+        with self._lock:
+            self.short_circuits += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "calls": self.calls,
+                "successes": self.successes,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "short_circuits": self.short_circuits,
+                "latency_ms": {
+                    "avg": _ms(sum(latencies) / len(latencies)) if latencies else None,
+                    "p50": _ms(percentile(latencies, 0.50)),
+                    "p95": _ms(percentile(latencies, 0.95)),
+                    "max": _ms(latencies[-1]) if latencies else None,
+                },
+                "last_error": self.last_error,
+                "last_error_at": self.last_error_at,
+            }
+
+
+_registry_lock = threading.Lock()
+_breakers = {}
+_stats = {}
+
+
+def get_breaker(name, failure_threshold=3, reset_timeout=60):
+    """Cortacircuitos compartido por todas las llamadas del proceso a `name`."""
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(failure_threshold, reset_timeout)
+        return _breakers[name]
+
+
+def get_stats(name):
+    with _registry_lock:
+        if name not in _stats:
+            _stats[name] = ProviderStats()
+        return _stats[name]
+
+
+def provider_metrics():
+    """{proveedor: métricas + estado del cortacircuitos} de este proceso."""
+    with _registry_lock:
+        names = sorted(set(_stats) | set(_breakers))
+    return {
+        name: {**get_stats(name).snapshot(), "circuit": _breakers[name].state if name in _breakers else None}
+        for name in names
+    }
+
+
+def percentile(values, fraction):
+    """Percentil por rango más cercano de una lista ya ordenada (None si está vacía)."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
@@ -0,0 +1,87 @@
+import datetime
+import random
+import unicodedata
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+
+DAY_NAMES = {
+    "mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6,
+    "lun": 0, "mar": 1, "mie": 2, "jue": 3, "vie": 4, "sab": 5, "dom": 6,
+}
+
+
+class MarketHours:
+    """
+    Horario de mercado: días de la semana en que abre y ventana "HH:MM-HH:MM"
+    en la zona horaria del mercado. Si el cierre es menor que la apertura
+    (p. ej. "18:00-17:00", como los futuros de metales) la ventana cruza la
+    medianoche y pertenece al día en que abre.
+    """
+
+    def __init__(self, days, hours, timezone):
+        self.days = {_parse_day(day) for day in days}
+        opens, closes = (value.strip() for value in hours.split("-"))
+        self.opens = datetime.time.fromisoformat(opens)
+        self.closes = datetime.time.fromisoformat(closes)
+        self.tz = ZoneInfo(timezone)
+
+        start = datetime.timedelta(hours=self.opens.hour, minutes=self.opens.minute)
+        end = datetime.timedelta(hours=self.closes.hour, minutes=self.closes.minute)
+        self.length = (end - start) % datetime.timedelta(days=1) or datetime.timedelta(days=1)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(settings.PRICE_MARKET_DAYS, settings.PRICE_MARKET_HOURS, settings.PRICE_MARKET_TIMEZONE)
+
+    def _windows(self, moment, days_back=1, days_ahead=8):
+        """Ventanas (apertura, cierre) cercanas a `moment`, en orden."""
+        local = moment.astimezone(self.tz)
+        for offset in range(-days_back, days_ahead):
+            day = local.date() + datetime.timedelta(days=offset)
+            if day.weekday() not in self.days:
+                continue
+            start = datetime.datetime.combine(day, self.opens, tzinfo=self.tz)
+            yield start, start + self.length
+
+    def is_open(self, moment):
+        return any(start <= moment < end for start, end in self._windows(moment))
+
+    def next_open(self, moment):
+        """Próxima apertura después de `moment` (None si no hay días configurados)."""
+        return next((start for start, _ in self._windows(moment, days_back=0) if start > moment), None)
+
+
+def _parse_day(day):
+    day = unicodedata.normalize("NFKD", str(day)).encode("ascii", "ignore").decode("ascii")
+    day = day.strip().lower()[:3]
+    if day.isdigit():
+        return int(day)
+    try:
+        return DAY_NAMES[day]
+    except KeyError:
+        raise ValueError(f"Día de la semana desconocido: {day}") from None
+
+
+def next_run_at(now, interval, jitter, market, off_hours_interval=0):
+    """
+    Momento de la próxima actualización programada.
+
+    - En horario de mercado: `interval` segundos ± `jitter` (fracción), para
+      que varios servidores no consulten al proveedor al mismo tiempo.
+    - Fuera de horario: cada `off_hours_interval` segundos, o si es 0, en la
+      siguiente apertura (más un poco de jitter).
+    """
+    spread = 1 + random.uniform(-jitter, jitter)
+    candidate = now + datetime.timedelta(seconds=interval * spread)
+    if market is None or market.is_open(candidate):
+        return candidate
+
+    if off_hours_interval:
+        return now + datetime.timedelta(seconds=off_hours_interval * spread)
+
+    opens = market.next_open(now)
+    if opens is None:
+        return candidate
+    return opens + datetime.timedelta(seconds=random.uniform(0, interval * jitter))
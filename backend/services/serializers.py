@@ -1,7 +1,7 @@
 from rest_framework import serializers
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from .models import MetalPrice
-from .models import CurrencyRate
+from .models import PriceRefreshJob
 
 
 class MetalPriceSerializer(serializers.ModelSerializer):
@@ -25,41 +25,59 @@ class MetalPriceSerializer(serializers.ModelSerializer):
 
         ]
 
-    def get_price_with_margin_usd(self, obj):
-        # 👇 Si el producto tiene margen, se calculará más adelante en Product
-        margin = Decimal("0.00")
-        request = self.context.get("request")
-        if request:
-            margin_param = request.query_params.get("margin")
-            if margin_param:
+    def _pricing(self):
+        """
+        Margen, moneda y tipo de cambio de la petición, resueltos una sola vez.
+        Se guardan en el contexto, que comparten todos los elementos de una lista,
+        y la tasa sale de la caché de tipos de cambio del proceso (services.fx).
+        """
+        if "_pricing" not in self.context:
+            from services.fx import usd_rates
+
+            request = self.context.get("request")
+            params = request.query_params if request else {}
+            currency = params.get("currency", "MXN")
+
+            # 👇 Si el producto tiene margen, se calculará más adelante en Product
+            margin = Decimal("0.00")
+            if params.get("margin"):
                 try:
-                    margin = Decimal(margin_param)
-                except:
+                    margin = Decimal(params["margin"])
+                except InvalidOperation:
                     pass
-        return (obj.price_usd * (Decimal("1.00") + margin / Decimal("100"))).quantize(Decimal("0.01"))
+
+            # Tipo de cambio USD -> currency (1 si no hay registro)
+            rate = usd_rates().get(currency, Decimal("1.00"))
+            self.context["_pricing"] = (Decimal("1.00") + margin / Decimal("100"), currency, rate)
+        return self.context["_pricing"]
+
+    def get_price_with_margin_usd(self, obj):
+        factor, _, _ = self._pricing()
+        return (obj.price_usd * factor).quantize(Decimal("0.01"))
 
     def get_currency(self, obj):
-        request = self.context.get("request")
-        return request.query_params.get("currency", "MXN")
+        _, currency, _ = self._pricing()
+        return currency
 
     def get_price_local(self, obj):
-        request = self.context.get("request")
-        currency = request.query_params.get("currency", "MXN")
-        rate = Decimal("1.00")
-
-        # Buscar tipo de cambio USD -> currency
-        if currency != "USD":
-            rate_obj = (
-                CurrencyRate.objects.filter(base_currency="USD", target_currency=currency)
-                .order_by("-last_updated")
-                .first()
-            )
-            if rate_obj:
-                rate = rate_obj.rate
-
-        margin_param = request.query_params.get("margin")
-        margin = Decimal(margin_param) if margin_param else Decimal("0.00")
-
-        price_with_margin_usd = obj.price_usd * (Decimal("1.00") + margin / Decimal("100"))
-        price_local = price_with_margin_usd * rate
-        return price_local.quantize(Decimal("0.01"))
+        factor, _, rate = self._pricing()
+        return (obj.price_usd * factor * rate).quantize(Decimal("0.01"))
+
+
+class PriceRefreshJobSerializer(serializers.ModelSerializer):
+    completed = serializers.SerializerMethodField()
+    total = serializers.SerializerMethodField()
+    duration = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = PriceRefreshJob
+        fields = [
+            "id", "status", "trigger", "progress", "completed", "total", "error",
+            "created_at", "started_at", "finished_at", "duration",
+        ]
+
+    def get_completed(self, obj):
+        return sum(1 for state in obj.progress.values() if state in ("done", "missing"))
+
+    def get_total(self, obj):
+        return len(obj.progress)
@@ -1,3 +1,792 @@
-from django.test import TestCase
+import datetime
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+import pandas as pd
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Product
+from services.api_clients import get_currency_rates, get_yfinance_prices
+from services.fx import ConversionMatrix, conversion_matrix, invalidate_usd_rates, usd_rates
+from services.price_cache import SnapshotCache
+from services.price_table import (
+    HEADER, PriceTable, PriceTableError, current_price_table, disable_price_table, publish_price_table,
+)
+from services.models import CurrencyRate, MetalPrice, MetalPriceHistory, PriceRefreshJob
+from services.price_refresh import (
+    RefreshInProgress, create_refresh_job, refresh_lock, refresh_prices, refresh_run_stats, run_refresh_job,
+)
+from services.providers import (
+    CSVProvider, FixtureProvider, HedgedProvider, PriceProvider, PriceProviderError, YahooFinanceProvider,
+)
+from services.resilience import CircuitBreaker, get_breaker, get_stats, percentile
+from services.scheduling import MarketHours, next_run_at
+from users.models import User
+
+
+class IsolatedPricesMixin:
+    """
+    Cada prueba con su propio PRICE_TABLE_DIR vacío (sin tabla publicada) y sin
+    tasas en la caché del proceso: lo que se lee sale de la base de datos de la prueba.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.price_table_dir = tempfile.mkdtemp(prefix="smartquote-prices-")
+        self.addCleanup(shutil.rmtree, self.price_table_dir, ignore_errors=True)
+        override = override_settings(PRICE_TABLE_DIR=self.price_table_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        invalidate_usd_rates()
+        self.addCleanup(invalidate_usd_rates)
+
+
+def api_client():
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username="admin", role="admin"))
+    return client
+
+
+class MetalPriceHistoryTests(TestCase):
+    """Histórico de precios y consultas "precio a la fecha"."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        for days_ago, price in ((10, "3.00"), (5, "4.00"), (1, "5.00")):
+            MetalPriceHistory.objects.create(
+                symbol="COPPER", ts=self.now - datetime.timedelta(days=days_ago), price_usd=Decimal(price)
+            )
+        MetalPriceHistory.objects.create(symbol="ZINC", ts=self.now, price_usd=Decimal("1.00"))
+
+    def test_as_of_returns_latest_point_at_or_before_moment(self):
+        history = MetalPriceHistory.objects
+
+        self.assertEqual(history.as_of("copper", self.now - datetime.timedelta(days=3)).price_usd, Decimal("4.00"))
+        self.assertEqual(history.as_of("COPPER", self.now - datetime.timedelta(days=5)).price_usd, Decimal("4.00"))
+        self.assertEqual(history.as_of("COPPER", self.now).price_usd, Decimal("5.00"))
+        self.assertIsNone(history.as_of("COPPER", self.now - datetime.timedelta(days=30)))
+
+    def test_series_is_newest_first_and_bounded(self):
+        series = MetalPriceHistory.objects.series("copper", start=self.now - datetime.timedelta(days=6))
+
+        self.assertEqual([point.price_usd for point in series], [Decimal("5.00"), Decimal("4.00")])
+        self.assertEqual(MetalPriceHistory.objects.series("COPPER").count(), 3)
+
+    def test_current_price_ignores_symbol_case(self):
+        MetalPrice.objects.create(name="Copper", symbol="COPPER", price_usd=Decimal("5.00"))
+
+        self.assertEqual(MetalPrice.objects.current("copper").price_usd, Decimal("5.00"))
+        self.assertIsNone(MetalPrice.objects.current("NICKEL"))
+
+    def test_detail_view_answers_as_of_queries(self):
+        MetalPrice.objects.create(name="Copper", symbol="COPPER", price_usd=Decimal("5.00"))
+        client = api_client()
+        day = (self.now - datetime.timedelta(days=3)).date().isoformat()
+
+        response = client.get("/api/metalprice/", {"symbol": "copper", "as_of": day})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data["price_usd"]), Decimal("4.00"))
+
+        self.assertEqual(client.get("/api/metalprice/", {"symbol": "copper", "as_of": "ayer"}).status_code, 400)
+        self.assertEqual(client.get("/api/metalprice/", {"symbol": "copper", "as_of": "2000-01-01"}).status_code, 404)
+
+
+class CountingProvider(FixtureProvider):
+    """FixtureProvider que guarda los tickers de cada llamada."""
+
+    def __init__(self, closes, **kwargs):
+        super().__init__(closes=closes, **kwargs)
+        self.calls = []
+
+    def fetch_closes(self, tickers):
+        tickers = list(tickers)
+        self.calls.append(tickers)
+        return super().fetch_closes(tickers)
+
+
+class BatchedFetchTests(TestCase):
+    """Todos los tickers en una sola llamada al proveedor."""
+
+    def setUp(self):
+        # api_clients informa con print(); aquí no interesa
+        silence = mock.patch("sys.stdout", new_callable=io.StringIO)
+        silence.start()
+        self.addCleanup(silence.stop)
+
+    def test_prices_are_fetched_in_one_call_and_rounded(self):
+        provider = CountingProvider({"GC=F": 2415.123456, "HG=F": 4.4215, "CL=F": float("nan")})
+
+        prices = get_yfinance_prices(["GOLD", "COPPER", "OIL", "UNOBTAINIUM"], provider=provider)
+
+        self.assertEqual(provider.calls, [["GC=F", "HG=F", "CL=F"]])
+        self.assertEqual(prices, {"GOLD": 2415.1235, "COPPER": 4.4215})
+
+    def test_currency_rates_use_the_same_provider_interface(self):
+        provider = CountingProvider({"MXN=X": 18.4512, "EUR=X": 0.9234})
+
+        self.assertEqual(get_currency_rates(provider=provider), {"USD/MXN": 18.4512, "USD/EUR": 0.9234})
+        self.assertEqual(len(provider.calls), 1)
+
+    def test_provider_errors_yield_no_prices(self):
+        provider = FixtureProvider(path="/nonexistent/price_closes.json")
+
+        self.assertEqual(get_yfinance_prices(["GOLD"], provider=provider), {})
+
+    def test_fixture_and_csv_providers_read_local_files(self):
+        self.assertEqual(FixtureProvider(path=settings.PRICE_FIXTURE_PATH).fetch_closes(["LBR=F", "XX=F"]), {"LBR=F": 562.0})
+
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "w") as csv_file:
+            csv_file.write("ticker,close\nGC=F,2400.5\nSI=F,\n")
+        self.assertEqual(CSVProvider(path).fetch_closes(["GC=F", "SI=F"]), {"GC=F": 2400.5})
+
+    def test_yahoo_retries_only_missing_tickers_with_a_wider_window(self):
+        def download(tickers, period, **kwargs):
+            closes = {"5d": {"GC=F": [2400.0, 2410.0]}, "1mo": {"LBR=F": [560.0, float("nan")]}}[period]
+            frame = pd.DataFrame({ticker: closes.get(ticker, [float("nan")] * 2) for ticker in tickers})
+            return pd.concat({"Close": frame}, axis=1)
+
+        with mock.patch("yfinance.download", side_effect=download) as yf_download:
+            closes = YahooFinanceProvider(timeout=3).fetch_closes(["GC=F", "LBR=F"])
+
+        self.assertEqual(closes, {"GC=F": 2410.0, "LBR=F": 560.0})
+        self.assertEqual([c.kwargs["period"] for c in yf_download.call_args_list], ["5d", "1mo"])
+        self.assertEqual(yf_download.call_args_list[1].args[0], ["LBR=F"])
+        self.assertEqual(yf_download.call_args_list[0].kwargs["timeout"], 3)
+
+
+class CircuitBreakerTests(TestCase):
+    """Estados del cortacircuitos: closed → open → half_open → closed/open."""
+
+    def setUp(self):
+        self.clock = 1000.0
+        patcher = mock.patch("services.resilience.time.monotonic", side_effect=lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_opens_after_consecutive_failures_and_probes_once(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        self.clock += 30
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # una sola llamada de prueba
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        self.clock += 30
+        self.assertTrue(breaker.allow())
+
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+    def test_percentile_uses_nearest_rank(self):
+        self.assertIsNone(percentile([], 0.95))
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 0.5), 3)
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 0.95), 5)
+
+
+class FailingProvider(PriceProvider):
+    timeout = 2
+
+    def fetch_closes(self, tickers):
+        raise ConnectionError("sin conexión")
+
+
+_provider_names = itertools.count()
+
+
+def named(provider):
+    """Nombre único para no compartir cortacircuitos ni métricas entre pruebas."""
+    provider.name = f"test-{provider.name}-{next(_provider_names)}"
+    return provider
+
+
+@override_settings(PRICE_BREAKER_FAILURES=1, PRICE_BREAKER_RESET_SECONDS=60)
+class HedgedProviderTests(TestCase):
+    """Primera respuesta correcta entre proveedores en orden de prioridad."""
+
+    def test_falls_back_to_next_provider_on_error_or_empty_answer(self):
+        failing = named(FailingProvider())
+        empty = named(FixtureProvider(closes={}))
+        backup = named(FixtureProvider(closes={"GC=F": 2400.0}))
+
+        closes = HedgedProvider([failing, empty, backup], hedge_delay=5).fetch_closes(["GC=F"])
+
+        self.assertEqual(closes, {"GC=F": 2400.0})
+        self.assertEqual(get_stats(failing.name).snapshot()["errors"], 1)
+        self.assertEqual(get_breaker(failing.name).state, "open")
+
+    def test_slow_primary_is_hedged(self):
+        slow = named(FixtureProvider(closes={"GC=F": 1.0}, delay=1, timeout=2))
+        fast = named(FixtureProvider(closes={"GC=F": 2.0}))
+
+        started = time.monotonic()
+        closes = HedgedProvider([slow, fast], hedge_delay=0.05).fetch_closes(["GC=F"])
+
+        self.assertEqual(closes, {"GC=F": 2.0})
+        self.assertLess(time.monotonic() - started, 0.9)
+
+    def test_timeout_moves_on_to_next_provider(self):
+        stuck = named(FixtureProvider(closes={"GC=F": 1.0}, delay=1, timeout=0.05))
+        backup = named(FixtureProvider(closes={"GC=F": 2.0}))
+
+        closes = HedgedProvider([stuck, backup], hedge_delay=5).fetch_closes(["GC=F"])
+
+        self.assertEqual(closes, {"GC=F": 2.0})
+        self.assertEqual(get_stats(stuck.name).snapshot()["timeouts"], 1)
+
+    def test_open_circuit_is_skipped_and_exhaustion_raises(self):
+        failing = named(FailingProvider())
+        get_breaker(failing.name, failure_threshold=1).record_failure()
+
+        with self.assertRaises(PriceProviderError) as raised:
+            HedgedProvider([failing], hedge_delay=5).fetch_closes(["GC=F"])
+
+        self.assertIn("circuito abierto", str(raised.exception))
+        self.assertEqual(get_stats(failing.name).snapshot()["short_circuits"], 1)
+
+
+class SnapshotCacheTests(TestCase):
+    """Foto de precios con stale-while-revalidate y consultas unificadas."""
+
+    def setUp(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def loader(self):
+        self.calls += 1
+        self.release.wait(5)
+        return {"GOLD": self.calls}
+
+    def snapshot(self):
+        snapshot = SnapshotCache(f"test:snapshot:{next(_provider_names)}", self.loader, ttl=60, max_stale=300)
+        self.addCleanup(cache.delete_many, [snapshot.key, snapshot.lock_key])
+        return snapshot
+
+    def test_miss_waits_for_loader_then_serves_fresh(self):
+        snapshot = self.snapshot()
+
+        entry, state = snapshot.get()
+        self.assertEqual((entry["data"], state), ({"GOLD": 1}, "miss"))
+
+        entry, state = snapshot.get()
+        self.assertEqual((entry["data"], state), ({"GOLD": 1}, "fresh"))
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_entry_is_served_while_refreshing_in_background(self):
+        snapshot = self.snapshot()
+        cache.set(snapshot.key, {"data": {"GOLD": 0}, "fetched_at": time.time() - 120})
+        self.release.clear()
+
+        entry, state = snapshot.get()
+        self.assertEqual((entry["data"], state), ({"GOLD": 0}, "stale"))
+
+        self.release.set()
+        snapshot._in_flight.result(timeout=5)
+        self.assertEqual(cache.get(snapshot.key)["data"], {"GOLD": 1})
+
+    def test_concurrent_misses_share_one_load(self):
+        snapshot = self.snapshot()
+        self.release.clear()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(snapshot.get()[0]["data"])) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{"GOLD": 1}] * 8)
+
+    def test_failed_load_is_not_cached(self):
+        snapshot = SnapshotCache(f"test:snapshot:{next(_provider_names)}", mock.Mock(side_effect=ValueError), 60, 300)
+
+        with self.assertRaises(ValueError):
+            snapshot.get()
+
+        self.assertIsNone(cache.get(snapshot.key))
+
+
+class PriceRefreshJobTests(TestCase):
+    """Actualizaciones de precios en segundo plano con avance por símbolo."""
+
+    def setUp(self):
+        # Dentro de la transacción de la prueba close_old_connections() cerraría la conexión
+        patcher = mock.patch("services.price_refresh.close_old_connections")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_active_job_is_reused(self):
+        job, created = create_refresh_job()
+        again, created_again = create_refresh_job(trigger="scheduler")
+
+        self.assertTrue(created)
+        self.assertEqual((again.pk, created_again), (job.pk, False))
+        self.assertEqual(set(job.progress.values()), {"pending"})
+
+    @override_settings(PRICE_REFRESH_JOB_TIMEOUT=60)
+    def test_stale_active_job_is_failed_and_replaced(self):
+        stale, _ = create_refresh_job()
+        PriceRefreshJob.objects.filter(pk=stale.pk).update(
+            status="running", created_at=timezone.now() - datetime.timedelta(minutes=5)
+        )
+
+        job, created = create_refresh_job()
+
+        self.assertTrue(created)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, "failed")
+        self.assertIsNotNone(stale.finished_at)
+
+    def test_run_records_progress_and_outcome(self):
+        job, _ = create_refresh_job()
+
+        def refresh(log, on_progress):
+            on_progress(["GOLD"], "done")
+            on_progress(["LUMBER"], "missing")
+
+        with mock.patch("services.price_refresh.refresh_prices", side_effect=refresh):
+            run_refresh_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual((job.progress["GOLD"], job.progress["LUMBER"], job.progress["SILVER"]), ("done", "missing", "pending"))
+        self.assertGreaterEqual(job.duration, 0)
+
+        # Un job que ya no está pendiente no se vuelve a correr
+        with mock.patch("services.price_refresh.refresh_prices") as refresh_prices:
+            run_refresh_job(job.pk)
+        refresh_prices.assert_not_called()
+
+    def test_failed_run_keeps_error(self):
+        job, _ = create_refresh_job()
+
+        with mock.patch("services.price_refresh.refresh_prices", side_effect=RuntimeError("proveedor caído")):
+            run_refresh_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ("failed", "proveedor caído"))
+
+    def test_api_enqueues_after_commit_and_reports_progress(self):
+        client = api_client()
+
+        with mock.patch("services.price_refresh.get_executor") as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post("/api/update_prices/")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data["job"]["id"]
+        get_executor.return_value.submit.assert_called_once_with(run_refresh_job, uuid.UUID(job_id))
+
+        again = client.post("/api/update_prices/")
+        self.assertEqual(again.data["job"]["id"], job_id)
+
+        status_response = client.get(response.data["status_url"])
+        self.assertEqual(status_response.status_code, 200)
+        self.assertEqual(status_response.data["completed"], 0)
+        self.assertEqual(status_response.data["total"], len(status_response.data["progress"]))
+
+
+class FixturePricesMixin(IsolatedPricesMixin):
+    """Precios del proveedor local `fixture`, escritos en un JSON temporal con `write_closes`."""
+
+    def setUp(self):
+        super().setUp()
+        self.closes_path = os.path.join(self.price_table_dir, "closes.json")
+        override = override_settings(PRICE_PROVIDERS=["fixture"], PRICE_FIXTURE_PATH=self.closes_path)
+        override.enable()
+        self.addCleanup(override.disable)
+        silence = mock.patch("sys.stdout", new_callable=io.StringIO)
+        silence.start()
+        self.addCleanup(silence.stop)
+
+    def write_closes(self, closes):
+        with open(self.closes_path, "w", encoding="utf-8") as closes_file:
+            json.dump(closes, closes_file)
+
+
+class RefreshUpsertTests(FixturePricesMixin, TestCase):
+    """refresh_prices guarda metales y tipos de cambio con un upsert por tabla."""
+
+    def test_refresh_upserts_current_rows_and_appends_history(self):
+        MetalPrice.objects.create(name="Gold", symbol="GOLD", price_usd=Decimal("1.0000"))
+        CurrencyRate.objects.create(base_currency="USD", target_currency="MXN", rate=Decimal("1.000000"))
+        self.write_closes({"GC=F": 2400.0, "HG=F": 4.5, "MXN=X": 18.5})
+
+        result = refresh_prices(log=lambda message: None)
+        self.write_closes({"GC=F": 2410.0, "HG=F": 4.5, "MXN=X": 18.25})
+        refresh_prices(log=lambda message: None)
+
+        self.assertEqual(sorted(result["metals"]), ["COPPER", "GOLD"])
+        self.assertEqual(result["currencies"], ["USD/MXN"])
+        gold = MetalPrice.objects.get(symbol="GOLD")
+        self.assertEqual((gold.price_usd, gold.measure_units, gold.name), (Decimal("2410.0000"), "onza troy", "Gold"))
+        self.assertEqual(MetalPrice.objects.count(), 2)
+        self.assertEqual(CurrencyRate.objects.get().rate, Decimal("18.250000"))
+        self.assertEqual(
+            [point.price_usd for point in MetalPriceHistory.objects.series("GOLD")],
+            [Decimal("2410.0000"), Decimal("2400.0000")],
+        )
+
+    def test_lumber_is_priced_per_board_foot(self):
+        MetalPrice.objects.create(name="Lumber", symbol="LUMBER", price_usd=Decimal("1.0000"), base_quantity=Decimal("1"))
+        plank = Product.objects.create(name="Tabla", price=Decimal("1.00"), unit="bd. ft.", metal_symbol="LUMBER")
+        self.write_closes({"LBR=F": 600.0})
+
+        refresh_prices(log=lambda message: None)
+
+        self.assertEqual(MetalPrice.objects.get(symbol="LUMBER").base_quantity, Decimal("1000"))
+        plank.refresh_from_db()
+        self.assertEqual(plank.price, Decimal("0.60"))
+
+    def test_products_are_repriced_before_prices_are_announced(self):
+        self.write_closes({"GC=F": 2400.0, "MXN=X": 18.5})
+        calls = []
+
+        with mock.patch("services.price_refresh.propagate_metal_prices", side_effect=lambda: calls.append("products") or 0), \
+                mock.patch("services.price_refresh.publish_or_disable", side_effect=lambda: calls.append("table") or 1), \
+                mock.patch("services.price_refresh.publish", side_effect=lambda topic, data: calls.append(topic)):
+            refresh_prices(log=lambda message: None)
+
+        self.assertEqual(calls, ["products", "table", "prices"])
+
+    def test_upsert_is_one_statement_per_table(self):
+        self.write_closes({"GC=F": 2400.0, "SI=F": 30.0, "HG=F": 4.5, "MXN=X": 18.5, "EUR=X": 0.92})
+
+        with CaptureQueriesContext(connection) as queries:
+            refresh_prices(log=lambda message: None)
+
+        statements = [query["sql"] for query in queries.captured_queries]
+        for table in (MetalPrice, CurrencyRate, MetalPriceHistory):
+            inserts = [sql for sql in statements if sql.startswith(f'INSERT INTO "{table._meta.db_table}"')]
+            self.assertEqual(len(inserts), 1, table.__name__)
+
+
+class USDRatesCacheTests(IsolatedPricesMixin, TestCase):
+    """Tipos de cambio en memoria del proceso, invalidados al guardar un CurrencyRate."""
+
+    def setUp(self):
+        super().setUp()
+        self.mxn = CurrencyRate.objects.create(base_currency="USD", target_currency="MXN", rate=Decimal("18.000000"))
+
+    def test_rates_are_read_once_until_a_rate_changes(self):
+        self.assertEqual(usd_rates(), {"USD": Decimal("1"), "MXN": Decimal("18.000000")})
+        with self.assertNumQueries(0):
+            usd_rates()
+
+        self.mxn.rate = Decimal("19.000000")
+        self.mxn.save()
+
+        self.assertEqual(usd_rates()["MXN"], Decimal("19.000000"))
+
+    @override_settings(FX_RATE_CACHE_TTL=0)
+    def test_ttl_bounds_how_long_rates_are_reused(self):
+        usd_rates()
+        with self.assertNumQueries(1):
+            usd_rates()
+
+    def test_serializer_resolves_rate_once_per_request(self):
+        for symbol, price in (("GOLD", "2400.0000"), ("SILVER", "30.0000"), ("COPPER", "4.5000")):
+            MetalPrice.objects.create(name=symbol.title(), symbol=symbol, price_usd=Decimal(price))
+        client = api_client()
+
+        with self.assertNumQueries(2):  # metales + tipos de cambio
+            response = client.get("/api/get_price_local/", {"currency": "MXN", "margin": "10"})
+
+        gold = next(row for row in response.data if row["symbol"] == "GOLD")
+        self.assertEqual(gold["price_with_margin_usd"], Decimal("2640.00"))
+        self.assertEqual(gold["price_local"], Decimal("47520.00"))
+        self.assertEqual(gold["currency"], "MXN")
+
+
+class PriceTableTests(IsolatedPricesMixin, TestCase):
+    """Tabla de precios compartida: publicar, leer sin consultas y desactivar."""
+
+    def setUp(self):
+        super().setUp()
+        self.gold = MetalPrice.objects.create(name="Gold", symbol="GOLD", price_usd=Decimal("2400.1234"),
+                                              measure_units="onza troy", base_quantity=Decimal("1"))
+        CurrencyRate.objects.create(base_currency="USD", target_currency="MXN", rate=Decimal("18.123456"))
+
+    def test_published_prices_are_read_without_queries(self):
+        self.assertIsNone(current_price_table())
+        version = publish_price_table()
+
+        with self.assertNumQueries(0):
+            table = current_price_table()
+            rates = usd_rates()
+        self.assertEqual(table.version, version)
+        self.assertEqual(table.metal_quotes(), {"GOLD": (Decimal("2400.1234"), Decimal("1.0000"), "onza troy")})
+        self.assertEqual(table.metal_price("gold"), Decimal("2400.1234"))
+        self.assertIsNone(table.metal_price("ZINC"))
+        self.assertEqual(rates, {"USD": Decimal("1"), "MXN": Decimal("18.123456")})
+
+    def test_readers_pick_up_new_versions_and_disable(self):
+        publish_price_table()
+        MetalPrice.objects.filter(pk=self.gold.pk).update(price_usd=Decimal("2500.0000"))
+        version = publish_price_table()
+
+        table = current_price_table()
+        self.assertEqual((table.version, table.metal_price("GOLD")), (version, Decimal("2500.0000")))
+
+        disable_price_table()
+        self.assertIsNone(current_price_table())
+        self.assertEqual(publish_price_table(), version + 1)
+
+    def test_saving_a_price_republishes_on_commit(self):
+        publish_price_table()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gold.price_usd = Decimal("2600.0000")
+            self.gold.save()
+
+        self.assertEqual(current_price_table().metal_price("GOLD"), Decimal("2600.0000"))
+
+    def test_damaged_file_is_rejected(self):
+        publish_price_table()
+        path = os.path.join(self.price_table_dir, "prices.bin")
+        with open(path, "rb") as data:
+            buffer = bytearray(data.read())
+
+        buffer[-1] ^= 0xFF
+        with self.assertRaises(PriceTableError):
+            PriceTable(bytes(buffer))
+        with self.assertRaises(PriceTableError):
+            PriceTable(bytes(buffer[:HEADER.size - 1]))
+
+    def test_command_publishes_and_disables(self):
+        out = io.StringIO()
+
+        call_command("publish_price_table", stdout=out)
+        self.assertIn("1 metal(es), 1 tipo(s) de cambio", out.getvalue())
+
+        call_command("publish_price_table", "--disable", stdout=out)
+        self.assertIsNone(current_price_table())
+
+
+class ConversionMatrixTests(TestCase):
+    """Tipos cruzados derivados de las tasas USD -> X."""
+
+    def setUp(self):
+        self.matrix = ConversionMatrix(
+            {"USD": Decimal("1"), "MXN": Decimal("20"), "EUR": Decimal("0.8"), "XXX": Decimal("0")}
+        )
+
+    def test_cross_rates(self):
+        self.assertEqual(self.matrix.currencies, ["EUR", "MXN", "USD"])
+        self.assertAlmostEqual(self.matrix.rate("MXN", "EUR"), 0.04)
+        self.assertAlmostEqual(self.matrix.rate("EUR", "MXN"), 25.0)
+        self.assertEqual(self.matrix.rate("USD", "USD"), 1.0)
+        with self.assertRaises(KeyError):
+            self.matrix.rate("USD", "XXX")
+
+    def test_batch_convert_flags_unknown_currencies(self):
+        converted, unknown = self.matrix.convert(
+            [100, 100, 1, 5], ["mxn", "USD", "EUR", "GBP"], ["EUR", "MXN", "EUR", "USD"], decimals=2
+        )
+
+        self.assertEqual(converted, [Decimal("4.00"), Decimal("2000.00"), Decimal("1.00"), None])
+        self.assertEqual(unknown.tolist(), [False, False, False, True])
+
+    def test_amounts_round_half_up_like_quotation_totals(self):
+        # np.round(0.125, 2) da 0.12 (mitad al par); los importes de cotizaciones usan ROUND_HALF_UP
+        converted, _ = self.matrix.convert([0.125, 1.005, 2.5], ["USD"] * 3, ["USD"] * 3, decimals=2)
+        self.assertEqual(converted, [Decimal("0.13"), Decimal("1.01"), Decimal("2.50")])
+
+        converted, _ = self.matrix.convert([2.5], ["USD"], ["USD"], decimals=0)
+        self.assertEqual(converted, [Decimal("3")])
+
+
+class ConvertAPITests(IsolatedPricesMixin, TestCase):
+    """POST /api/convert/ y GET /api/convert/matrix/."""
+
+    def setUp(self):
+        super().setUp()
+        CurrencyRate.objects.create(base_currency="USD", target_currency="MXN", rate=Decimal("20.000000"))
+        CurrencyRate.objects.create(base_currency="USD", target_currency="EUR", rate=Decimal("0.800000"))
+        self.client = api_client()
+
+    def test_matrix_is_rebuilt_only_when_rates_change(self):
+        matrix = conversion_matrix()
+        self.assertIs(conversion_matrix(), matrix)
+
+        CurrencyRate.objects.filter(target_currency="MXN").update(rate=Decimal("21.000000"))
+        invalidate_usd_rates()
+        self.assertAlmostEqual(conversion_matrix().rate("USD", "MXN"), 21.0)
+
+    def test_convert_mixed_formats_in_order(self):
+        response = self.client.post("/api/convert/", {
+            "conversions": [
+                {"amount": 100, "from": "MXN", "to": "EUR"},
+                [10, "usd", "mxn"],
+                {"amount": 1, "from": "GBP", "to": "USD"},
+            ],
+            "decimals": 3,
+        }, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"results": ["4.000", "200.000", None], "unknown_currencies": ["GBP"]})
+
+    @override_settings(FX_BATCH_MAX_ITEMS=2)
+    def test_invalid_requests_are_rejected(self):
+        for body in (
+            {"conversions": []},
+            {"conversions": [[1, "USD", "MXN"]] * 3},
+            {"conversions": [[1, "USD", "MXN"]], "decimals": 9},
+            {"conversions": [[1, "USD"]]},
+            {"conversions": [["uno", "USD", "MXN"]]},
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post("/api/convert/", body, format="json").status_code, 400)
+
+    def test_matrix_endpoint(self):
+        response = self.client.get("/api/convert/matrix/")
+
+        self.assertEqual(response.data["currencies"], ["EUR", "MXN", "USD"])
+        self.assertEqual(response.data["matrix"]["EUR"]["MXN"], 25.0)
+
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def ny(*args):
+    return datetime.datetime(*args, tzinfo=NEW_YORK)
+
+
+class MarketHoursTests(TestCase):
+    """Horario de mercado con ventanas que cruzan la medianoche."""
+
+    def setUp(self):
+        # Futuros de metales: de domingo 18:00 a viernes 17:00 (hora de Nueva York)
+        self.market = MarketHours(["sun", "mon", "tue", "wed", "thu"], "18:00-17:00", "America/New_York")
+
+    def test_overnight_window_belongs_to_opening_day(self):
+        self.assertTrue(self.market.is_open(ny(2026, 10, 16, 12, 0)))  # viernes, ventana del jueves
+        self.assertFalse(self.market.is_open(ny(2026, 10, 16, 17, 30)))  # viernes después del cierre
+        self.assertFalse(self.market.is_open(ny(2026, 10, 17, 12, 0)))  # sábado
+        self.assertTrue(self.market.is_open(ny(2026, 10, 18, 18, 0)))  # domingo en la apertura
+        self.assertTrue(self.market.is_open(ny(2026, 10, 20, 16, 30).astimezone(datetime.timezone.utc)))
+        self.assertFalse(self.market.is_open(ny(2026, 10, 20, 17, 30)))  # pausa diaria entre 17:00 y 18:00
+
+    def test_next_open_skips_closed_days(self):
+        self.assertEqual(self.market.next_open(ny(2026, 10, 16, 17, 30)), ny(2026, 10, 18, 18, 0))
+        self.assertIsNone(MarketHours([], "09:00-17:00", "UTC").next_open(ny(2026, 10, 16, 12, 0)))
+
+    def test_days_in_spanish_or_numbers(self):
+        self.assertEqual(MarketHours(["lun", "Mié", "4", "sáb"], "09:00-17:00", "UTC").days, {0, 2, 4, 5})
+        with self.assertRaises(ValueError):
+            MarketHours(["xyz"], "09:00-17:00", "UTC")
+
+    def test_next_run_at(self):
+        thursday = ny(2026, 10, 15, 12, 0)
+        friday = ny(2026, 10, 16, 16, 50)
+
+        self.assertEqual(next_run_at(thursday, 900, 0, self.market), thursday + datetime.timedelta(seconds=900))
+        self.assertEqual(next_run_at(friday, 900, 0, None), friday + datetime.timedelta(seconds=900))
+        # Cerca del cierre: la siguiente corrida es en la apertura, o cada `off_hours_interval`
+        self.assertEqual(next_run_at(friday, 900, 0, self.market), ny(2026, 10, 18, 18, 0))
+        self.assertEqual(next_run_at(friday, 900, 0, self.market, 3600), friday + datetime.timedelta(hours=1))
+
+        runs = {next_run_at(thursday, 900, 0.1, self.market) for _ in range(20)}
+        self.assertTrue(all(810 <= (run - thursday).total_seconds() <= 990 for run in runs))
+        self.assertGreater(len(runs), 1)
+
+
+class RefreshLockAndStatsTests(TestCase):
+    """Una sola actualización a la vez y estadísticas de duración."""
+
+    def test_second_refresh_is_refused_while_lock_is_held(self):
+        errors = []
+
+        def refresh_elsewhere():
+            try:
+                with refresh_lock():
+                    pass
+            except RefreshInProgress as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        with refresh_lock():
+            thread = threading.Thread(target=refresh_elsewhere)
+            thread.start()
+            thread.join(5)
+        self.assertEqual(len(errors), 1)
+
+        thread = threading.Thread(target=refresh_elsewhere)
+        thread.start()
+        thread.join(5)
+        self.assertEqual(len(errors), 1)
+
+    def _finished_job(self, seconds, trigger="scheduler", status="done"):
+        started = timezone.now() - datetime.timedelta(minutes=10)
+        return PriceRefreshJob.objects.create(
+            trigger=trigger, status=status, started_at=started,
+            finished_at=started + datetime.timedelta(seconds=seconds),
+        )
+
+    def test_run_stats_by_trigger(self):
+        for seconds in (1, 2, 3):
+            self._finished_job(seconds)
+        self._finished_job(10, trigger="api", status="failed")
+        PriceRefreshJob.objects.create(status="pending")
+
+        stats = refresh_run_stats()
+
+        self.assertEqual((stats["runs"], stats["failed"]), (4, 1))
+        self.assertEqual(stats["by_trigger"]["scheduler"], {"runs": 3, "avg": 2.0, "p50": 2.0, "p95": 3.0, "max": 3.0})
+        self.assertEqual(stats["duration_seconds"]["max"], 10.0)
+        self.assertEqual(refresh_run_stats(limit=2)["runs"], 2)
+
+    def test_stats_endpoint_validates_limit(self):
+        client = api_client()
+
+        self.assertEqual(client.get("/api/update_prices/stats/").data["runs"], 0)
+        self.assertEqual(client.get("/api/update_prices/stats/", {"limit": "diez"}).status_code, 400)
+
+    def test_scheduler_once_runs_a_job(self):
+        out = io.StringIO()
+
+        with mock.patch("services.price_refresh.close_old_connections"), \
+                mock.patch("services.price_refresh.refresh_prices") as refresh:
+            call_command("run_price_scheduler", "--once", stdout=out)
+
+        refresh.assert_called_once()
+        self.assertIn("✅ Precios actualizados", out.getvalue())
+        self.assertEqual(PriceRefreshJob.objects.get().trigger, "scheduler")
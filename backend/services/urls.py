@@ -1,11 +1,16 @@
 from django.urls import path
 from .views import MetalPriceDetailView
-from .views import get_yfinance_prices_view, MetalPriceDetailView, update_prices_view, MetalPriceListView, get_price_local_view
+from .views import get_yfinance_prices_view, MetalPriceDetailView, update_prices_view, update_prices_status_view, update_prices_stats_view, MetalPriceListView, get_price_local_view, price_provider_metrics_view, convert_currency_view, currency_matrix_view
 
 urlpatterns = [
     path("metalprice/", MetalPriceDetailView.as_view(), name="metalprice-detail"),
     path("get_yfinance_prices/", get_yfinance_prices_view, name="get_yfinance_prices"),
     path("update_prices/", update_prices_view, name="update_prices"),
+    path("update_prices/stats/", update_prices_stats_view, name="update_prices_stats"),
+    path("update_prices/<uuid:job_id>/", update_prices_status_view, name="update_prices_status"),
     path("metals/", MetalPriceListView.as_view(), name="metal-list"),
     path("get_price_local/", get_price_local_view, name="get_price_local"),
+    path("price-providers/metrics/", price_provider_metrics_view, name="price-provider-metrics"),
+    path("convert/", convert_currency_view, name="convert-currency"),
+    path("convert/matrix/", currency_matrix_view, name="currency-matrix"),
 ]
@@ -1,12 +1,22 @@
+import datetime
+
+import numpy as np
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
 from django.utils import timezone
-from .models import MetalPrice
-from .serializers import MetalPriceSerializer
-from .api_clients import get_yfinance_prices
+from django.utils.dateparse import parse_date, parse_datetime
+from django.shortcuts import get_object_or_404
+from rest_framework.reverse import reverse
+from .models import MetalPrice, MetalPriceHistory, PriceRefreshJob
+from .serializers import MetalPriceSerializer, PriceRefreshJobSerializer
+from .price_refresh import refresh_run_stats, submit_refresh_job
+from .price_cache import get_market_prices
+from .resilience import provider_metrics
+from .fx import conversion_matrix
 from rest_framework.decorators import api_view
-from django.core.management import call_command
 
 
 
@@ -16,16 +26,42 @@ class MetalPriceDetailView(APIView):
         if not symbol:
             return Response({"error": "symbol parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            metal = MetalPrice.objects.filter(symbol__iexact=symbol).order_by("-last_updated").first()
-            if not metal:
-                return Response({"error": f"No se encontró precio para {symbol}"}, status=status.HTTP_404_NOT_FOUND)
-        except MetalPrice.DoesNotExist:
-            return Response({"error": f"Metal {symbol} no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        metal = MetalPrice.objects.current(symbol)
+        if not metal:
+            return Response({"error": f"No se encontró precio para {symbol}"}, status=status.HTTP_404_NOT_FOUND)
+
+        # 🕰️ ?as_of=2025-10-01T12:00 (o solo la fecha) devuelve el precio vigente en ese momento
+        as_of = request.query_params.get("as_of")
+        if as_of:
+            moment = _parse_as_of(as_of)
+            if moment is None:
+                return Response({"error": "as_of debe ser una fecha u hora ISO 8601"}, status=status.HTTP_400_BAD_REQUEST)
+            point = MetalPriceHistory.objects.as_of(metal.symbol, moment)
+            if not point:
+                return Response({"error": f"No hay precio de {symbol} anterior a {as_of}"}, status=status.HTTP_404_NOT_FOUND)
+            metal.price_usd = point.price_usd
+            metal.last_updated = point.ts
 
         serializer = MetalPriceSerializer(metal, context={"request": request})
         return Response(serializer.data)
 
+def _parse_as_of(value):
+    """Fecha/hora ISO; una fecha sola se toma hasta el final de ese día."""
+    try:
+        day = parse_date(value)
+        if day is not None:
+            moment = datetime.datetime.combine(day, datetime.time.max)
+        else:
+            moment = parse_datetime(value)
+            if moment is None:
+                return None
+    except ValueError:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
 from rest_framework import generics
 
 class MetalPriceListView(generics.ListAPIView):
@@ -39,14 +75,17 @@ class MetalPriceListView(generics.ListAPIView):
 @api_view(["GET"])
 def get_yfinance_prices_view(request):
     """
-    Endpoint que obtiene los precios más recientes de metales desde Yahoo Finance
-    (sin depender de la base de datos).
+    Precios más recientes de metales (sin depender de la base de datos), servidos
+    desde una foto en caché: se consulta al proveedor como mucho una vez por
+    PRICE_SNAPSHOT_TTL, sin importar cuántos usuarios refresquen el tablero.
+    `timestamp` es el momento de la consulta al proveedor.
     """
     try:
-        data = get_yfinance_prices()  # Llama a tu función del api_clients.py
+        prices, fetched_at, cache_state = get_market_prices()
         response = {
-            "prices": data,
-            "timestamp": timezone.now().isoformat()
+            "prices": prices,
+            "timestamp": fetched_at.isoformat(),
+            "cache": cache_state,
         }
         return Response(response, status=status.HTTP_200_OK)
     except Exception as e:
@@ -58,13 +97,37 @@ def get_yfinance_prices_view(request):
 @api_view(["POST"])
 def update_prices_view(request):
     """
-    Ejecuta el comando `update_prices` desde el backend y devuelve el resultado.
+    Encola la actualización de precios (comando `update_prices`) y devuelve el
+    job de inmediato. Si ya hay una actualización en curso se devuelve esa.
+    """
+    job, created = submit_refresh_job(user=request.user)
+    serializer = PriceRefreshJobSerializer(job)
+    message = "Actualización de precios en curso" if created else "Ya hay una actualización de precios en curso"
+    return Response(
+        {"message": message, "job": serializer.data,
+         "status_url": reverse("update_prices_status", args=[job.pk], request=request)},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+@api_view(["GET"])
+def update_prices_status_view(request, job_id):
+    """Estado y avance por símbolo de una actualización de precios."""
+    job = get_object_or_404(PriceRefreshJob, pk=job_id)
+    return Response(PriceRefreshJobSerializer(job).data)
+
+
+@api_view(["GET"])
+def update_prices_stats_view(request):
+    """
+    Duración de las últimas actualizaciones de precios (API y programadas),
+    para ajustar la cadencia del programador. `?limit=` (por defecto 100).
     """
     try:
-        call_command("update_prices")  # Llama el management command
-        return Response({"message": "Precios y tasas actualizados correctamente"}, status=status.HTTP_200_OK)
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        limit = max(1, min(int(request.query_params.get("limit", 100)), 1000))
+    except ValueError:
+        return Response({"error": "limit debe ser un número"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(refresh_run_stats(limit=limit))
     
 
 @api_view(["GET"])
@@ -74,4 +137,82 @@ def get_price_local_view(request):
     """
     metals = MetalPrice.objects.all()
     serializer = MetalPriceSerializer(metals, many=True, context={"request": request})
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+
+@api_view(["GET"])
+def price_provider_metrics_view(request):
+    """
+    Latencia, errores y estado del cortacircuitos de cada proveedor de precios
+    (contadores del proceso que atiende la petición).
+    """
+    return Response({"providers": provider_metrics(), "timestamp": timezone.now().isoformat()})
+
+
+@api_view(["POST"])
+def convert_currency_view(request):
+    """
+    Convierte muchos montos en una sola llamada con la matriz de tipos cruzados.
+
+    Cuerpo: {"conversions": [{"amount": 100, "from": "MXN", "to": "EUR"}, ...], "decimals": 2}
+    (cada conversión también puede enviarse como [monto, de, a]).
+    Los resultados vienen en el mismo orden, como texto redondeado a `decimals`
+    con ROUND_HALF_UP (igual que los totales de las cotizaciones); los de monedas
+    sin tipo de cambio son null.
+    """
+    conversions = request.data.get("conversions")
+    if not isinstance(conversions, list) or not conversions:
+        return Response({"error": "conversions debe ser una lista no vacía"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(conversions) > settings.FX_BATCH_MAX_ITEMS:
+        return Response(
+            {"error": f"Máximo {settings.FX_BATCH_MAX_ITEMS} conversiones por llamada"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        decimals = int(request.data.get("decimals", 2))
+    except (TypeError, ValueError):
+        decimals = -1
+    if not 0 <= decimals <= 6:
+        return Response({"error": "decimals debe estar entre 0 y 6"}, status=status.HTTP_400_BAD_REQUEST)
+
+    amounts, sources, targets = [], [], []
+    for position, conversion in enumerate(conversions):
+        if isinstance(conversion, dict):
+            conversion = (conversion.get("amount"), conversion.get("from"), conversion.get("to"))
+        if not isinstance(conversion, (list, tuple)) or len(conversion) != 3:
+            return Response(
+                {"error": f"Conversión {position} inválida: se espera amount, from y to"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        amounts.append(conversion[0])
+        sources.append(conversion[1] or "")
+        targets.append(conversion[2] or "")
+
+    try:
+        amounts = np.asarray(amounts, dtype=np.float64)
+    except (TypeError, ValueError):
+        amounts = None
+    if amounts is None or not np.isfinite(amounts).all():
+        return Response({"error": "Todos los montos deben ser numéricos"}, status=status.HTTP_400_BAD_REQUEST)
+
+    matrix = conversion_matrix()
+    converted, unknown = matrix.convert(amounts, sources, targets, decimals=decimals)
+
+    results = [None if value is None else str(value) for value in converted]
+    unknown_currencies = sorted(
+        {code.upper() for code in [*sources, *targets] if str(code).upper() not in matrix.index}
+    )
+    return Response({"results": results, "unknown_currencies": unknown_currencies})
+
+
+@api_view(["GET"])
+def currency_matrix_view(request):
+    """Tipos de cambio cruzados entre todas las monedas registradas: matrix[de][a]."""
+    matrix = conversion_matrix()
+    return Response({
+        "currencies": matrix.currencies,
+        "matrix": {
+            source: dict(zip(matrix.currencies, row))
+            for source, row in zip(matrix.currencies, matrix.matrix.round(8).tolist())
+        },
+    })
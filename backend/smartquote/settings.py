@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 from datetime import timedelta
 from django.conf import settings
 from datetime import timedelta
@@ -153,6 +153,76 @@ else:
 UPLOAD_DIR = MEDIA_ROOT / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# -----------------------------
+# CACHÉ DE PDFs DE COTIZACIONES
+# -----------------------------
+# Fuera de MEDIA_ROOT para que los PDFs en caché no se sirvan públicamente
+QUOTATION_PDF_CACHE_DIR = config("QUOTATION_PDF_CACHE_DIR", default=str(BASE_DIR / "cache" / "quotation_pdfs"))
+QUOTATION_PDF_CACHE_MAX_BYTES = config("QUOTATION_PDF_CACHE_MAX_BYTES", default=200 * 1024 * 1024, cast=int)
+
+# Procesos dedicados a construir PDFs en segundo plano (quotations.rendering)
+PDF_RENDER_WORKERS = config("PDF_RENDER_WORKERS", default=2, cast=int)
+# Segundos tras los que un PDFRenderJob activo se da por perdido, y segundos que se conservan los terminados
+PDF_RENDER_JOB_TIMEOUT = config("PDF_RENDER_JOB_TIMEOUT", default=300, cast=int)
+PDF_RENDER_JOB_RETENTION = config("PDF_RENDER_JOB_RETENTION", default=24 * 60 * 60, cast=int)
+
+# -----------------------------
+# PROVEEDOR DE PRECIOS (services.providers)
+# -----------------------------
+# Proveedores en orden de prioridad: yahoo, http, csv, fixture (este último sin salir a la red, para pruebas)
+PRICE_PROVIDERS = config("PRICE_PROVIDERS", default="yahoo", cast=Csv())
+# Segundos de espera al proveedor en curso antes de lanzar en paralelo el siguiente
+PRICE_PROVIDER_HEDGE_DELAY = config("PRICE_PROVIDER_HEDGE_DELAY", default=2.0, cast=float)
+PRICE_PROVIDER_POOL_SIZE = config("PRICE_PROVIDER_POOL_SIZE", default=8, cast=int)
+# Cortacircuitos: fallos seguidos para abrirlo y segundos hasta volver a probar
+PRICE_BREAKER_FAILURES = config("PRICE_BREAKER_FAILURES", default=3, cast=int)
+PRICE_BREAKER_RESET_SECONDS = config("PRICE_BREAKER_RESET_SECONDS", default=60, cast=int)
+
+PRICE_PROVIDER_TIMEOUT = config("PRICE_PROVIDER_TIMEOUT", default=10, cast=int)
+PRICE_PROVIDER_MAX_WORKERS = config("PRICE_PROVIDER_MAX_WORKERS", default=8, cast=int)
+PRICE_HTTP_URL = config("PRICE_HTTP_URL", default="http://127.0.0.1:8765/prices")
+PRICE_HTTP_TIMEOUT = config("PRICE_HTTP_TIMEOUT", default=3, cast=float)
+PRICE_CSV_PATH = config("PRICE_CSV_PATH", default=str(BASE_DIR / "services" / "fixtures" / "price_closes.csv"))
+PRICE_FIXTURE_PATH = config("PRICE_FIXTURE_PATH", default=str(BASE_DIR / "services" / "fixtures" / "price_closes.json"))
+
+# Foto de precios de mercado (services.price_cache): segundos como fresca y segundos extra sirviéndola vencida
+PRICE_SNAPSHOT_TTL = config("PRICE_SNAPSHOT_TTL", default=60, cast=int)
+PRICE_SNAPSHOT_MAX_STALE = config("PRICE_SNAPSHOT_MAX_STALE", default=900, cast=int)
+
+# Segundos tras los que un PriceRefreshJob activo se da por perdido (p. ej. si se reinició el servidor)
+PRICE_REFRESH_JOB_TIMEOUT = config("PRICE_REFRESH_JOB_TIMEOUT", default=600, cast=int)
+
+# Programador de actualizaciones (manage.py run_price_scheduler): segundos entre
+# corridas, variación aleatoria (fracción del intervalo) y horario de mercado.
+# Fuera de horario se actualiza cada PRICE_SCHEDULER_OFF_HOURS_INTERVAL segundos (0: hasta la siguiente apertura).
+PRICE_SCHEDULER_INTERVAL = config("PRICE_SCHEDULER_INTERVAL", default=900, cast=int)
+PRICE_SCHEDULER_JITTER = config("PRICE_SCHEDULER_JITTER", default=0.1, cast=float)
+PRICE_SCHEDULER_OFF_HOURS_INTERVAL = config("PRICE_SCHEDULER_OFF_HOURS_INTERVAL", default=0, cast=int)
+PRICE_MARKET_DAYS = config("PRICE_MARKET_DAYS", default="sun,mon,tue,wed,thu", cast=Csv())
+PRICE_MARKET_HOURS = config("PRICE_MARKET_HOURS", default="18:00-17:00")
+PRICE_MARKET_TIMEZONE = config("PRICE_MARKET_TIMEZONE", default="America/New_York")
+
+# Segundos que cada proceso conserva en memoria los tipos de cambio (services.fx)
+FX_RATE_CACHE_TTL = config("FX_RATE_CACHE_TTL", default=300, cast=int)
+# Máximo de montos por llamada a /api/convert/
+FX_BATCH_MAX_ITEMS = config("FX_BATCH_MAX_ITEMS", default=50000, cast=int)
+
+# Tabla de precios compartida entre procesos (services.price_table); la ruta debe ser local a la máquina
+PRICE_TABLE_DIR = config("PRICE_TABLE_DIR", default=str(BASE_DIR / "cache" / "price_table"))
+
+# Eventos en vivo (core.events, /api/events/): segundos entre latidos, duración máxima
+# de cada conexión (EventSource se reconecta solo) y eventos en cola por cliente.
+# Cada conexión abierta ocupa un hilo del servidor hasta EVENTS_STREAM_MAX_SECONDS: sirve
+# /api/events/ con un servidor de hilos (runserver, gunicorn --worker-class gthread) o con
+# procesos dedicados, nunca con workers síncronos de un solo hilo. EVENTS_MAX_STREAMS acota
+# las conexiones por proceso (las demás reciben 503 y EventSource reintenta).
+EVENTS_HEARTBEAT_SECONDS = config("EVENTS_HEARTBEAT_SECONDS", default=15, cast=int)
+EVENTS_STREAM_MAX_SECONDS = config("EVENTS_STREAM_MAX_SECONDS", default=60, cast=int)
+EVENTS_QUEUE_SIZE = config("EVENTS_QUEUE_SIZE", default=100, cast=int)
+EVENTS_MAX_STREAMS = config("EVENTS_MAX_STREAMS", default=50, cast=int)
+# Segundos de validez del token de /api/events/token/ (solo sirve para abrir el flujo)
+EVENTS_STREAM_TOKEN_MAX_AGE = config("EVENTS_STREAM_TOKEN_MAX_AGE", default=60, cast=int)
+
 # -----------------------------
 # CORS
 # -----------------------------
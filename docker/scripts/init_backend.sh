@@ -49,5 +49,8 @@ for r in roles:
 EOF
 
 echo "✅ Usuarios base verificados/creados."
+
+echo "🗺️ Publicando tabla de precios compartida..."
+python manage.py publish_price_table
 echo "🚀 Iniciando servidor Django..."
 python manage.py runserver 0.0.0.0:8000
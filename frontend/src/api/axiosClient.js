@@ -92,10 +92,36 @@ export const getMetals = async () => {
   }
 };
 
-// 🔹 Obtener reporte de cotizaciones con filtros
+// 🔹 Filtros del listado de cotizaciones como parámetros de la API
+// (estado, búsqueda por cliente/correo o folio y rango de fechas se resuelven en el servidor)
+export const quotationFilters = ({ statusFilter, searchTerm, startDate, endDate } = {}) => {
+  const params = {};
+  if (statusFilter && statusFilter !== "all") params.status = statusFilter;
+  if (searchTerm?.trim()) params.search = searchTerm.trim();
+  if (startDate) params.date__gte = startDate;
+  if (endDate) params.date__lte = endDate;
+  return params;
+};
+
+// 🔹 Una página de cotizaciones (paginación por cursor).
+// Sin `nextUrl` pide la primera página con `params`; con `nextUrl` sigue el enlace `next`.
+export const getQuotationsPage = async (params = {}, nextUrl = null) => {
+  const response = nextUrl
+    ? await axiosClient.get(nextUrl)
+    : await axiosClient.get("quotations/", { params });
+  return { results: response.data.results ?? response.data, next: response.data.next ?? null };
+};
+
+// 🔹 Obtener reporte de cotizaciones con filtros (todas las páginas)
 export const getQuotationReport = async (params = {}) => {
-  const response = await axiosClient.get("quotations/", { params });
-  return response.data;
+  const quotations = [];
+  let page = await getQuotationsPage({ page_size: 500, ...params });
+  quotations.push(...page.results);
+  while (page.next) {
+    page = await getQuotationsPage({}, page.next);
+    quotations.push(...page.results);
+  }
+  return quotations;
 };
 
 // 🔹 Obtener reporte de ventas con filtros
@@ -104,7 +130,52 @@ export const getSalesReport = async (params = {}) => {
   return response.data;
 };
 
-
-
+// 📡 Eventos en vivo (precios y cambios de estado) en lugar de polling.
+// EventSource no envía encabezados: antes de cada conexión se pide (con el JWT normal)
+// un token de vida corta que solo sirve para abrir el flujo; el JWT nunca va en la URL.
+// El servidor cierra cada conexión tras EVENTS_STREAM_MAX_SECONDS y para entonces el token
+// ya expiró, así que la reconexión se hace aquí, con un token nuevo, en vez de dejarla a EventSource.
+// handlers: { prices: (data) => ..., quotations: (data) => ..., sales: ..., open: () => ... }
+// Devuelve una función para cerrar la conexión.
+export const subscribeToEvents = (topics, handlers = {}) => {
+  let source = null;
+  let retryTimer = null;
+  let closed = false;
+
+  const reconnect = () => {
+    if (source) source.close();
+    source = null;
+    if (!closed) retryTimer = setTimeout(connect, 3000);
+  };
+
+  const connect = async () => {
+    let streamToken;
+    try {
+      const response = await axiosClient.post("events/token/");
+      streamToken = response.data.stream_token;
+    } catch {
+      reconnect();
+      return;
+    }
+    if (closed) return;
+
+    const params = new URLSearchParams({ topics: topics.join(","), stream_token: streamToken });
+    source = new EventSource(`${axiosClient.defaults.baseURL}events/?${params}`);
+    topics.forEach((topic) => {
+      if (!handlers[topic]) return;
+      source.addEventListener(topic, (event) => handlers[topic](JSON.parse(event.data)));
+    });
+    // 🔁 Al (re)conectar pudo haberse perdido algún evento: que la página recargue sus datos
+    if (handlers.open) source.onopen = handlers.open;
+    source.onerror = reconnect;
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (source) source.close();
+  };
+};
 
 export default axiosClient;
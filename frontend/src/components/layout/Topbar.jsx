@@ -31,7 +31,7 @@ const Topbar = ({ user, logo }) => {
 
     if (updateDB) {
       await updateMetalPrices();
-      toast.info("📦 Base de datos actualizada con nuevos precios");
+      toast.info("📦 Actualización de precios en curso");
     }
   } catch (error) {
     console.error("Error al obtener precios:", error);
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from "react";
-import { getMetals } from "../../api/axiosClient";
+import { getMetals, subscribeToEvents } from "../../api/axiosClient";
 import { toast } from "react-toastify";
 import PageContainer from "../../components/layout/PageContainer";
 import { MdOutlineAttachMoney } from "react-icons/md";
@@ -41,6 +41,9 @@ const MetalsPage = () => {
     fetchMetals();
   }, []);
 
+  // 📡 Recarga los metales cuando el servidor avisa de precios nuevos
+  useEffect(() => subscribeToEvents(["prices"], { prices: fetchMetals, open: fetchMetals }), []);
+
   const filteredMetals = metals.filter((m) =>
     `${m.name} ${m.symbol}`.toLowerCase().includes(searchTerm.toLowerCase())
   );
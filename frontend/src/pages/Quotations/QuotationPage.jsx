@@ -1,5 +1,5 @@
-import React, { useEffect, useState, useContext } from "react";
-import axiosClient from "../../api/axiosClient.js";
+import React, { useEffect, useRef, useState, useContext } from "react";
+import axiosClient, { getQuotationsPage, quotationFilters } from "../../api/axiosClient.js";
 import { toast } from "react-toastify";
 import { motion } from "framer-motion";
 import { UserIcon } from "@heroicons/react/24/outline";
@@ -7,7 +7,7 @@ import QuotationModal from "../../components/modals/QuotationModal.jsx";
 import QuotationForm from "./QuotationForm.jsx";
 import { AuthContext } from "../../context/AuthContext.jsx";
 
-export default function QuotationList({ id, "data-testid": dataTestId, statusFilter, searchTerm, startDate, endDate }) {
+export default function QuotationList({ id, "data-testid": dataTestId, statusFilter = "all", searchTerm = "", startDate, endDate }) {
   const { user } = useContext(AuthContext);
   const [quotations, setQuotations] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -19,16 +19,26 @@ export default function QuotationList({ id, "data-testid": dataTestId, statusFil
   const [cancelReason, setCancelReason] = useState("");
   const [quotationToCancel, setQuotationToCancel] = useState(null);
 
-  const API_URL = "/quotations/";
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // 🔎 Los filtros viajan como parámetros: el servidor los resuelve con sus índices
+  const filtersRef = useRef({ statusFilter, searchTerm, startDate, endDate });
+  filtersRef.current = { statusFilter, searchTerm, startDate, endDate };
 
   useEffect(() => {
-    fetchQuotations();
-  }, []);
+    // Pequeña espera para no pedir una página por cada tecla de la búsqueda
+    const timer = setTimeout(fetchQuotations, 300);
+    return () => clearTimeout(timer);
+  }, [statusFilter, searchTerm, startDate, endDate]);
 
+  // La lista viene paginada por cursor (50 por página): la primera página con los filtros,
+  // y "Cargar más" sigue el enlace `next`
   const fetchQuotations = async () => {
     try {
-      const response = await axiosClient.get(API_URL);
-      setQuotations(response.data);
+      const page = await getQuotationsPage(quotationFilters(filtersRef.current));
+      setQuotations(page.results);
+      setNextPage(page.next);
     } catch (error) {
       console.error("Error al obtener cotizaciones:", error);
       toast.error("❌ Error al cargar cotizaciones");
@@ -37,18 +47,29 @@ export default function QuotationList({ id, "data-testid": dataTestId, statusFil
     }
   };
 
-  const filtered = quotations.filter((q) => {
-    const matchStatus = statusFilter === "all" ? true : q.status === statusFilter;
-    const search = searchTerm.toLowerCase();
-    const matchSearch =
-      q.customer_name?.toLowerCase().includes(search) ||
-      q.customer_email?.toLowerCase().includes(search) ||
-      q.id.toString().includes(search);
-    const date = new Date(q.date);
-    const matchStart = startDate ? date >= new Date(startDate) : true;
-    const matchEnd = endDate ? date <= new Date(endDate) : true;
-    return matchStatus && matchSearch && matchStart && matchEnd;
-  });
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const page = await getQuotationsPage({}, nextPage);
+      setQuotations((current) => [...current, ...page.results]);
+      setNextPage(page.next);
+    } catch (error) {
+      console.error("Error al obtener cotizaciones:", error);
+      toast.error("❌ Error al cargar más cotizaciones");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // 🔍 La lista trae solo el resumen; el detalle (items y gastos) se pide aparte
+  const openQuotationModal = async (quotationId) => {
+    try {
+      const response = await axiosClient.get(`/quotations/${quotationId}/`);
+      setSelectedQuotation(response.data);
+    } catch (error) {
+      toast.error("❌ No se pudo cargar la cotización.");
+    }
+  };
 
   const handleDuplicate = async (id) => {
     try {
@@ -135,13 +156,13 @@ export default function QuotationList({ id, "data-testid": dataTestId, statusFil
         </div>
       )}
 
-      {filtered.length === 0 ? (
+      {quotations.length === 0 ? (
         <div id="no-results" data-testid="no-results" className="text-center text-slate-500 py-12">
           <p>No hay cotizaciones con este estado.</p>
         </div>
       ) : (
         <div id="quotation-grid" data-testid="quotation-grid" className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-6">
-          {filtered.map((q) => (
+          {quotations.map((q) => (
             <motion.div
               key={q.id}
               id={`quotation-card-${q.id}`}
@@ -180,7 +201,7 @@ export default function QuotationList({ id, "data-testid": dataTestId, statusFil
               </div>
 
               <div className="mt-4 flex flex-col gap-2">
-                <button id={`btn-view-${q.id}`} data-testid={`btn-view-${q.id}`} onClick={() => setSelectedQuotation(q)} className="w-full bg-emerald-600 text-white py-2 rounded-lg font-medium hover:bg-emerald-700 transition">Ver Detalle</button>
+                <button id={`btn-view-${q.id}`} data-testid={`btn-view-${q.id}`} onClick={() => openQuotationModal(q.id)} className="w-full bg-emerald-600 text-white py-2 rounded-lg font-medium hover:bg-emerald-700 transition">Ver Detalle</button>
                 {q.status === "draft" && (
                   <button id={`btn-edit-${q.id}`} data-testid={`btn-edit-${q.id}`} onClick={() => setEditingQuotation(q)} className="w-full bg-blue-500 text-white py-2 rounded-lg font-medium hover:bg-blue-600 transition">Editar Cotización</button>
                 )}
@@ -220,6 +241,14 @@ export default function QuotationList({ id, "data-testid": dataTestId, statusFil
         </div>
       )}
 
+      {nextPage && (
+        <div className="flex justify-center mt-8">
+          <button id="btn-load-more" data-testid="btn-load-more" onClick={loadMore} disabled={loadingMore} className="bg-slate-600 hover:bg-slate-700 disabled:opacity-60 text-white font-medium px-6 py-2 rounded-lg shadow-md transition">
+            {loadingMore ? "Cargando..." : "Cargar más"}
+          </button>
+        </div>
+      )}
+
       {selectedQuotation && (<QuotationModal quotation={selectedQuotation} onClose={() => setSelectedQuotation(null)} />)}
     </div>
   );